@@ -0,0 +1,380 @@
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+WORDS = (
+    "transformer attention dataset benchmark accuracy latency encoder decoder "
+    "protein folding quantum qubit entanglement gradient optimizer training "
+    "evaluation baseline ablation retrieval embedding corpus citation"
+).split()
+
+
+def parse_latency(spec: str):
+    """fixed:MS, uniform:LOW,HIGH or lognormal:MEDIAN_MS,SIGMA -> seconds sampler."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeMoorchehClient:
+    def __init__(self, latency, users: int = 1):
+        self.latency = latency
+        # The namespace is shared, so a search returns passages of every user
+        # and RAGEngine filters them; scale the sample so each user still
+        # gets hits back.
+        self.users = users
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        time.sleep(self.latency())
+
+    def list_namespaces(self):
+        return {"namespaces": []}
+
+    def create_namespace(self, namespace_name, type, vector_dimension=None):
+        return {}
+
+    def upload_documents(self, namespace_name, documents):
+        self._wait()
+        with self._lock:
+            for document in documents:
+                self.documents[document["id"]] = document
+        return {
+            "queued_documents": len(documents),
+            "document_ids": [document["id"] for document in documents],
+        }
+
+    def get_documents(self, namespace_name, ids):
+        self._wait()
+        with self._lock:
+            found = [self.documents[item] for item in ids if item in self.documents]
+        return {"documents": found}
+
+    def delete_documents(self, namespace_name, ids):
+        self._wait()
+        with self._lock:
+            deleted = [item for item in ids if self.documents.pop(item, None)]
+        return {"deleted_ids": deleted, "errors": []}
+
+    def search(self, namespaces, query, top_k=10):
+        self._wait()
+        with self._lock:
+            candidates = random.sample(
+                list(self.documents.values()),
+                min(len(self.documents), top_k * self.users),
+            )
+        return {
+            "results": [
+                {
+                    "id": document["id"],
+                    "text": document["text"],
+                    "score": random.random(),
+                    "metadata": {
+                        key: value
+                        for key, value in document.items()
+                        if key not in ("id", "text")
+                    },
+                }
+                for document in candidates
+            ]
+        }
+
+    def close(self):
+        pass
+
+
+class _FakeCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, messages, max_tokens, **kwargs):
+        time.sleep(self.latency())
+        message = type("Message", (), {"content": "Synthetic answer. " * 8})()
+        choice = type("Choice", (), {"message": message})()
+        return type("Completion", (), {"choices": [choice]})()
+
+
+class FakeInferenceClient:
+    def __init__(self, latency):
+        self.chat = type("Chat", (), {"completions": _FakeCompletions(latency)})()
+
+
+class _UploadedText:
+    def __init__(self, name: str, content: bytes):
+        self.name = name
+        self._buffer = BytesIO(content)
+
+    def read(self) -> bytes:
+        return self._buffer.read()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, action: str, elapsed: float, error: Exception = None):
+        with self._lock:
+            if error is None:
+                self.latencies[action].append(elapsed)
+            else:
+                self.errors[(action, type(error).__name__)] += 1
+
+
+class PoolSampler(threading.Thread):
+    def __init__(self, engine, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.pool = engine.pool
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def capacity(self):
+        size = getattr(self.pool, "size", lambda: None)()
+        overflow = getattr(self.pool, "_max_overflow", 0)
+        return None if size is None else size + max(overflow, 0)
+
+    def run(self):
+        while not self._done.is_set():
+            checked_out = getattr(self.pool, "checkedout", lambda: 0)()
+            self.samples.append(checked_out)
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class StubOAuthHandler:
+    """Runs the real state-store and session-token code paths but skips the
+    provider round trip."""
+
+    def __init__(self):
+        from backend.auth import OAuthHandler, _get_state_store
+
+        self.handler = OAuthHandler()
+        self._state_store = _get_state_store
+
+    def login(self, user_id: str) -> dict:
+        _, state = self.handler.generate_authorization_url("http://localhost:8501")
+        if not self._state_store().consume(state):
+            raise RuntimeError("OAuth state was not accepted")
+        token = self.handler.issue_session_token(
+            {"user_id": user_id, "username": user_id}
+        )
+        user_info = self.handler._verify_session_token(token)
+        if user_info is None:
+            raise RuntimeError("Session token did not verify")
+        return user_info
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def simulate_user(index, args, components, recorder, stop_at, sessions):
+    from backend.processing import process_documents
+    from backend.rag_engine import RAGEngine
+
+    oauth, db, client, limiter, llm_client = components
+    actions, weights = zip(*args.mix.items())
+    user_id = f"load-user-{index}"
+
+    start = time.perf_counter()
+    try:
+        user_info = oauth.login(user_id)
+    except Exception as e:
+        recorder.record("login", 0, e)
+        return
+    recorder.record("login", time.perf_counter() - start)
+
+    rag_engine = RAGEngine(
+        args.namespace,
+        user_id=user_info["user_id"],
+        db=db,
+        client=client,
+        limiter=limiter,
+    )
+    sessions.append({"user_info": user_info, "rag_engine": rag_engine})
+    files_uploaded = 0
+
+    while time.monotonic() < stop_at:
+        action = random.choices(actions, weights)[0]
+        question = " ".join(random.sample(WORDS, 5)) + "?"
+        start = time.perf_counter()
+        try:
+            if action == "ingest":
+                text = " ".join(random.choices(WORDS, k=args.ingest_words)) + "."
+                documents = process_documents(
+                    [_UploadedText(f"{user_id}-{files_uploaded}.txt", text.encode())],
+                    user_id=user_id,
+                )
+                rag_engine.add_documents(documents)
+                files_uploaded += 1
+            elif action == "search":
+                rag_engine.search(question, top_k=args.top_k)
+            elif action == "ask":
+                results = rag_engine.search(question, top_k=args.top_k)["results"]
+                llm_client.generate_answer(question, results, user_id=user_id)
+            else:
+                raise ValueError(f"Unknown action {action}")
+        except Exception as e:
+            recorder.record(action, 0, e)
+        else:
+            recorder.record(action, time.perf_counter() - start)
+
+        time.sleep(random.expovariate(1000 / args.think_ms) if args.think_ms else 0)
+
+
+def build_components(args, directory):
+    os.environ.setdefault("OAUTH_CLIENT_SECRET", "load-test-oauth-secret-0123456789")
+    os.environ.setdefault("SESSION_SECRET", "load-test-session-secret-0123456789")
+    os.environ["HF_TOKEN"] = "load-test"
+    os.environ["HF_LLM_MODELS"] = "load-test/model"
+    if not args.database_url:
+        os.environ.pop("CONNECTION_STRING", None)
+    else:
+        os.environ["CONNECTION_STRING"] = args.database_url
+
+    from backend.db import Database
+    from backend.limits import RateLimiter
+    from backend.llm import LLMClient
+
+    db = Database(os.path.join(directory, "load.db"))
+    client = FakeMoorchehClient(parse_latency(args.moorcheh_latency), args.users)
+    limiter = None
+    if args.rate_limits:
+        limiter = RateLimiter()
+
+    llm_client = LLMClient(limiter=limiter)
+    llm_client._clients["load-test/model"] = FakeInferenceClient(
+        parse_latency(args.llm_latency)
+    )
+    return StubOAuthHandler(), db, client, limiter, llm_client
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        action, _, weight = part.partition("=")
+        mix[action.strip()] = float(weight)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Drive login, ingest, search and ask with N concurrent "
+        "simulated users against fake Moorcheh and HF backends."
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=500.0)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("search=6,ask=3,ingest=1")
+    )
+    parser.add_argument("--moorcheh-latency", default="lognormal:80,0.5")
+    parser.add_argument("--llm-latency", default="lognormal:900,0.4")
+    parser.add_argument("--ingest-words", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--namespace", default="load-test")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("LOAD_TEST_DATABASE_URL"),
+        help="SQLAlchemy URL; a temporary SQLite file when unset",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Apply the configured per-user rate limits (off measures raw capacity)",
+    )
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as directory:
+        components = build_components(args, directory)
+        db = components[1]
+        recorder = Recorder()
+        sessions = []
+        sampler = PoolSampler(db.engine)
+        sampler.start()
+
+        baseline = tracemalloc.get_traced_memory()[0]
+        stop_at = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(
+                target=simulate_user,
+                args=(index, args, components, recorder, stop_at, sessions),
+            )
+            for index in range(args.users)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+        session_memory = (tracemalloc.get_traced_memory()[0] - baseline) / max(
+            len(sessions), 1
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.close()
+
+    print(f"{args.users} users for {elapsed:.1f}s, think time {args.think_ms:.0f} ms")
+    print(f"{'action':<8} {'ok':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for action, latencies in sorted(recorder.latencies.items()):
+        print(
+            f"{action:<8} {len(latencies):>7} {len(latencies) / elapsed:>8.1f} "
+            f"{_percentile(latencies, 0.5) * 1000:>8.0f} "
+            f"{_percentile(latencies, 0.9) * 1000:>8.0f} "
+            f"{_percentile(latencies, 0.99) * 1000:>8.0f}"
+        )
+    for (action, error), count in sorted(recorder.errors.items()):
+        print(f"  {action} errors: {count} x {error}")
+
+    capacity = sampler.capacity()
+    if sampler.samples:
+        saturated = (
+            sum(sample >= capacity for sample in sampler.samples) / len(sampler.samples)
+            if capacity
+            else 0.0
+        )
+        print(
+            f"DB pool: max {max(sampler.samples)} / {capacity or '?'} checked out, "
+            f"mean {statistics.fmean(sampler.samples):.2f}, saturated {saturated:.0%} of samples"
+        )
+    print(
+        f"Memory: {session_memory / 1024:.0f} KiB retained per session, "
+        f"traced peak {peak / (1024 * 1024):.1f} MiB, "
+        f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from backend.normalize import normalize_bytes  # noqa: E402
+
+WORDS = ["retrieval", "augmented", "generation", "naïve", "café", "Δ", "data", "x"]
+SEPARATORS = [" ", "  ", "\n", "\r\n", "\t", "\n\n", "  ", " "]
+
+
+def regex_baseline(file_content: bytes) -> str:
+    try:
+        text = file_content.decode("utf-8")
+    except UnicodeDecodeError:
+        text = file_content.decode("latin-1")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def make_document(size_mb: float, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    pieces = []
+    length = 0
+    while length < target:
+        piece = rng.choice(WORDS) + rng.choice(SEPARATORS)
+        pieces.append(piece)
+        length += len(piece)
+    return "".join(pieces).encode("utf-8")
+
+
+def run(label: str, fn, data: bytes, repeats: int) -> str:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(data)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    size_mb = len(data) / (1024 * 1024)
+    print(
+        f"{label:<18} {best * 1000:9.1f} ms  {size_mb / best:8.1f} MB/s  "
+        f"peak {peak / (1024 * 1024):8.1f} MB"
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare the streaming normalizer with the regex clean_text path."
+    )
+    parser.add_argument("--size-mb", type=float, default=20.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_document(args.size_mb)
+    latin1 = data.decode("utf-8").encode("latin-1", errors="replace")
+
+    failed = False
+    for name, payload in (("utf-8", data), ("latin-1", latin1)):
+        print(f"[{name}] {len(payload) / (1024 * 1024):.1f} MB")
+        expected = run("regex baseline", regex_baseline, payload, args.repeats)
+        actual = run("streaming", normalize_bytes, payload, args.repeats)
+        if actual != expected:
+            print("  MISMATCH: streaming output differs from the baseline")
+            failed = True
+        print()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
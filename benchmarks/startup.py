@@ -0,0 +1,215 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+APP_PATH = SRC_DIR / "app.py"
+
+BASELINE_MODULES = ("dotenv", "streamlit")
+HEAVY_MODULES = (
+    "faiss",
+    "huggingface_hub",
+    "moorcheh_sdk",
+    "pandas",
+    "pypdf",
+    "sentence_transformers",
+    "sqlalchemy",
+    "torch",
+    "transformers",
+)
+
+_CHILD_CODE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+imported = time.perf_counter()
+for module, function in {calls!r}:
+    getattr(importlib.import_module(module), function)()
+if {render_login!r}:
+    from backend.resources import get_oauth_handler
+    get_oauth_handler().generate_authorization_url("http://localhost:8501")
+elapsed_ms = (time.perf_counter() - start) * 1000
+calls_ms = (time.perf_counter() - imported) * 1000
+loaded = sorted(
+    name for name in {heavy!r} if name in sys.modules
+)
+print(json.dumps({{"elapsed_ms": elapsed_ms, "calls_ms": calls_ms, "loaded": loaded}}))
+"""
+
+
+def _is_local(module: str) -> bool:
+    top = SRC_DIR / module.split(".")[0]
+    return top.is_dir() or top.with_suffix(".py").exists()
+
+
+def login_path(app_path: Path = APP_PATH) -> tuple[tuple, tuple]:
+    """Local modules app.py imports at module level, and the module-level
+    ``name = factory()`` calls it makes on every run, logged in or not."""
+    tree = ast.parse(app_path.read_text())
+    modules = []
+    imported_from = {}
+    calls = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names if _is_local(alias.name)]
+        elif isinstance(node, ast.ImportFrom) and node.module and _is_local(node.module):
+            modules.append(node.module)
+            for alias in node.names:
+                imported_from[alias.asname or alias.name] = (node.module, alias.name)
+        elif (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Call)
+            and isinstance(node.value.func, ast.Name)
+            and node.value.func.id in imported_from
+            and not node.value.args
+            and not node.value.keywords
+        ):
+            calls.append(imported_from[node.value.func.id])
+    return tuple(dict.fromkeys(modules)), tuple(calls)
+
+
+def backend_env(connection_string: str = None) -> dict:
+    """Environment for a configured login page: OAuth on, and either the
+    in-memory backends or the database ones behind ``connection_string``."""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("CONNECTION_STRING", "OAUTH_STATE_BACKEND", "RATE_LIMIT_BACKEND")
+    }
+    env.setdefault("OAUTH_CLIENT_ID", "startup-benchmark")
+    env.setdefault("OAUTH_CLIENT_SECRET", "startup-benchmark-secret")
+    if connection_string:
+        env["CONNECTION_STRING"] = connection_string
+    return env
+
+
+def _run_child(modules, *args, calls=(), env=None) -> subprocess.CompletedProcess:
+    code = _CHILD_CODE.format(
+        modules=tuple(modules),
+        calls=tuple(calls),
+        render_login=bool(calls),
+        heavy=HEAVY_MODULES,
+    )
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure(modules, repeats: int, calls=(), env=None) -> dict:
+    timings = []
+    call_timings = []
+    loaded = []
+    for _ in range(repeats):
+        result = json.loads(_run_child(modules, calls=calls, env=env).stdout)
+        timings.append(result["elapsed_ms"])
+        call_timings.append(result["calls_ms"])
+        loaded = result["loaded"]
+    return {
+        "median_ms": statistics.median(timings),
+        "calls_ms": statistics.median(call_timings),
+        "loaded": loaded,
+    }
+
+
+def import_breakdown(
+    modules, limit: int, calls=(), env=None
+) -> list[tuple[int, str]]:
+    stderr = _run_child(modules, "-X", "importtime", calls=calls, env=env).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Only top-level imports (no indentation) are attributed to our modules.
+        if name.startswith(" ") and not name.startswith("  "):
+            entries.append((int(cumulative), name.strip()))
+    entries.sort(reverse=True)
+    return entries[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the import cost of the modules loaded before the login page renders."
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Fail if the login path adds more than this many ms on top of streamlit.",
+    )
+    parser.add_argument(
+        "--connection-string",
+        default=None,
+        help="Database for the database-backed run (default: a temporary SQLite file).",
+    )
+    args = parser.parse_args()
+
+    login_modules, login_calls = login_path()
+    baseline = measure(BASELINE_MODULES, args.repeats)
+
+    print(f"login path modules:  {', '.join(login_modules)}")
+    print(f"pre-login calls:     {', '.join(name + '()' for _, name in login_calls)}")
+    print("                     generate_authorization_url()")
+    print()
+    print(f"streamlit baseline:  {baseline['median_ms']:8.1f} ms")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connection_string = (
+            args.connection_string or f"sqlite:///{Path(tmp_dir) / 'startup.db'}"
+        )
+        # With CONNECTION_STRING set, OAuth states, session versions and rate
+        # limits default to the database; none of them may open it at login.
+        runs = {
+            "memory": backend_env(),
+            "database": backend_env(connection_string),
+        }
+        for backend, env in runs.items():
+            login = measure(
+                BASELINE_MODULES + login_modules, args.repeats, login_calls, env
+            )
+            added_ms = login["median_ms"] - baseline["median_ms"]
+            unexpected = sorted(set(login["loaded"]) - set(baseline["loaded"]))
+
+            print()
+            print(f"{backend} backends:")
+            print(f"  login path total:  {login['median_ms']:8.1f} ms")
+            print(f"    of which calls:  {login['calls_ms']:8.1f} ms")
+            print(f"  added by backend:  {added_ms:8.1f} ms")
+            print("  Slowest top-level imports on the login path (cumulative):")
+            for cumulative_us, name in import_breakdown(
+                BASELINE_MODULES + login_modules, args.top, login_calls, env
+            ):
+                print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+            if unexpected:
+                print(
+                    f"\nFAIL: heavy modules loaded before login ({backend}): "
+                    f"{', '.join(unexpected)}"
+                )
+                failed = True
+            if args.budget_ms is not None and added_ms > args.budget_ms:
+                print(
+                    f"\nFAIL: login path exceeds budget ({backend}): "
+                    f"{added_ms:.1f} > {args.budget_ms} ms"
+                )
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,31 @@
+import html
+import math
 import os
+import uuid
 from functools import lru_cache
 
 from dotenv import load_dotenv
 import streamlit as st 
 
-from backend.auth import OAuthHandler  
-from backend.db import Database 
-from backend.llm import LLMClient  
+from backend.conversation import ConversationSession
+from backend.limits import RateLimitExceeded
 from backend.processing import process_documents  
-from backend.rag_engine import RAGEngine  
+from backend.query_expansion import expand_query
+from backend.resources import (
+    get_database,
+    get_llm_client,
+    get_oauth_handler,
+    get_rag_engine,
+    get_session_registry,
+)
+from backend.sessions import UserSession
+from backend.summaries import is_overview_question
 from style.global_style import css as global_css
 from style.question_style import css as question_css
 
 
 LOGIN_QUERY_KEYS = ("code", "state")
+MORE_RESULTS_PAGE_SIZE = 10
 
 
 load_dotenv()
@@ -62,6 +74,147 @@ def _get_single_param_value(value):
     return value
 
 
+def format_page_range(metadata: dict) -> str:
+    page_start = metadata.get("page_start")
+    if page_start is None:
+        return ""
+    page_end = metadata.get("page_end", page_start)
+    if page_end != page_start:
+        return f"p. {page_start}–{page_end}"
+    return f"p. {page_start}"
+
+
+def get_session_id() -> str:
+    session_id = st.session_state.get("session_id")
+    if session_id is None:
+        session_id = uuid.uuid4().hex
+        st.session_state.session_id = session_id
+    return session_id
+
+
+def render_retrieved(rag_response: dict):
+    st.markdown(
+        f"### Retrieved Documents (Time taken: {rag_response['time_taken']} ms)"
+    )
+    if rag_response.get("mode") == "cached":
+        st.caption("Follow-up answered from the previous turn's passages.")
+    elif rag_response.get("mode") == "summaries":
+        st.caption("Overview answered from precomputed file summaries.")
+    elif rag_response.get("mode") == "incremental":
+        st.caption("Follow-up: new passages merged with the previous turn's.")
+    if len(rag_response.get("queries", [])) > 1:
+        st.caption(
+            "Searched: " + " · ".join(f"“{query}”" for query in rag_response["queries"])
+        )
+    st.dataframe(
+        results_table(rag_response["results"]), width="stretch", hide_index=True
+    )
+
+
+def results_table(results: list, first_rank: int = 1) -> list:
+    table_data = []
+    for i, result in enumerate(results, first_rank):
+        table_data.append(
+            {
+                "Rank": i,
+                "Source": result["metadata"]["source"],
+                "Pages": format_page_range(result["metadata"]),
+                "Score": f"{result['score']:.3f}",
+                "Preview": result["text"][:150] + "..."
+                if len(result["text"]) > 150
+                else result["text"],
+            }
+        )
+    return table_data
+
+
+def render_answer_card(answer: str):
+    st.markdown(
+        f"""
+        <div class="answer-card">
+            <div class="answer-title">Answer</div>
+            <div>{html.escape(answer).replace(chr(10), "<br>")}</div>
+        </div>
+    """,
+        unsafe_allow_html=True,
+    )
+
+
+def render_citations(results: list):
+    st.markdown("### 📚 Citations")
+    for i, result in enumerate(results, 1):
+        metadata = result["metadata"]
+        source = metadata["source"]
+        chunk_id = metadata.get("chunk_id", f"chunk_{i}")
+        page_range = format_page_range(metadata)
+        location = f" · {page_range}" if page_range else ""
+        preview = (
+            result["text"][:200] + "..."
+            if len(result["text"]) > 200
+            else result["text"]
+        )
+
+        # Filenames and passages come from user uploads; render them as text.
+        st.markdown(
+            f"""
+            <div class="citation-item">
+                <strong>[{i}] {html.escape(source)}</strong>{html.escape(location)} (Score: {result["score"]:.3f})<br>
+                <small>{html.escape(preview)}</small>
+            </div>
+        """,
+            unsafe_allow_html=True,
+        )
+        with st.expander(f"Show passage [{i}]"):
+            if "char_start" in metadata:
+                st.caption(
+                    f"{chunk_id} · characters {metadata['char_start']}–{metadata['char_end']}"
+                )
+            st.markdown(result["text"])
+
+
+def render_more_results(rag_engine, last_search: dict):
+    more_results = last_search["more_results"]
+    if not more_results and not last_search["next_cursor"]:
+        return
+
+    first_rank = len(last_search["response"]["results"]) + 1
+    if more_results:
+        st.markdown("### 🔎 More Results")
+        st.dataframe(
+            results_table(more_results, first_rank), width="stretch", hide_index=True
+        )
+        # Only the passage picked here is fetched in full.
+        rank = st.selectbox(
+            "Open passage",
+            [None] + list(range(first_rank, first_rank + len(more_results))),
+            format_func=lambda rank: "Choose a result…" if rank is None else f"[{rank}]",
+        )
+        if rank is not None:
+            result = more_results[rank - first_rank]
+            try:
+                st.markdown(rag_engine.load_text(result))
+            except Exception as e:
+                st.error(f"Error loading passage: {str(e)}")
+
+    if last_search["next_cursor"] and st.button("Load more results"):
+        try:
+            page = rag_engine.next_page(
+                last_search["next_cursor"], page_size=MORE_RESULTS_PAGE_SIZE
+            )
+            more_results.extend(page["results"])
+            last_search["next_cursor"] = page["next_cursor"]
+        except KeyError:
+            last_search["next_cursor"] = None
+            st.info("These results have expired. Search again to browse further.")
+            return
+        except RateLimitExceeded as e:
+            st.warning(
+                f"⏳ You're sending requests too quickly. Please try again in {math.ceil(e.retry_after)}s."
+            )
+            return
+        st.rerun()
+
+
 def clear_oauth_query_params():
     params = st.query_params
     for key in LOGIN_QUERY_KEYS:
@@ -77,7 +230,7 @@ st.set_page_config(
 st.markdown(global_css, unsafe_allow_html=True)
 
 
-oauth_handler = OAuthHandler()
+oauth_handler = get_oauth_handler()
 
 
 login_success_username = st.session_state.pop("login_success_username", None)
@@ -91,6 +244,16 @@ if "authenticated" not in st.session_state:
 if "user_info" not in st.session_state:
     st.session_state.user_info = None
 
+pending_session_token = st.session_state.pop("pending_session_token", None)
+if pending_session_token:
+    oauth_handler.write_session_cookie(pending_session_token)
+
+if st.session_state.pop("clear_session_cookie", False):
+    oauth_handler.clear_session_cookie()
+
+if not st.session_state.authenticated and not st.session_state.get("logged_out"):
+    oauth_handler.restore_session(oauth_handler.read_session_cookie())
+
 
 query_params = st.query_params
 redirect_uri = get_oauth_redirect_uri()
@@ -102,6 +265,8 @@ if all(key in query_params for key in LOGIN_QUERY_KEYS):
     clear_oauth_query_params()
     if user_info:
         st.session_state.login_success_username = user_info.get("username", "User")
+        st.session_state.pending_session_token = user_info.get("session_token")
+        st.session_state.pop("logged_out", None)
         st.rerun()
 
 if not oauth_handler.is_configured():
@@ -137,32 +302,26 @@ namespace = os.getenv("NAMESPACE")
 
 db = None
 rag_engine = None
+conversation = None
 
 if authenticated:
-    if "db" not in st.session_state:
-        st.session_state.db = Database()
-    db = st.session_state.db
+    db = get_database()
 
-    if "rag_engine" not in st.session_state:
-        st.session_state.rag_engine = RAGEngine(
-            namespace=namespace, user_id=user_id, db=st.session_state.db
-        )
-    elif st.session_state.rag_engine.user_id != user_id:
-        st.session_state.rag_engine = RAGEngine(
-            namespace=namespace, user_id=user_id, db=st.session_state.db
+    def new_session() -> UserSession:
+        session_rag_engine = get_rag_engine(namespace, user_id=user_id)
+        return UserSession(
+            user_id, session_rag_engine, ConversationSession(session_rag_engine)
         )
-    else:
-        st.session_state.rag_engine.db = st.session_state.db
 
-    rag_engine = st.session_state.rag_engine
-else:
-    db = st.session_state.get("db")
-    rag_engine = None
+    # Kept in the process-wide registry rather than st.session_state so idle
+    # sessions are released even when the user never logs out.
+    user_session = get_session_registry().get(get_session_id(), user_id, new_session)
+    rag_engine = user_session.rag_engine
+    conversation = user_session.conversation
 
 chunk_count = rag_engine.get_chunk_count() if rag_engine else 0
 
-if "llm_client" not in st.session_state:
-    st.session_state.llm_client = LLMClient()
+llm_client = get_llm_client()
 
 
 with st.sidebar:
@@ -171,11 +330,10 @@ with st.sidebar:
         st.markdown(f"**Logged in as:** {username}")
         if st.button("🚪 Logout"):
             oauth_handler.logout()
-            if "rag_engine" in st.session_state:
-                del st.session_state.rag_engine
-            if "db" in st.session_state:
-                st.session_state.db.close()
-                del st.session_state.db
+            st.session_state.logged_out = True
+            st.session_state.clear_session_cookie = True
+            get_session_registry().discard(get_session_id())
+            st.session_state.pop("last_search", None)
             st.rerun()
     else:
         # st.markdown("**Preview Mode**")
@@ -215,13 +373,18 @@ with st.sidebar:
                 try:
                     documents = process_documents(uploaded_files, user_id=user_id)
                     if documents:
-                        rag_engine.add_documents(documents)
+                        # Files indexed before are replaced in the same call.
+                        rag_engine.index_documents(documents)
                         st.success(
                             f"✅ Indexed {len(documents)} documents from {len(uploaded_files)} file(s)!"
                         )
                         st.rerun()
                     else:
                         st.warning("No valid documents extracted from documents.")
+                except RateLimitExceeded as e:
+                    st.warning(
+                        f"⏳ Too many indexing requests. Please try again in {math.ceil(e.retry_after)}s."
+                    )
                 except Exception as e:
                     st.error(f"Error processing documents: {str(e)} expect")
         else:
@@ -235,10 +398,22 @@ with st.sidebar:
         user_files = db.get_user_files(user_id)
         if user_files:
             st.markdown("**Indexed Files:**")
+            st.caption("Upload a file with the same name to re-index it.")
             for file_info in user_files:
                 filename = file_info["filename"]
                 count = file_info["count"]
-                st.markdown(f"• {filename} ({count} documents)")
+                file_col, remove_col = st.columns([5, 1], gap="small")
+                with file_col:
+                    st.markdown(f"• {filename} ({count} documents)")
+                with remove_col:
+                    if st.button(
+                        "🗑️", key=f"remove_file_{filename}", help=f"Remove {filename}"
+                    ):
+                        try:
+                            rag_engine.delete_file(filename)
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error removing {filename}: {str(e)}")
     elif not authenticated:
         st.markdown("**Indexed Files:**")
         st.caption("Preview your library after logging in.")
@@ -253,13 +428,45 @@ with st.sidebar:
     st.divider()
 
     st.markdown("### 🔑 HuggingFace Token")
-    has_token = st.session_state.llm_client.has_token()
+    has_token = llm_client.has_token()
     if has_token:
         st.success("✅ Token configured")
+    elif llm_client.local_generator is not None:
+        st.success(f"✅ Local model: {llm_client.local_generator.model_name}")
     else:
         st.warning("⚠️ No token (using extractive fallback)")
         st.caption("Set HF_TOKEN environment variable for LLM generation")
 
+    endpoint_stats = llm_client.endpoint_stats()
+    if endpoint_stats:
+        with st.expander("Generation endpoints"):
+            st.dataframe(
+                [
+                    {
+                        "Model": stats["model"],
+                        "API": stats["api"],
+                        "Latency (ms)": stats["latency_ms"],
+                        "Error rate": f"{stats['error_rate']:.0%}",
+                        "Healthy": "✅" if stats["healthy"] else "⏸️",
+                    }
+                    for stats in endpoint_stats
+                ],
+                hide_index=True,
+            )
+
+    if authenticated:
+        session_stats = get_session_registry().stats()
+        with st.expander("Server sessions"):
+            st.caption(
+                f"{session_stats['sessions']} active · "
+                f"{session_stats['evicted']} evicted after idling"
+            )
+            if session_stats["bytes_per_session"] is not None:
+                st.caption(
+                    f"~{session_stats['bytes_per_session'] / 1024:.0f} KiB per session, "
+                    f"{session_stats['bytes'] / (1024 * 1024):.1f} MiB total"
+                )
+
 
 st.markdown(
     '<div class="main-header">🐜 Moorcheh Intelligent RAG</div>',
@@ -310,71 +517,105 @@ with col2:
     search_clicked = st.button(
         "Search & Generate Answer", type="primary", disabled=not authenticated
     )
+    if conversation is not None and conversation.turns:
+        if st.button("New conversation", help="Forget previous questions and passages"):
+            conversation.reset()
+
+expansion_options = ["Off", "Rule-based"]
+if llm_client.has_token():
+    expansion_options.append("LLM sub-queries")
+expansion_mode = st.radio(
+    "Query expansion",
+    expansion_options,
+    horizontal=True,
+    help="Split multi-part questions into sub-queries that are searched in parallel and merged.",
+    disabled=not authenticated,
+)
 
 if authenticated and search_clicked:
+    st.session_state.pop("last_search", None)
     if not question:
         st.warning("Please enter a question.")
     elif chunk_count == 0:
         st.warning("Please index some documents first.")
     else:
         with st.spinner("Searching and generating answer..."):
-            rag_response = rag_engine.search(question, top_k=top_k)
-            results = rag_response["results"]
-            time_taken = rag_response["time_taken"]
-
-            if results:
-                st.markdown(f"### Retrieved Documents (Time taken: {time_taken} ms)")
-
-                table_data = []
-                for i, result in enumerate(results, 1):
-                    table_data.append(
-                        {
-                            "Rank": i,
-                            "Source": result["metadata"]["source"],
-                            "Score": f"{result['score']:.3f}",
-                            "Preview": result["text"][:150] + "..."
-                            if len(result["text"]) > 150
-                            else result["text"],
-                        }
+            try:
+                overview_results = (
+                    rag_engine.overview_results(question)
+                    if is_overview_question(question)
+                    else []
+                )
+                if overview_results:
+                    rag_response = {
+                        "results": overview_results,
+                        "time_taken": 0,
+                        "mode": "summaries",
+                    }
+                else:
+                    queries = None
+                    if (
+                        expansion_mode != "Off"
+                        and conversation.plan(question) == "search"
+                    ):
+                        queries = expand_query(
+                            question,
+                            llm_client if expansion_mode == "LLM sub-queries" else None,
+                            user_id=user_id,
+                        )
+                    rag_response = conversation.retrieve(
+                        question, top_k=top_k, queries=queries
                     )
-
-                st.dataframe(table_data, width="stretch", hide_index=True)
-
-                answer = st.session_state.llm_client.generate_answer(question, results)
-
-                st.markdown("### 💡 Generated Answer")
-                st.markdown(
-                    f"""
-                    <div class="answer-card">
-                        <div class="answer-title">Answer</div>
-                        <div>{answer.replace(chr(10), "<br>")}</div>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
+                results = rag_response["results"]
+
+                if results:
+                    render_retrieved(rag_response)
+
+                    st.markdown("### 💡 Generated Answer")
+                    if llm_client.supports_streaming():
+                        answer = st.write_stream(
+                            llm_client.stream_answer(
+                                question,
+                                results,
+                                user_id=user_id,
+                                history=conversation.history(),
+                            )
+                        )
+                    else:
+                        answer = llm_client.generate_answer(
+                            question,
+                            results,
+                            user_id=user_id,
+                            history=conversation.history(),
+                        )
+                        render_answer_card(answer)
+                    conversation.record(question, answer, results)
+
+                    render_citations(results)
+                    st.session_state.last_search = {
+                        "response": rag_response,
+                        "answer": answer,
+                        "more_results": [],
+                        "next_cursor": rag_response.get("next_cursor"),
+                    }
+                else:
+                    st.warning("No results found. Try rephrasing your question.")
+            except RateLimitExceeded as e:
+                st.warning(
+                    f"⏳ You're sending requests too quickly. Please try again in {math.ceil(e.retry_after)}s."
                 )
+elif authenticated and st.session_state.get("last_search"):
+    # Reruns (e.g. "Load more") redraw the last answer instead of dropping it.
+    last_search = st.session_state.last_search
+    render_retrieved(last_search["response"])
+    st.markdown("### 💡 Generated Answer")
+    render_answer_card(last_search["answer"])
+    render_citations(last_search["response"]["results"])
 
-                st.markdown("### 📚 Citations")
-                for i, result in enumerate(results, 1):
-                    source = result["metadata"]["source"]
-                    chunk_id = result["metadata"].get("chunk_id", f"chunk_{i}")
-                    preview = (
-                        result["text"][:200] + "..."
-                        if len(result["text"]) > 200
-                        else result["text"]
-                    )
+if authenticated and st.session_state.get("last_search"):
+    render_more_results(rag_engine, st.session_state.last_search)
 
-                    st.markdown(
-                        f"""
-                        <div class="citation-item">
-                            <strong>[{i}] {source}</strong> (Score: {result["score"]:.3f})<br>
-                            <small>{preview}</small>
-                        </div>
-                    """,
-                        unsafe_allow_html=True,
-                    )
-            else:
-                st.warning("No results found. Try rephrasing your question.")
-elif not authenticated:
+if not authenticated:
     st.info("Preview mode: log in to ask questions about your private documents.")
     if auth_url:
         st.markdown(
@@ -1,34 +1,208 @@
+import hashlib
+import heapq
+import hmac
 import os
 import secrets
 import time
+from collections import OrderedDict
 from threading import Lock
 from typing import Dict, Optional
 from urllib.parse import urlencode
 
-import jwt
-import requests
 import streamlit as st
 
 
+STATE_TTL_SECONDS = 600
+MAX_PENDING_STATES = 10_000
+# The database state store purges once per this fraction of its cap in logins.
+STATE_PURGE_FRACTION = 10
+
+JWKS_CACHE_SECONDS = 3600
+ID_TOKEN_ALGORITHMS = ["RS256", "ES256"]
+SESSION_COOKIE_NAME = "moorcheh_session"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_CACHED_SESSIONS = 10_000
+
+
 class _StateStore:
-    def __init__(self):
+    def __init__(
+        self,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        max_size: int = MAX_PENDING_STATES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
         self._states: dict[str, float] = {}
+        self._expiry: list[tuple[float, str]] = []
         self._lock = Lock()
 
-    def add(self, state: str):
+    def _evict(self, now: float):
+        # Heap entries for consumed states are skipped lazily; rebuild once
+        # they dominate so the heap stays proportional to the live states.
+        if len(self._expiry) > 2 * self.max_size:
+            self._expiry = [(ts, key) for key, ts in self._states.items()]
+            heapq.heapify(self._expiry)
+
+        while self._expiry and (
+            self._expiry[0][0] <= now or len(self._states) > self.max_size
+        ):
+            expires_at, key = heapq.heappop(self._expiry)
+            if self._states.get(key) == expires_at:
+                del self._states[key]
+
+    def issue(self) -> str:
+        state = secrets.token_urlsafe(32)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
         with self._lock:
-            self._states[state] = time.time()
+            self._states[state] = expires_at
+            heapq.heappush(self._expiry, (expires_at, state))
+            self._evict(now)
+        return state
 
-    def consume(self, state: str, ttl_seconds: int = 600) -> bool:
+    def consume(self, state: str) -> bool:
         now = time.time()
         with self._lock:
-            expired = [key for key, ts in self._states.items() if now - ts > ttl_seconds]
-            for key in expired:
-                self._states.pop(key, None)
-            return self._states.pop(state, None) is not None
+            expires_at = self._states.pop(state, None)
+            self._evict(now)
+            return expires_at is not None and expires_at > now
+
+
+class _DatabaseStateStore:
+    """States shared by every worker through the database.
+
+    States are signed with the OAuth client secret, so issuing one (and
+    rendering the login page) needs no database access. Consuming a state
+    is a single insert that records it until it expires, which refuses
+    replays. Recorded states are purged every ``purge_interval`` consumes;
+    the cap is approximate: between purges, and with several workers
+    purging concurrently, the table can exceed ``max_size`` by about the
+    purge interval per worker.
+    """
+
+    def __init__(
+        self,
+        get_db,
+        secret: str,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        max_size: int = MAX_PENDING_STATES,
+    ):
+        self.get_db = get_db
+        self._key = secret.encode()
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.purge_interval = max(1, max_size // STATE_PURGE_FRACTION)
+        self._consumed = 0
+        self._lock = Lock()
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._key, payload.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self) -> str:
+        expires_at = int(time.time()) + self.ttl_seconds
+        payload = f"{secrets.token_urlsafe(24)}.{expires_at}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def consume(self, state: str) -> bool:
+        payload, _, signature = state.rpartition(".")
+        expires_at = payload.rpartition(".")[2]
+        if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return False
+        now = time.time()
+        if not expires_at.isdigit() or int(expires_at) <= now:
+            return False
+
+        db = self.get_db()
+        if not db.record_oauth_state(state, int(expires_at)):
+            return False
+        with self._lock:
+            self._consumed += 1
+            purge = self._consumed % self.purge_interval == 0
+        if purge:
+            # Recorded states accumulate at most as fast as logins, so a
+            # bounded purge per interval keeps up.
+            db.purge_oauth_states(now, self.max_size, 2 * self.purge_interval)
+        return True
+
+
+class _SessionVersions:
+    def __init__(self):
+        self._versions: dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: str) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            return version
+
+
+class _DatabaseSessionVersions:
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, user_id: str) -> int:
+        return self.db.get_session_version(user_id)
+
+    def bump(self, user_id: str) -> int:
+        return self.db.bump_session_version(user_id)
+
+
+_STATE_STORE = None
+_SESSION_VERSIONS = None
+_STATE_STORE_LOCK = Lock()
+
+
+def _state_backend() -> str:
+    # Session versions live alongside OAuth states: both must be shared by
+    # every worker once there is more than one.
+    default_backend = "database" if os.getenv("CONNECTION_STRING") else "memory"
+    backend = os.getenv("OAUTH_STATE_BACKEND", default_backend).lower()
+    if backend not in ("database", "memory"):
+        raise ValueError(f"Unknown OAUTH_STATE_BACKEND: {backend}")
+    return backend
 
 
-_STATE_STORE = _StateStore()
+def _build_state_store():
+    if _state_backend() == "database":
+        from backend.resources import get_database
+
+        secret = os.getenv("OAUTH_CLIENT_SECRET")
+        if not secret:
+            raise ValueError("OAUTH_CLIENT_SECRET is required to sign OAuth states")
+        # get_database is resolved on the first callback, not at login.
+        return _DatabaseStateStore(get_database, secret)
+    return _StateStore()
+
+
+def _build_session_versions():
+    if _state_backend() == "database":
+        from backend.resources import get_database
+
+        return _DatabaseSessionVersions(get_database())
+    return _SessionVersions()
+
+
+def _get_state_store():
+    global _STATE_STORE
+    if _STATE_STORE is None:
+        with _STATE_STORE_LOCK:
+            if _STATE_STORE is None:
+                _STATE_STORE = _build_state_store()
+    return _STATE_STORE
+
+
+def _get_session_versions():
+    global _SESSION_VERSIONS
+    if _SESSION_VERSIONS is None:
+        with _STATE_STORE_LOCK:
+            if _SESSION_VERSIONS is None:
+                _SESSION_VERSIONS = _build_session_versions()
+    return _SESSION_VERSIONS
 
 
 class OAuthHandler:
@@ -45,12 +219,158 @@ class OAuthHandler:
         self.authorize_url = f"{self.openid_provider_url}/oauth/authorize"
         self.token_url = f"{self.openid_provider_url}/oauth/token"
 
+        # Persistent sessions need their own key; without one, users sign in
+        # again for every new browser session.
+        self.session_secret = os.getenv("SESSION_SECRET")
+
+        self._provider_config = None
+        self._jwks_client = None
+        self._jwks_lock = Lock()
+        # token -> (user_info, session version, expiry)
+        self._sessions: OrderedDict[str, tuple[Dict, int, float]] = OrderedDict()
+        self._sessions_lock = Lock()
+
     def is_configured(self) -> bool:
         return self.oauth_available
 
+    def _get_provider_config(self) -> Dict:
+        if self._provider_config is None:
+            import requests
+
+            response = requests.get(
+                f"{self.openid_provider_url}/.well-known/openid-configuration",
+                timeout=10,
+            )
+            response.raise_for_status()
+            self._provider_config = response.json()
+        return self._provider_config
+
+    def _get_jwks_client(self):
+        if self._jwks_client is not None:
+            return self._jwks_client
+
+        with self._jwks_lock:
+            if self._jwks_client is None:
+                from jwt import PyJWKClient
+
+                jwks_uri = (
+                    os.getenv("OPENID_JWKS_URL")
+                    or self._get_provider_config()["jwks_uri"]
+                )
+                # PyJWKClient refetches the key set when it sees an unknown
+                # "kid", which covers provider key rotation.
+                self._jwks_client = PyJWKClient(
+                    jwks_uri, cache_jwk_set=True, lifespan=JWKS_CACHE_SECONDS
+                )
+        return self._jwks_client
+
+    def _verify_id_token(self, id_token: str) -> Dict:
+        import jwt
+
+        signing_key = self._get_jwks_client().get_signing_key_from_jwt(id_token)
+        issuer = self._get_provider_config().get("issuer", self.openid_provider_url)
+        return jwt.decode(
+            id_token,
+            signing_key.key,
+            algorithms=ID_TOKEN_ALGORITHMS,
+            audience=self.client_id,
+            issuer=issuer,
+        )
+
+    def issue_session_token(self, user_info: Dict) -> str:
+        import jwt
+
+        now = int(time.time())
+        payload = {
+            "sub": user_info["user_id"],
+            "name": user_info.get("username"),
+            "iat": now,
+            "exp": now + SESSION_TTL_SECONDS,
+            "ver": _get_session_versions().get(user_info["user_id"]),
+        }
+        return jwt.encode(payload, self.session_secret, algorithm="HS256")
+
+    def _verify_session_token(self, token: str) -> Optional[Dict]:
+        decoded = self._decode_session_token(token)
+        if decoded is None:
+            return None
+        user_info, version = decoded
+        # Checked on every restore, cached or not, so a logout elsewhere
+        # takes effect immediately.
+        if version != _get_session_versions().get(user_info["user_id"]):
+            return None
+        return user_info
+
+    def _decode_session_token(self, token: str) -> Optional[tuple[Dict, int]]:
+        now = time.time()
+        with self._sessions_lock:
+            cached = self._sessions.get(token)
+            if cached is not None:
+                user_info, version, expires_at = cached
+                if expires_at > now:
+                    self._sessions.move_to_end(token)
+                    return user_info, version
+                del self._sessions[token]
+
+        import jwt
+
+        try:
+            payload = jwt.decode(
+                token,
+                self.session_secret,
+                algorithms=["HS256"],
+                options={"require": ["sub", "exp", "ver"]},
+            )
+        except jwt.InvalidTokenError:
+            return None
+
+        user_info = {
+            "user_id": payload["sub"],
+            "username": payload.get("name") or payload["sub"],
+        }
+        version = payload["ver"]
+        with self._sessions_lock:
+            self._sessions[token] = (user_info, version, payload["exp"])
+            if len(self._sessions) > MAX_CACHED_SESSIONS:
+                self._sessions.popitem(last=False)
+        return user_info, version
+
+    def restore_session(self, token: Optional[str]) -> Optional[Dict]:
+        if not token or not self.session_secret:
+            return None
+
+        user_info = self._verify_session_token(token)
+        if user_info is None:
+            return None
+
+        st.session_state.user_info = dict(user_info)
+        st.session_state.authenticated = True
+        return user_info
+
+    def read_session_cookie(self) -> Optional[str]:
+        try:
+            return st.context.cookies.get(SESSION_COOKIE_NAME)
+        except Exception:
+            return None
+
+    def _write_cookie(self, value: str, max_age: int):
+        import streamlit.components.v1 as components
+
+        components.html(
+            "<script>window.parent.document.cookie = "
+            f"'{SESSION_COOKIE_NAME}={value}; path=/; max-age={max_age}; "
+            "SameSite=Lax; Secure';</script>",
+            height=0,
+        )
+
+    def write_session_cookie(self, token: str):
+        self._write_cookie(token, SESSION_TTL_SECONDS)
+
+    def clear_session_cookie(self):
+        self._write_cookie("", 0)
+
     def generate_authorization_url(self, redirect_uri: str) -> tuple[str, str]:
-        state = secrets.token_urlsafe(32)
-        _STATE_STORE.add(state)
+        state = _get_state_store().issue()
 
         params = {
             "client_id": self.client_id,
@@ -68,10 +388,13 @@ class OAuthHandler:
     def handle_callback(
         self, code: str, state: str, redirect_uri: str
     ) -> Optional[Dict]:
-        if not _STATE_STORE.consume(state):
+        if not _get_state_store().consume(state):
             st.error("Invalid OAuth state. Please try logging in again.")
             return None
 
+        import jwt
+        import requests
+
         try:
             token_data = {
                 "grant_type": "authorization_code",
@@ -90,12 +413,7 @@ class OAuthHandler:
                 st.error("No ID token received from OAuth provider.")
                 return None
 
-            decoded_token = jwt.decode(
-                id_token,
-                options={
-                    "verify_signature": False
-                },
-            )
+            decoded_token = self._verify_id_token(id_token)
 
             user_id = decoded_token.get("sub") or decoded_token.get(
                 "preferred_username"
@@ -117,6 +435,9 @@ class OAuthHandler:
                 "access_token": tokens.get("access_token"),
             }
 
+            if self.session_secret:
+                user_info["session_token"] = self.issue_session_token(user_info)
+
             st.session_state.user_info = user_info
             st.session_state.authenticated = True
 
@@ -125,8 +446,11 @@ class OAuthHandler:
         except requests.exceptions.RequestException as e:
             st.error(f"Error exchanging OAuth code: {str(e)}")
             return None
-        except jwt.DecodeError as e:
-            st.error(f"Error decoding ID token: {str(e)}")
+        except jwt.PyJWKClientError as e:
+            st.error(f"Error fetching OAuth signing keys: {str(e)}")
+            return None
+        except jwt.InvalidTokenError as e:
+            st.error(f"Error verifying ID token: {str(e)}")
             return None
         except Exception as e:
             st.error(f"Unexpected error during OAuth callback: {str(e)}")
@@ -144,6 +468,10 @@ class OAuthHandler:
         return None
 
     def logout(self):
+        user_id = self.get_user_id()
+        if user_id:
+            # Revokes every session token issued to the user so far.
+            _get_session_versions().bump(user_id)
         if "user_info" in st.session_state:
             del st.session_state.user_info
         if "authenticated" in st.session_state:
@@ -0,0 +1,154 @@
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from backend.query_expansion import reciprocal_rank_fusion
+
+DEFAULT_MAX_TURNS = 4
+HISTORY_ANSWER_CHARS = 300
+# Share of a follow-up's content words that must already appear in the cached
+# chunks for it to be answered without another search.
+CACHED_COVERAGE_THRESHOLD = 0.6
+# A question with a follow-up marker ("it", "that", "what about") only
+# continues the thread if at most this share of its content words are new to
+# the previous turn; otherwise the marker is incidental and it gets a fresh
+# search.
+FOLLOW_UP_NEW_TERM_SHARE = 0.5
+
+_WORD = re.compile(r"[a-z0-9]+")
+_FOLLOW_UP_MARKERS = re.compile(
+    r"^\s*(?:and|also|so|then|what about|how about)\b"
+    r"|\b(?:it|its|this|that|these|those|they|them|their|above|previous|earlier"
+    r"|former|latter|first|second|third|last|same)\b",
+    re.IGNORECASE,
+)
+_STOPWORDS = frozenset(
+    "the and for are was were what which who whom how why when where does did "
+    "can could would should about with from into than then also this that these "
+    "those they them their its there here have has had not but you your our more "
+    "most some any all each other paper papers first second third last same "
+    "previous earlier above former latter tell explain describe".split()
+)
+
+
+def _content_terms(text: str) -> set:
+    return {
+        word
+        for word in _WORD.findall(text.lower())
+        if len(word) > 2 and word not in _STOPWORDS
+    }
+
+
+class Turn:
+    __slots__ = ("question", "answer", "results")
+
+    def __init__(self, question: str, answer: str, results: List[Dict]):
+        self.question = question
+        self.answer = answer
+        self.results = results
+
+
+class ConversationSession:
+    def __init__(self, rag_engine, max_turns: int = None):
+        self.rag_engine = rag_engine
+        self.max_turns = max_turns or int(
+            os.getenv("CONVERSATION_MAX_TURNS", str(DEFAULT_MAX_TURNS))
+        )
+        self.turns: "deque[Turn]" = deque(maxlen=self.max_turns)
+        self.topic: Optional[str] = None
+
+    def reset(self):
+        self.turns.clear()
+        self.topic = None
+
+    def cached_results(self) -> List[Dict]:
+        seen = set()
+        results = []
+        for turn in reversed(self.turns):
+            for result in turn.results:
+                key = result.get("id", id(result))
+                if key not in seen:
+                    seen.add(key)
+                    results.append(result)
+        return results
+
+    def is_follow_up(self, question: str) -> bool:
+        if not self.turns or not _FOLLOW_UP_MARKERS.search(question):
+            return False
+        terms = _content_terms(question)
+        if not terms:
+            return True
+        previous = self.turns[-1]
+        context = _content_terms(previous.question) | _content_terms(previous.answer)
+        for result in previous.results:
+            context |= _content_terms(result.get("text", ""))
+        return len(terms - context) <= FOLLOW_UP_NEW_TERM_SHARE * len(terms)
+
+    def _coverage(self, terms: set, results: List[Dict]) -> float:
+        if not terms:
+            return 1.0
+        cached_terms = set()
+        for result in results:
+            cached_terms |= _content_terms(result.get("text", ""))
+        return len(terms & cached_terms) / len(terms)
+
+    def plan(self, question: str) -> str:
+        if not self.is_follow_up(question):
+            return "search"
+        terms = _content_terms(question)
+        if self._coverage(terms, self.cached_results()) >= CACHED_COVERAGE_THRESHOLD:
+            return "cached"
+        return "incremental"
+
+    def _rank_cached(self, question: str, top_k: int) -> List[Dict]:
+        terms = _content_terms(question)
+        cached = self.cached_results()
+        if not terms:
+            return cached[:top_k]
+        return sorted(
+            cached,
+            key=lambda result: len(terms & _content_terms(result.get("text", ""))),
+            reverse=True,
+        )[:top_k]
+
+    def retrieve(
+        self, question: str, top_k: int = 5, queries: Optional[List[str]] = None
+    ) -> Dict:
+        mode = self.plan(question)
+
+        if mode == "cached":
+            start_time = time.perf_counter()
+            results = self._rank_cached(question, top_k)
+            time_taken = int((time.perf_counter() - start_time) * 1000)
+            return {"results": results, "time_taken": time_taken, "mode": mode}
+
+        if mode == "incremental":
+            # Prefix the question that started the thread so references like
+            # "it" or "the second paper" still match, then merge with the cache.
+            contextual_query = f"{self.topic or self.turns[-1].question} {question}"
+            response = self.rag_engine.search(contextual_query, top_k=top_k)
+            results = reciprocal_rank_fusion(
+                [response["results"], self._rank_cached(question, top_k)], top_k
+            )
+            return {**response, "results": results, "mode": mode}
+
+        self.topic = question
+        if queries and len(queries) > 1:
+            response = self.rag_engine.multi_search(queries, top_k=top_k)
+        else:
+            response = self.rag_engine.search_page(question, page_size=top_k)
+        return {**response, "mode": mode}
+
+    def record(self, question: str, answer: str, results: List[Dict]):
+        self.turns.append(Turn(question, answer, results))
+
+    def history(self) -> str:
+        lines = []
+        for turn in self.turns:
+            answer = turn.answer
+            if len(answer) > HISTORY_ANSWER_CHARS:
+                answer = answer[:HISTORY_ANSWER_CHARS] + "..."
+            lines.append(f"Q: {turn.question}\nA: {answer}")
+        return "\n\n".join(lines)
@@ -1,22 +1,36 @@
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Set
 
 from sqlalchemy import (
     Column,
     DateTime,
+    Float,
     Index,
     Integer,
     String,
+    Text,
+    UniqueConstraint,
     create_engine,
+    delete,
     func,
+    select,
 )
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 Base = declarative_base()
 
+INSERT_BATCH_SIZE = 1000
+# Keeps IN (...) lists under SQLite's bound-parameter limit.
+DELETE_BATCH_SIZE = 500
+
+
+def _utcnow() -> datetime:
+    # Timestamp columns hold naive UTC, as datetime.utcnow() used to return.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class IndexedDocument(Base):
     __tablename__ = "indexed_documents"
@@ -25,7 +39,7 @@ class IndexedDocument(Base):
     document_id = Column(String, unique=True, nullable=False, index=True)
     user_id = Column(String, nullable=False, index=True)
     filename = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=_utcnow)
 
     __table_args__ = (
         Index("idx_user_id", "user_id"),
@@ -33,6 +47,74 @@ class IndexedDocument(Base):
     )
 
 
+class OAuthState(Base):
+    """Signed OAuth states already consumed, kept until they expire so a
+    callback cannot be replayed."""
+
+    __tablename__ = "oauth_states"
+
+    state = Column(String, primary_key=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+class SessionVersion(Base):
+    """Bumped on logout; session tokens issued under an older version are
+    rejected."""
+
+    __tablename__ = "session_versions"
+
+    user_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+class ChunkSummary(Base):
+    __tablename__ = "chunk_summaries"
+
+    document_id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    keywords = Column(String, nullable=False)
+
+    __table_args__ = (Index("idx_chunk_summaries_user_file", "user_id", "filename"),)
+
+
+class FileSummary(Base):
+    __tablename__ = "file_summaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    keywords = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=_utcnow)
+
+    __table_args__ = (UniqueConstraint("user_id", "filename"),)
+
+
+class PendingUpload(Base):
+    """Ids written to the vector namespace whose local row may not exist yet.
+
+    A row is added before each upload and removed once the upload is recorded
+    in ``indexed_documents``; one left behind marks a possible orphan.
+    """
+
+    __tablename__ = "pending_uploads"
+
+    document_id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+    namespace = Column(String, nullable=False)
+    created_at = Column(DateTime, default=_utcnow, index=True)
+
+
 class Database:
 
     def __init__(self, db_path: str = "data/indexed_documents.db"):
@@ -42,6 +124,7 @@ class Database:
         if connection_string:
             self.db_path = None
             self.connection_string = connection_string
+            engine_kwargs["pool_pre_ping"] = True
         else:
             db_dir = Path(db_path).parent
             db_dir.mkdir(parents=True, exist_ok=True)
@@ -58,12 +141,48 @@ class Database:
     def _get_session(self) -> Session:
         return self.SessionLocal()
 
+    def _insert_ignoring_conflicts(self, table):
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert(table).on_conflict_do_nothing()
+
     def add_documents(
         self, user_id: str, document_ids: List[str], filename: str
     ) -> None:
         if not document_ids:
             return
 
+        statement = self._insert_ignoring_conflicts(IndexedDocument.__table__)
+        if statement is None:
+            self._add_documents_individually(user_id, document_ids, filename)
+            return
+
+        created_at = _utcnow()
+        session = self._get_session()
+        try:
+            for start in range(0, len(document_ids), INSERT_BATCH_SIZE):
+                rows = [
+                    {
+                        "document_id": doc_id,
+                        "user_id": user_id,
+                        "filename": filename,
+                        "created_at": created_at,
+                    }
+                    for doc_id in document_ids[start : start + INSERT_BATCH_SIZE]
+                ]
+                session.execute(statement, rows)
+                session.commit()
+        finally:
+            session.close()
+
+    def _add_documents_individually(
+        self, user_id: str, document_ids: List[str], filename: str
+    ) -> None:
         session = self._get_session()
         try:
             documents = [
@@ -117,6 +236,57 @@ class Database:
         finally:
             session.close()
 
+    def get_user_documents(self, user_id: str) -> List[Dict[str, str]]:
+        session = self._get_session()
+        try:
+            results = (
+                session.query(IndexedDocument.document_id, IndexedDocument.filename)
+                .filter(IndexedDocument.user_id == user_id)
+                .order_by(IndexedDocument.id)
+                .all()
+            )
+            return [
+                {"document_id": row.document_id, "filename": row.filename}
+                for row in results
+            ]
+        finally:
+            session.close()
+
+    def get_file_document_ids(self, user_id: str, filename: str) -> List[str]:
+        session = self._get_session()
+        try:
+            results = (
+                session.query(IndexedDocument.document_id)
+                .filter(
+                    IndexedDocument.user_id == user_id,
+                    IndexedDocument.filename == filename,
+                )
+                .all()
+            )
+            return [row.document_id for row in results]
+        finally:
+            session.close()
+
+    def delete_file_documents(self, user_id: str, filename: str) -> int:
+        session = self._get_session()
+        try:
+            deleted_count = (
+                session.query(IndexedDocument)
+                .filter(
+                    IndexedDocument.user_id == user_id,
+                    IndexedDocument.filename == filename,
+                )
+                .delete(synchronize_session=False)
+            )
+            for model in (ChunkSummary, FileSummary):
+                session.query(model).filter(
+                    model.user_id == user_id, model.filename == filename
+                ).delete(synchronize_session=False)
+            session.commit()
+            return deleted_count
+        finally:
+            session.close()
+
     def delete_user_documents(self, user_id: str) -> int:
         session = self._get_session()
         try:
@@ -125,27 +295,205 @@ class Database:
                 .filter(IndexedDocument.user_id == user_id)
                 .delete()
             )
+            for model in (ChunkSummary, FileSummary):
+                session.query(model).filter(model.user_id == user_id).delete(
+                    synchronize_session=False
+                )
             session.commit()
             return deleted_count
         finally:
             session.close()
 
-    def delete_document_ids(self, document_ids: List[str]) -> int:
+    def delete_document_ids(
+        self, document_ids: List[str], created_before: datetime = None
+    ) -> int:
         if not document_ids:
             return 0
 
         session = self._get_session()
         try:
-            deleted_count = (
-                session.query(IndexedDocument)
-                .filter(IndexedDocument.document_id.in_(document_ids))
-                .delete(synchronize_session=False)
-            )
+            deleted_count = 0
+            for start in range(0, len(document_ids), DELETE_BATCH_SIZE):
+                batch = document_ids[start : start + DELETE_BATCH_SIZE]
+                statement = delete(IndexedDocument).where(
+                    IndexedDocument.document_id.in_(batch)
+                )
+                if created_before is not None:
+                    statement = statement.where(
+                        IndexedDocument.created_at < created_before
+                    )
+                result = session.execute(statement)
+                deleted_count += result.rowcount
+                session.execute(
+                    delete(ChunkSummary).where(ChunkSummary.document_id.in_(batch))
+                )
             session.commit()
             return deleted_count
         finally:
             session.close()
 
+    def iter_document_pages(
+        self, page_size: int, created_before: datetime = None
+    ) -> Iterator[List[Dict[str, str]]]:
+        # Keyset pagination, so each page is a short query and rows inserted
+        # meanwhile neither shift nor repeat pages.
+        last_id = 0
+        while True:
+            session = self._get_session()
+            try:
+                query = session.query(
+                    IndexedDocument.id,
+                    IndexedDocument.document_id,
+                    IndexedDocument.user_id,
+                ).filter(IndexedDocument.id > last_id)
+                if created_before is not None:
+                    query = query.filter(IndexedDocument.created_at < created_before)
+                results = query.order_by(IndexedDocument.id).limit(page_size).all()
+            finally:
+                session.close()
+
+            if not results:
+                return
+            last_id = results[-1].id
+            yield [
+                {"document_id": row.document_id, "user_id": row.user_id}
+                for row in results
+            ]
+
+    def get_existing_document_ids(self, document_ids: List[str]) -> Set[str]:
+        session = self._get_session()
+        try:
+            existing = set()
+            for start in range(0, len(document_ids), DELETE_BATCH_SIZE):
+                batch = document_ids[start : start + DELETE_BATCH_SIZE]
+                results = session.query(IndexedDocument.document_id).filter(
+                    IndexedDocument.document_id.in_(batch)
+                )
+                existing.update(row.document_id for row in results)
+            return existing
+        finally:
+            session.close()
+
+    def get_foreign_document_ids(
+        self, user_id: str, document_ids: List[str]
+    ) -> Set[str]:
+        session = self._get_session()
+        try:
+            foreign = set()
+            for start in range(0, len(document_ids), DELETE_BATCH_SIZE):
+                batch = document_ids[start : start + DELETE_BATCH_SIZE]
+                results = session.query(IndexedDocument.document_id).filter(
+                    IndexedDocument.document_id.in_(batch),
+                    IndexedDocument.user_id != user_id,
+                )
+                foreign.update(row.document_id for row in results)
+            return foreign
+        finally:
+            session.close()
+
+    def add_pending_uploads(
+        self, user_id: str, namespace: str, document_ids: List[str]
+    ) -> None:
+        if not document_ids:
+            return
+
+        created_at = _utcnow()
+        rows = [
+            {
+                "document_id": doc_id,
+                "user_id": user_id,
+                "namespace": namespace,
+                "created_at": created_at,
+            }
+            for doc_id in document_ids
+        ]
+        statement = self._insert_ignoring_conflicts(PendingUpload.__table__)
+        session = self._get_session()
+        try:
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                batch = rows[start : start + INSERT_BATCH_SIZE]
+                # Re-uploading an id (e.g. re-indexing a file) restarts its
+                # grace period rather than keeping the old timestamp.
+                session.execute(
+                    delete(PendingUpload).where(
+                        PendingUpload.document_id.in_(
+                            [row["document_id"] for row in batch]
+                        )
+                    )
+                )
+                if statement is None:
+                    for row in batch:
+                        session.merge(PendingUpload(**row))
+                else:
+                    session.execute(statement, batch)
+            session.commit()
+        finally:
+            session.close()
+
+    def clear_pending_uploads(
+        self, document_ids: List[str], created_before: datetime = None
+    ) -> int:
+        if not document_ids:
+            return 0
+
+        session = self._get_session()
+        try:
+            deleted_count = 0
+            for start in range(0, len(document_ids), DELETE_BATCH_SIZE):
+                batch = document_ids[start : start + DELETE_BATCH_SIZE]
+                statement = delete(PendingUpload).where(
+                    PendingUpload.document_id.in_(batch)
+                )
+                if created_before is not None:
+                    statement = statement.where(
+                        PendingUpload.created_at < created_before
+                    )
+                result = session.execute(statement)
+                deleted_count += result.rowcount
+            session.commit()
+            return deleted_count
+        finally:
+            session.close()
+
+    def get_pending_uploads(
+        self,
+        namespace: str,
+        created_before: datetime,
+        limit: int,
+        after_document_id: str = None,
+    ) -> List[Dict[str, str]]:
+        session = self._get_session()
+        try:
+            query = session.query(
+                PendingUpload.document_id, PendingUpload.user_id
+            ).filter(
+                PendingUpload.namespace == namespace,
+                PendingUpload.created_at < created_before,
+            )
+            if after_document_id is not None:
+                query = query.filter(PendingUpload.document_id > after_document_id)
+            results = query.order_by(PendingUpload.document_id).limit(limit).all()
+            return [
+                {"document_id": row.document_id, "user_id": row.user_id}
+                for row in results
+            ]
+        finally:
+            session.close()
+
+    def get_pending_document_ids(self, document_ids: List[str]) -> Set[str]:
+        session = self._get_session()
+        try:
+            pending = set()
+            for start in range(0, len(document_ids), DELETE_BATCH_SIZE):
+                batch = document_ids[start : start + DELETE_BATCH_SIZE]
+                results = session.query(PendingUpload.document_id).filter(
+                    PendingUpload.document_id.in_(batch)
+                )
+                pending.update(row.document_id for row in results)
+            return pending
+        finally:
+            session.close()
+
     def get_user_document_count(self, user_id: str) -> int:
         session = self._get_session()
         try:
@@ -158,6 +506,209 @@ class Database:
         finally:
             session.close()
 
+    def add_chunk_summaries(self, rows: List[Dict[str, str]]) -> None:
+        if not rows:
+            return
+
+        session = self._get_session()
+        try:
+            ids = [row["document_id"] for row in rows]
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                session.execute(
+                    delete(ChunkSummary).where(
+                        ChunkSummary.document_id.in_(
+                            ids[start : start + DELETE_BATCH_SIZE]
+                        )
+                    )
+                )
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                session.execute(
+                    ChunkSummary.__table__.insert(),
+                    rows[start : start + INSERT_BATCH_SIZE],
+                )
+            session.commit()
+        finally:
+            session.close()
+
+    def get_chunk_summaries(self, user_id: str, filename: str) -> List[Dict[str, str]]:
+        session = self._get_session()
+        try:
+            results = (
+                session.query(ChunkSummary.summary, ChunkSummary.keywords)
+                .filter(
+                    ChunkSummary.user_id == user_id,
+                    ChunkSummary.filename == filename,
+                )
+                .order_by(ChunkSummary.document_id)
+                .all()
+            )
+            return [
+                {"summary": row.summary, "keywords": row.keywords} for row in results
+            ]
+        finally:
+            session.close()
+
+    def set_file_summary(
+        self, user_id: str, filename: str, summary: str, keywords: str
+    ) -> None:
+        session = self._get_session()
+        try:
+            file_summary = (
+                session.query(FileSummary)
+                .filter(FileSummary.user_id == user_id, FileSummary.filename == filename)
+                .first()
+            )
+            if file_summary is None:
+                file_summary = FileSummary(user_id=user_id, filename=filename)
+                session.add(file_summary)
+            file_summary.summary = summary
+            file_summary.keywords = keywords
+            file_summary.updated_at = _utcnow()
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another worker created the row first; its summary is as good.
+                session.rollback()
+        finally:
+            session.close()
+
+    def get_file_summaries(self, user_id: str) -> List[Dict[str, str]]:
+        session = self._get_session()
+        try:
+            results = (
+                session.query(
+                    FileSummary.filename, FileSummary.summary, FileSummary.keywords
+                )
+                .filter(FileSummary.user_id == user_id)
+                .order_by(FileSummary.filename)
+                .all()
+            )
+            return [
+                {
+                    "filename": row.filename,
+                    "summary": row.summary,
+                    "keywords": row.keywords.split(),
+                }
+                for row in results
+            ]
+        finally:
+            session.close()
+
+    def record_oauth_state(self, state: str, expires_at: float) -> bool:
+        """Records a consumed state; False if it was already recorded."""
+        session = self._get_session()
+        try:
+            session.add(OAuthState(state=state, expires_at=expires_at))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                return False
+            return True
+        finally:
+            session.close()
+
+    def purge_oauth_states(self, now: float, max_states: int, limit: int) -> int:
+        """Deletes up to ``limit`` expired states, then the oldest states
+        beyond ``max_states``. Both walk the ``expires_at`` index rather than
+        counting the table."""
+        session = self._get_session()
+        try:
+            expired = (
+                select(OAuthState.state)
+                .where(OAuthState.expires_at <= now)
+                .order_by(OAuthState.expires_at)
+                .limit(limit)
+                .scalar_subquery()
+            )
+            deleted_count = session.execute(
+                delete(OAuthState).where(OAuthState.state.in_(expired))
+            ).rowcount
+            # States share one TTL, so the newest max_states expire last.
+            boundary = session.execute(
+                select(OAuthState.expires_at)
+                .order_by(OAuthState.expires_at.desc())
+                .offset(max_states)
+                .limit(1)
+            ).scalar()
+            if boundary is not None:
+                deleted_count += session.execute(
+                    delete(OAuthState).where(OAuthState.expires_at <= boundary)
+                ).rowcount
+            session.commit()
+            return deleted_count
+        finally:
+            session.close()
+
+    def get_session_version(self, user_id: str) -> int:
+        session = self._get_session()
+        try:
+            row = session.get(SessionVersion, user_id)
+            return row.version if row is not None else 0
+        finally:
+            session.close()
+
+    def bump_session_version(self, user_id: str) -> int:
+        session = self._get_session()
+        try:
+            row = (
+                session.query(SessionVersion)
+                .filter(SessionVersion.user_id == user_id)
+                .with_for_update()
+                .one_or_none()
+            )
+            if row is None:
+                session.add(SessionVersion(user_id=user_id, version=1))
+                try:
+                    session.commit()
+                    return 1
+                except IntegrityError:
+                    # Another worker logged the same user out first.
+                    session.rollback()
+                    return self.bump_session_version(user_id)
+
+            row.version += 1
+            version = row.version
+            session.commit()
+            return version
+        finally:
+            session.close()
+
+    def take_rate_limit_token(
+        self, key: str, rate: float, burst: float, now: float
+    ) -> float:
+        session = self._get_session()
+        try:
+            bucket = (
+                session.query(RateLimitBucket)
+                .filter(RateLimitBucket.key == key)
+                .with_for_update()
+                .one_or_none()
+            )
+            if bucket is None:
+                session.add(RateLimitBucket(key=key, tokens=burst - 1, updated_at=now))
+                try:
+                    session.commit()
+                    return 0.0
+                except IntegrityError:
+                    # Another worker created the bucket first; charge that one.
+                    session.rollback()
+                    return self.take_rate_limit_token(key, rate, burst, now)
+
+            tokens = min(burst, bucket.tokens + max(now - bucket.updated_at, 0) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+
+            bucket.tokens = tokens
+            bucket.updated_at = max(now, bucket.updated_at)
+            session.commit()
+            return retry_after
+        finally:
+            session.close()
+
     def close(self):
         if self.engine:
             self.engine.dispose()
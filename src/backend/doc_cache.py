@@ -0,0 +1,161 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional, Tuple
+
+# Bump whenever extraction or cleaning changes so stale entries are dropped.
+PARSER_VERSION = "1"
+
+DEFAULT_CACHE_DIR = "data/doc_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DocumentCache:
+    def __init__(
+        self,
+        cache_dir: str = None,
+        max_bytes: int = None,
+        parser_version: str = PARSER_VERSION,
+    ):
+        root = Path(cache_dir or os.getenv("DOC_CACHE_DIR", DEFAULT_CACHE_DIR))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("DOC_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+
+        self.root = root
+        self.cache_dir = root / f"v{parser_version}"
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._purge_stale_versions()
+            self._total_bytes = self._scan_size()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def content_key(file_content: bytes) -> str:
+        return hashlib.sha256(file_content).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        entry_dir = self.cache_dir / key[:2]
+        return entry_dir / f"{key}.txt", entry_dir / f"{key}.json"
+
+    @staticmethod
+    def _version_number(name: str) -> Optional[int]:
+        if name.startswith("v") and name[1:].isdigit():
+            return int(name[1:])
+        return None
+
+    def _purge_stale_versions(self):
+        # Only older versions: during a rolling deploy a worker still on the
+        # old parser must not delete the cache of one already upgraded.
+        current = self._version_number(self.cache_dir.name)
+        if current is None:
+            return
+        for entry in self.root.iterdir():
+            version = self._version_number(entry.name)
+            if entry.is_dir() and version is not None and version < current:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for text_path in self.cache_dir.glob("*/*.txt"):
+            try:
+                stat = text_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, text_path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def get(self, key: str) -> Optional[Tuple[str, List[int]]]:
+        if not self.enabled:
+            return None
+
+        text_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            with open(text_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    text = ""
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        with memoryview(mm) as view:
+                            text = str(view, "utf-8")
+            # mtime doubles as the LRU clock; atime is unreliable on noatime mounts.
+            os.utime(text_path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return text, meta["page_offsets"]
+
+    def put(self, key: str, text: str, page_offsets: List[int]):
+        if not self.enabled:
+            return
+
+        text_path, meta_path = self._paths(key)
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        # Write-then-rename keeps readers in other workers from seeing partial
+        # files; unique temp names keep concurrent writers of one key apart.
+        tmp_meta = self._write_temp(
+            meta_path, json.dumps({"page_offsets": page_offsets}).encode()
+        )
+        try:
+            tmp_text = self._write_temp(text_path, data)
+        except BaseException:
+            os.unlink(tmp_meta)
+            raise
+
+        with self._lock:
+            try:
+                replaced = text_path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_meta, meta_path)
+            os.replace(tmp_text, text_path)
+
+            self._total_bytes += len(data) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    @staticmethod
+    def _write_temp(path: Path, data: bytes) -> str:
+        f = tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False
+        )
+        try:
+            with f:
+                f.write(data)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+        return f.name
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+
+        for _, size, text_path in entries:
+            if total <= target:
+                break
+            text_path.unlink(missing_ok=True)
+            text_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+
+        self._total_bytes = total
@@ -0,0 +1,193 @@
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import List, Tuple
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+class _EmbeddingRequest:
+    __slots__ = ("texts", "future", "taken", "parts")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        # Requests larger than a batch are embedded a slice at a time.
+        self.taken = 0
+        self.parts = []
+
+    def take(self, limit: int) -> Tuple[int, int]:
+        start = self.taken
+        self.taken = min(len(self.texts), start + limit)
+        return start, self.taken
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        model_name: str = None,
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+        runtime: str = None,
+        quantize: bool = None,
+    ):
+        self.model_name = model_name or os.getenv(
+            "EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL
+        )
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("EMBEDDING_BATCH_SIZE", str(DEFAULT_MAX_BATCH_SIZE))
+        )
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("EMBEDDING_MAX_WAIT_MS", str(DEFAULT_MAX_WAIT_MS)))
+        self.max_wait_seconds = max_wait_ms / 1000
+        # "torch", or "onnx"/"openvino" for the sentence-transformers CPU runtimes.
+        self.runtime = (runtime or os.getenv("EMBEDDING_RUNTIME", "torch")).lower()
+        if quantize is None:
+            quantize = os.getenv("EMBEDDING_QUANTIZE", "").lower() in ("1", "true")
+        self.quantize = quantize
+
+        self._model = None
+        self._model_lock = Lock()
+        self._queue: "queue.Queue[_EmbeddingRequest]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = Lock()
+        # Partly embedded requests, touched only by the worker thread.
+        self._carry: "deque[_EmbeddingRequest]" = deque()
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        kwargs = {"device": "cpu"}
+        if self.runtime != "torch":
+            kwargs["backend"] = self.runtime
+        model = SentenceTransformer(self.model_name, **kwargs)
+
+        if self.quantize and self.runtime == "torch":
+            import torch
+
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        return model
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[_EmbeddingRequest, int, int]]:
+        batch = []
+        count = 0
+
+        def add(request: _EmbeddingRequest):
+            nonlocal count
+            start, end = request.take(self.max_batch_size - count)
+            batch.append((request, start, end))
+            count += end - start
+            if request.taken < len(request.texts):
+                self._carry.append(request)
+
+        if self._carry:
+            # Mid-way through a large request: whatever queued meanwhile
+            # (typically single queries) goes first, and the next slice of the
+            # large request fills the rest of the batch.
+            while count < self.max_batch_size:
+                try:
+                    add(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            while count < self.max_batch_size and self._carry:
+                add(self._carry.popleft())
+            return batch
+
+        add(self._queue.get())
+        deadline = time.monotonic() + self.max_wait_seconds
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            add(request)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            texts = [
+                text
+                for request, start, end in batch
+                for text in request.texts[start:end]
+            ]
+            try:
+                vectors = self.model.encode(
+                    texts,
+                    batch_size=self.max_batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                )
+            except Exception as e:
+                for request, _, _ in batch:
+                    request.future.set_exception(e)
+                self._carry = deque(
+                    request for request in self._carry if not request.future.done()
+                )
+                continue
+
+            # Each caller gets a view into the shared batch array, not a copy,
+            # unless its request was split across batches.
+            offset = 0
+            for request, start, end in batch:
+                request.parts.append(vectors[offset : offset + end - start])
+                offset += end - start
+                if end == len(request.texts):
+                    request.future.set_result(self._join(request.parts))
+
+    @staticmethod
+    def _join(parts):
+        if len(parts) == 1:
+            return parts[0]
+        import numpy as np
+
+        return np.concatenate(parts)
+
+    def submit(self, texts: List[str]) -> Future:
+        self._ensure_worker()
+        request = _EmbeddingRequest(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def embed_documents(self, texts: List[str]):
+        if not texts:
+            import numpy as np
+
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self.submit(texts).result()
+
+    def embed_query(self, text: str):
+        return self.submit([text]).result()[0]
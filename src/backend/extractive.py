@@ -0,0 +1,131 @@
+import re
+from typing import Dict, List
+
+DEFAULT_ANSWER_CHARS = 700
+# Sentences whose term sets overlap one already picked by more than this
+# (Jaccard) add nothing new.
+DUPLICATE_OVERLAP = 0.8
+# Small tie-breaker favouring passages the retriever ranked higher.
+RANK_WEIGHT = 0.1
+MIN_SENTENCE_CHARS = 20
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "the and for are was were what which who whom how why when where does did "
+    "can could would should about with from into than then also this that these "
+    "those they them their its there here have has had not but you your our "
+    "been being such per via between among based using used".split()
+)
+
+
+def content_terms(text: str) -> List[str]:
+    return [
+        word
+        for word in _WORD.findall(text.lower())
+        if len(word) > 2 and word not in _STOPWORDS
+    ]
+
+
+def _chunk_source(chunk: Dict) -> str:
+    return chunk.get("source") or chunk.get("metadata", {}).get("source", "Unknown")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [
+        sentence.strip()
+        for sentence in _SENTENCE_BREAK.split(text)
+        if len(sentence.strip()) >= MIN_SENTENCE_CHARS
+    ]
+
+
+def extract_sentences(
+    question: str, context_chunks: List[Dict], max_chars: int = DEFAULT_ANSWER_CHARS
+) -> List[Dict]:
+    question_terms = dict.fromkeys(content_terms(question))
+    vocabulary = {term: index for index, term in enumerate(question_terms)}
+    if not vocabulary:
+        return []
+
+    sentences = []
+    rows = []
+    columns = []
+    lengths = []
+    for chunk_index, chunk in enumerate(context_chunks):
+        for position, sentence in enumerate(split_sentences(chunk.get("text", ""))):
+            row = len(sentences)
+            terms = content_terms(sentence)
+            for term in terms:
+                column = vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+            sentences.append((chunk_index, position, sentence, frozenset(terms)))
+            lengths.append(len(terms))
+
+    if not sentences or not rows:
+        return []
+
+    import numpy as np
+
+    counts = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    np.add.at(counts, (np.asarray(rows), np.asarray(columns)), 1.0)
+
+    present = counts > 0
+    document_frequency = present.sum(axis=0)
+    idf = np.log((len(sentences) + 1) / (document_frequency + 1)) + 1
+    # Saturating term frequency, normalised so long sentences are not favoured.
+    scores = (np.log1p(counts) * idf).sum(axis=1) / np.sqrt(
+        np.maximum(np.asarray(lengths, dtype=np.float32), 1.0)
+    )
+    chunk_ranks = np.fromiter((s[0] for s in sentences), dtype=np.float32)
+    scores *= 1 + RANK_WEIGHT / (1 + chunk_ranks)
+
+    selected = []
+    used = 0
+    for row in np.argsort(-scores):
+        if scores[row] <= 0:
+            break
+        chunk_index, position, sentence, terms = sentences[row]
+        if used + len(sentence) > max_chars and selected:
+            continue
+        if any(
+            len(terms & other[3]) > DUPLICATE_OVERLAP * len(terms | other[3])
+            for other in (sentences[picked] for picked in selected)
+        ):
+            continue
+        selected.append(row)
+        used += len(sentence)
+        if used >= max_chars:
+            break
+
+    # Read in document order rather than score order.
+    selected.sort(key=lambda row: sentences[row][:2])
+    return [
+        {
+            "sentence": sentences[row][2],
+            "chunk_index": sentences[row][0],
+            "source": _chunk_source(context_chunks[sentences[row][0]]),
+            "score": float(scores[row]),
+        }
+        for row in selected
+    ]
+
+
+def extractive_answer(
+    question: str, context_chunks: List[Dict], max_chars: int = DEFAULT_ANSWER_CHARS
+) -> str:
+    sentences = extract_sentences(question, context_chunks, max_chars)
+    if not sentences:
+        return ""
+
+    sources = []
+    for item in sentences:
+        if item["source"] not in sources:
+            sources.append(item["source"])
+
+    # Citation numbers match the rank of the passage in the retrieved list.
+    body = " ".join(
+        f"{item['sentence']} [{item['chunk_index'] + 1}]" for item in sentences
+    )
+    return f"Based on {', '.join(sources)}:\n\n{body}"
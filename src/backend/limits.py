@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+# rate: tokens refilled per second, burst: bucket size, concurrency: in-flight
+# calls per user in one process. Tiers can be overridden with RATE_LIMIT_TIERS.
+DEFAULT_TIERS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "default": {
+        "search": {"rate": 0.5, "burst": 10, "concurrency": 2},
+        "ingest": {"rate": 0.1, "burst": 10, "concurrency": 1},
+        "generate": {"rate": 0.2, "burst": 5, "concurrency": 1},
+    },
+    "unlimited": {},
+}
+
+CONCURRENCY_RETRY_AFTER = 1.0
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, action: str, retry_after: float):
+        self.action = action
+        self.retry_after = retry_after
+        super().__init__(
+            f"Rate limit exceeded for {action}; retry after {retry_after:.1f}s"
+        )
+
+
+class MemoryBucketStore:
+    def __init__(self):
+        self._buckets: Dict[str, tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class DatabaseBucketStore:
+    def __init__(self, db):
+        self.db = db
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        return self.db.take_rate_limit_token(key, rate, burst, now)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        tiers: Optional[Dict] = None,
+        user_tiers: Optional[Dict[str, str]] = None,
+        store=None,
+        store_factory: Optional[Callable[[], Any]] = None,
+    ):
+        if tiers is None:
+            tiers = {**DEFAULT_TIERS, **json.loads(os.getenv("RATE_LIMIT_TIERS", "{}"))}
+        if user_tiers is None:
+            user_tiers = json.loads(os.getenv("RATE_LIMIT_USER_TIERS", "{}"))
+
+        self.tiers = tiers
+        self.user_tiers = user_tiers
+        self.default_tier = os.getenv("RATE_LIMIT_DEFAULT_TIER", "default")
+        # store_factory defers building the store (and any database it opens)
+        # until the first call that actually needs a token.
+        self._store = store
+        self._store_factory = store_factory or MemoryBucketStore
+        self._active: Dict[tuple[str, str], int] = {}
+        self._lock = Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._store_factory()
+        return self._store
+
+    def tier_for(self, user_id: str) -> str:
+        return self.user_tiers.get(user_id, self.default_tier)
+
+    def _limits_for(self, user_id: str, action: str) -> Optional[Dict[str, float]]:
+        return self.tiers.get(self.tier_for(user_id), {}).get(action)
+
+    def _enter(self, key: tuple[str, str], concurrency: float):
+        with self._lock:
+            active = self._active.get(key, 0)
+            if active >= concurrency:
+                raise RateLimitExceeded(key[1], CONCURRENCY_RETRY_AFTER)
+            self._active[key] = active + 1
+
+    def _exit(self, key: tuple[str, str]):
+        with self._lock:
+            active = self._active.get(key, 0) - 1
+            if active > 0:
+                self._active[key] = active
+            else:
+                self._active.pop(key, None)
+
+    @contextmanager
+    def acquire(self, user_id: Optional[str], action: str):
+        limits = self._limits_for(user_id, action) if user_id else None
+        if not limits:
+            yield
+            return
+
+        key = (user_id, action)
+        self._enter(key, limits.get("concurrency", float("inf")))
+        try:
+            retry_after = self.store.take(
+                f"{user_id}:{action}", limits["rate"], limits["burst"], time.time()
+            )
+            if retry_after > 0:
+                raise RateLimitExceeded(action, retry_after)
+            yield
+        finally:
+            self._exit(key)
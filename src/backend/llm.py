@@ -1,37 +1,137 @@
 import os
-from typing import Dict, List
+import time
+from contextlib import nullcontext
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional
 
-import requests
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+
+from backend.extractive import extractive_answer
+from backend.limits import RateLimitExceeded
+from backend.routing import EndpointRouter
+from backend.singleflight import SingleFlight
 
 load_dotenv()
 
+GENERATION_APIS = ("chat", "text_generation")
+SUB_QUERY_MAX_TOKENS = 128
+
+_GENERATION_FLIGHTS = SingleFlight()
+
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, limiter=None, local_generator=None):
         self.token = os.getenv("HF_TOKEN", "")
         self.model_name = os.getenv(
             "HF_LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2"
         )
-        self.client = None
-        try:
-            if self.token:
-                self.client = InferenceClient(
-                    model=self.model_name, token=self.token, timeout=60
-                )
-        except Exception:
-            self.client = None
+        # Comma-separated fallbacks; the router picks the fastest healthy one.
+        self.models = [
+            model.strip()
+            for model in os.getenv("HF_LLM_MODELS", self.model_name).split(",")
+            if model.strip()
+        ]
+        # Optional self-hosted (TGI / OpenAI-compatible) endpoint URL.
+        self.local_endpoint = os.getenv("LLM_LOCAL_ENDPOINT", "")
+        self.limiter = limiter
+        self.local_generator = local_generator
+
+        endpoints = []
+        if self.token:
+            endpoints += [
+                (model, api) for model in self.models for api in GENERATION_APIS
+            ]
+        if self.local_endpoint:
+            endpoints += [(self.local_endpoint, api) for api in GENERATION_APIS]
+        if local_generator is not None:
+            endpoints.append((local_generator.model_name, "transformers"))
+        self.router = EndpointRouter(endpoints)
+
+        self._clients: Dict[str, object] = {}
+        self._client_lock = Lock()
+
+    def _client_for(self, model: str):
+        if model in self._clients:
+            return self._clients[model]
+
+        with self._client_lock:
+            if model not in self._clients:
+                try:
+                    from huggingface_hub import InferenceClient
+
+                    self._clients[model] = InferenceClient(
+                        model=model, token=self.token or None, timeout=60
+                    )
+                except Exception:
+                    self._clients[model] = None
+        return self._clients[model]
+
+    @property
+    def client(self):
+        if not self.token:
+            return None
+        return self._client_for(self.model_name)
+
+    def endpoint_stats(self) -> List[Dict]:
+        return self.router.stats()
+
+    def supports_streaming(self) -> bool:
+        return self.local_generator is not None
 
     def has_token(self) -> bool:
         return bool(self.token)
 
     def generate_answer(
-        self, question: str, context_chunks: List[Dict], max_length: int = 512
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        max_length: int = 512,
+        user_id: str = None,
+        history: str = None,
     ) -> str:
-        if not context_chunks:
-            return "No relevant context found. Please index some documents first."
+        if self.limiter is None or not context_chunks:
+            return self._generate_answer(question, context_chunks, max_length, history)
+
+        with self.limiter.acquire(user_id, "generate"):
+            return self._generate_answer(question, context_chunks, max_length, history)
 
+    def generate_sub_queries(
+        self, question: str, count: int = 3, user_id: str = None
+    ) -> List[str]:
+        if not self.router.endpoints or count <= 0:
+            return []
+
+        prompt = (
+            f"Rewrite the research question below as {count} short, self-contained "
+            "search queries that together cover every part of it. Reply with one "
+            f"query per line and nothing else.\n\nQuestion: {question}"
+        )
+        limit = (
+            self.limiter.acquire(user_id, "generate")
+            if self.limiter is not None
+            else nullcontext()
+        )
+        try:
+            with limit:
+                content = self._route(
+                    lambda model, api: self._call_prompt(
+                        model, api, prompt, SUB_QUERY_MAX_TOKENS
+                    )
+                )
+        except RateLimitExceeded:
+            # Sub-queries are optional; the answer still needs its own token.
+            return []
+        if content is None:
+            return []
+
+        queries = []
+        for line in content.splitlines():
+            line = line.strip().lstrip("-*0123456789.) ").strip().strip('"')
+            if line:
+                queries.append(line)
+        return queries[:count]
+
+    def _build_context(self, context_chunks: List[Dict], history: str = None) -> str:
         # Format context from chunks
         context_parts = []
         for i, chunk in enumerate(context_chunks, 1):
@@ -40,9 +140,89 @@ class LLMClient:
             context_parts.append(f"[Source {i}: {source}]\n{text}")
 
         context = "\n\n".join(context_parts)
+        if history:
+            context = f"Conversation so far:\n{history}\n\n{context}"
+        return context
+
+    def stream_answer(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        max_length: int = 512,
+        user_id: str = None,
+        history: str = None,
+    ) -> Iterator[str]:
+        if not context_chunks:
+            yield self.generate_answer(
+                question, context_chunks, max_length, user_id, history
+            )
+            return
+
+        limit = (
+            self.limiter.acquire(user_id, "generate")
+            if self.limiter is not None
+            else nullcontext()
+        )
+        with limit:
+            yield from self._stream_answer(
+                question, context_chunks, max_length, history
+            )
+
+    def _stream_answer(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        max_length: int,
+        history: str = None,
+    ) -> Iterator[str]:
+        if not self.router.endpoints:
+            yield self._extractive_fallback(question, context_chunks)
+            return
+
+        context = self._build_context(context_chunks, history)
+        prompt = self._build_prompt(question, context)
+        # Same endpoint order and fallback as _generate_remote; only the
+        # in-process generator streams tokens, the APIs yield one piece.
+        for model, api in self.router.available():
+            start_time = time.perf_counter()
+            streamed = False
+            try:
+                if api == "transformers":
+                    for piece in self.local_generator.stream(
+                        f"Question: {question}\n\nContext:\n{context}\n\nAnswer:",
+                        max_length,
+                    ):
+                        streamed = True
+                        yield piece
+                    if not streamed:
+                        raise ValueError("Empty response")
+                else:
+                    generated_text = self._call_endpoint(
+                        model, api, question, context, prompt, max_length
+                    )
+                    if not isinstance(generated_text, str) or not generated_text.strip():
+                        raise ValueError("Empty response")
+                    yield generated_text.strip()
+            except Exception as e:
+                self.router.record_failure((model, api), e)
+                if streamed:
+                    # Part of the answer is already on screen; finish with the
+                    # extractive answer rather than starting over elsewhere.
+                    yield (
+                        "\n\n⚠️ Generation stopped partway through; the rest is "
+                        "extracted from the retrieved passages.\n\n"
+                        + self._extractive_fallback(question, context_chunks)
+                    )
+                    return
+                continue
+
+            self.router.record_success((model, api), time.perf_counter() - start_time)
+            return
 
-        # Format prompt
-        prompt = f"""You are a research assistant. Use ONLY the provided context to answer the question. If the context doesn't contain enough information, say so clearly.
+        yield self._unavailable_answer(question, context_chunks)
+
+    def _build_prompt(self, question: str, context: str) -> str:
+        return f"""You are a research assistant. Use ONLY the provided context to answer the question. If the context doesn't contain enough information, say so clearly.
 
 Question: {question}
 
@@ -50,73 +230,148 @@ Context:
 {context}
 
 Answer:"""
-        if self.token:
-            try:
-                if self.client is not None:
-                    try:
-                        messages = [
-                            {
-                                "role": "system",
-                                "content": "You are a research assistant. Use ONLY the provided context to answer questions. If the context doesn't contain enough information, say so clearly.",
-                            },
-                            {
-                                "role": "user",
-                                "content": f"Question: {question}\n\nContext:\n{context}\n\nAnswer:",
-                            },
-                        ]
-                        completion = self.client.chat.completions.create(
-                            model=self.model_name,
-                            messages=messages,
-                            max_tokens=max_length,
-                            temperature=0.7,
-                            top_p=0.9,
-                        )
-                        generated_text = None
-                        if hasattr(completion, "choices") and completion.choices:
-                            choice = completion.choices[0]
-                            if isinstance(getattr(choice, "message", None), dict):
-                                generated_text = choice.message.get("content", "")
-                            else:
-                                msg = getattr(choice, "message", None)
-                                if msg is not None:
-                                    generated_text = getattr(msg, "content", "")
-                        if generated_text:
-                            return generated_text.strip()
-                    except Exception:
-                        pass
-
-                    try:
-                        formatted_prompt = f"<s>[INST] {prompt} [/INST]"
-                        tg = self.client.text_generation(
-                            formatted_prompt,
-                            max_new_tokens=max_length,
-                            temperature=0.7,
-                            top_p=0.9,
-                            do_sample=True,
-                            return_full_text=False,
-                        )
-                        if isinstance(tg, str):
-                            return tg.strip()
-                        if isinstance(tg, dict) and tg.get("generated_text"):
-                            return tg["generated_text"].strip()
-                    except Exception:
-                        pass
-
-                return "API error: Unable to generate via router (chat and text fallbacks failed). Please verify HF_TOKEN and model availability."
-
-            except requests.exceptions.Timeout:
-                return (
-                    "Request timed out. The model may be processing. Please try again."
-                )
-            except Exception as e:
-                return f"Error generating answer: {str(e)}"
+
+    def _generate_answer(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        max_length: int,
+        history: str = None,
+    ) -> str:
+        if not context_chunks:
+            return "No relevant context found. Please index some documents first."
+
+        context = self._build_context(context_chunks, history)
+        prompt = self._build_prompt(question, context)
+        if self.router.endpoints:
+            answer = _GENERATION_FLIGHTS.do(
+                (self.model_name, prompt, max_length),
+                lambda: self._generate_remote(question, context, prompt, max_length),
+            )
+            if answer is not None:
+                return answer
+            return self._unavailable_answer(question, context_chunks)
         else:
             return self._extractive_fallback(question, context_chunks)
 
+    def _call_endpoint(
+        self,
+        model: str,
+        api: str,
+        question: str,
+        context: str,
+        prompt: str,
+        max_length: int,
+    ) -> str:
+        if api == "transformers":
+            return self.local_generator.generate(
+                f"Question: {question}\n\nContext:\n{context}\n\nAnswer:", max_length
+            )
+
+        client = self._client_for(model)
+        if client is None:
+            raise RuntimeError(f"Could not create an inference client for {model}")
+
+        if api == "chat":
+            messages = [
+                {
+                    "role": "system",
+                    "content": "You are a research assistant. Use ONLY the provided context to answer questions. If the context doesn't contain enough information, say so clearly.",
+                },
+                {
+                    "role": "user",
+                    "content": f"Question: {question}\n\nContext:\n{context}\n\nAnswer:",
+                },
+            ]
+            completion = client.chat.completions.create(
+                messages=messages,
+                max_tokens=max_length,
+                temperature=0.7,
+                top_p=0.9,
+            )
+            return _completion_text(completion)
+
+        return self._text_generation(client, model, prompt, max_length, 0.7)
+
+    def _call_prompt(self, model: str, api: str, prompt: str, max_length: int) -> str:
+        # A bare instruction, without the research-assistant framing that
+        # _call_endpoint wraps around answers.
+        if api == "transformers":
+            return self.local_generator.generate(prompt, max_length)
+
+        client = self._client_for(model)
+        if client is None:
+            raise RuntimeError(f"Could not create an inference client for {model}")
+
+        if api == "chat":
+            completion = client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_length,
+                temperature=0.2,
+            )
+            return _completion_text(completion)
+        return self._text_generation(client, model, prompt, max_length, 0.2)
+
+    def _text_generation(
+        self, client, model: str, prompt: str, max_length: int, temperature: float
+    ) -> str:
+        # Only Mistral-style instruct models expect the [INST] wrapper.
+        if "mistral" in model.lower():
+            prompt = f"<s>[INST] {prompt} [/INST]"
+        tg = client.text_generation(
+            prompt,
+            max_new_tokens=max_length,
+            temperature=temperature,
+            top_p=0.9,
+            do_sample=True,
+            return_full_text=False,
+        )
+        if isinstance(tg, dict):
+            return tg.get("generated_text")
+        return tg
+
+    def _generate_remote(
+        self, question: str, context: str, prompt: str, max_length: int
+    ) -> Optional[str]:
+        return self._route(
+            lambda model, api: self._call_endpoint(
+                model, api, question, context, prompt, max_length
+            )
+        )
+
+    def _route(self, call: Callable[[str, str], str]) -> Optional[str]:
+        # Parked endpoints are skipped outright so a throttled or unreachable
+        # API does not cost a timeout on every question.
+        for model, api in self.router.available():
+            start_time = time.perf_counter()
+            try:
+                generated_text = call(model, api)
+                if not isinstance(generated_text, str) or not generated_text.strip():
+                    raise ValueError("Empty response")
+            except Exception as e:
+                self.router.record_failure((model, api), e)
+                continue
+
+            self.router.record_success((model, api), time.perf_counter() - start_time)
+            return generated_text.strip()
+
+        return None
+
+    def _unavailable_answer(self, question: str, context_chunks: List[Dict]) -> str:
+        return (
+            "⚠️ The generation service is unavailable right now, so this answer "
+            "is extracted from the retrieved passages.\n\n"
+            + self._extractive_fallback(question, context_chunks)
+        )
+
     def _extractive_fallback(self, question: str, context_chunks: List[Dict]) -> str:
         if not context_chunks:
             return "No context available. Please set HF_TOKEN environment variable for LLM generation."
 
+        answer = extractive_answer(question, context_chunks)
+        if answer:
+            return answer
+
         top_chunk = context_chunks[0]
         source = top_chunk.get("source", "Unknown")
         text = top_chunk.get("text", "")
@@ -126,3 +381,12 @@ Answer:"""
             answer += "..."
 
         return answer
+
+
+def _completion_text(completion) -> Optional[str]:
+    if not getattr(completion, "choices", None):
+        return None
+    message = getattr(completion.choices[0], "message", None)
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return getattr(message, "content", "") if message is not None else None
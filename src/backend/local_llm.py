@@ -0,0 +1,228 @@
+import copy
+import os
+import queue
+import time
+from threading import Lock, Thread
+from typing import Iterator, List
+
+DEFAULT_LOCAL_LLM_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"
+DEFAULT_MAX_BATCH_SIZE = 4
+DEFAULT_MAX_WAIT_MS = 20.0
+SYSTEM_PROMPT = (
+    "You are a research assistant. Use ONLY the provided context to answer "
+    "questions. If the context doesn't contain enough information, say so clearly."
+)
+
+_DONE = object()
+
+
+class _GenerationRequest:
+    __slots__ = ("input_ids", "max_new_tokens", "tokens", "text", "output")
+
+    def __init__(self, input_ids: List[int], max_new_tokens: int):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.tokens: List[int] = []
+        self.text = ""
+        self.output: "queue.Queue" = queue.Queue()
+
+
+# Splits the per-step tokens of a batched generate() call back out to each
+# request's queue as incremental text.
+class _BatchStreamer:
+    def __init__(self, tokenizer, requests: List[_GenerationRequest]):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.finished = [False] * len(requests)
+        self._prompt_seen = False
+
+    def put(self, value):
+        # generate() first passes the prompt ids (2-D), then one token per row.
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+
+        for row, token in enumerate(value.reshape(-1).tolist()):
+            if self.finished[row]:
+                continue
+            request = self.requests[row]
+            # Rows of a shared batch can run past their own token budget.
+            if token in (
+                self.tokenizer.eos_token_id,
+                self.tokenizer.pad_token_id,
+            ) or len(request.tokens) >= request.max_new_tokens:
+                self.finished[row] = True
+                continue
+            request.tokens.append(token)
+            text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+            # Hold back a trailing partial multi-byte character until complete.
+            if text.endswith("�"):
+                continue
+            request.output.put(text[len(request.text) :])
+            request.text = text
+
+    def end(self):
+        for request in self.requests:
+            request.output.put(_DONE)
+
+
+class LocalGenerator:
+    """In-process transformers generation with request-level micro-batching.
+
+    Requests that arrive within ``max_wait_ms`` of each other share one
+    ``generate()`` call and stream their tokens as it runs. This is not
+    continuous batching: a batch runs until its longest request finishes, and
+    requests arriving meanwhile wait for the next batch. The prefilled
+    system-prompt cache is only reused by batches of a single request.
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+        system_prompt: str = SYSTEM_PROMPT,
+    ):
+        self.model_name = model_name or os.getenv(
+            "LOCAL_LLM_MODEL", DEFAULT_LOCAL_LLM_MODEL
+        )
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("LOCAL_LLM_BATCH_SIZE", str(DEFAULT_MAX_BATCH_SIZE))
+        )
+        if max_wait_ms is None:
+            max_wait_ms = float(
+                os.getenv("LOCAL_LLM_MAX_WAIT_MS", str(DEFAULT_MAX_WAIT_MS))
+            )
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.system_prompt = system_prompt
+
+        self._model = None
+        self._tokenizer = None
+        self._prefix_ids: List[int] = []
+        self._prefix_cache = None
+        self._load_lock = Lock()
+        self._queue: "queue.Queue[_GenerationRequest]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = Lock()
+
+    def _load(self):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_name, torch_dtype=torch.float32
+        )
+        model.eval()
+
+        # Prefill the shared system prompt once; single requests start from a
+        # copy of this cache instead of re-encoding it every time.
+        prefix_ids = tokenizer.apply_chat_template(
+            [{"role": "system", "content": self.system_prompt}], tokenize=True
+        )
+        with torch.inference_mode():
+            prefix_cache = model(
+                torch.tensor([prefix_ids]), use_cache=True
+            ).past_key_values
+
+        self._tokenizer = tokenizer
+        self._prefix_ids = prefix_ids
+        self._prefix_cache = prefix_cache
+        self._model = model
+
+    def _ensure_loaded(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._load()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = Thread(
+                    target=self._run, name="local-llm-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _next_batch(self) -> List[_GenerationRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _generate_batch(self, batch: List[_GenerationRequest]):
+        import torch
+
+        tokenizer = self._tokenizer
+        kwargs = {}
+        if len(batch) == 1 and batch[0].input_ids[: len(self._prefix_ids)] == (
+            self._prefix_ids
+        ):
+            # A lone request can reuse the system-prompt cache; padded batches
+            # cannot, because left padding shifts the prefix positions.
+            kwargs["past_key_values"] = copy.deepcopy(self._prefix_cache)
+
+        encoded = tokenizer.pad(
+            {"input_ids": [request.input_ids for request in batch]},
+            return_tensors="pt",
+        )
+        streamer = _BatchStreamer(tokenizer, batch)
+        with torch.inference_mode():
+            self._model.generate(
+                **encoded,
+                max_new_tokens=max(request.max_new_tokens for request in batch),
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                **kwargs,
+            )
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._ensure_loaded()
+                self._generate_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    request.output.put(e)
+                    request.output.put(_DONE)
+
+    def stream(self, user_message: str, max_new_tokens: int = 512) -> Iterator[str]:
+        self._ensure_loaded()
+        input_ids = self._tokenizer.apply_chat_template(
+            [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_message},
+            ],
+            tokenize=True,
+            add_generation_prompt=True,
+        )
+        request = _GenerationRequest(input_ids, max_new_tokens)
+        self._ensure_worker()
+        self._queue.put(request)
+
+        while True:
+            item = request.output.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def generate(self, user_message: str, max_new_tokens: int = 512) -> str:
+        return "".join(self.stream(user_message, max_new_tokens)).strip()
@@ -0,0 +1,121 @@
+import codecs
+import re
+from typing import Iterable, List
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# C0/C1 control characters that str.split() does not already treat as whitespace.
+_CONTROL_CHARS = {
+    code: None
+    for code in [*range(0x00, 0x20), *range(0x7F, 0xA0)]
+    if not chr(code).isspace()
+}
+_HYPHENATED_BREAK = re.compile(r"(?<=\w)-[^\S\n]*\n\s*(?=\w)")
+
+
+class TextNormalizer:
+    def __init__(self, strip_control: bool = False, dehyphenate: bool = False):
+        self.strip_control = strip_control
+        self.dehyphenate = dehyphenate
+        self._parts: List[str] = []
+        self._emitted = False
+        self._pending_space = False
+        self._carry = ""
+
+    def _emit(self, text: str):
+        if not text:
+            return
+
+        words = text.split()
+        if not words:
+            self._pending_space = self._emitted
+            return
+
+        if self._emitted and (self._pending_space or text[0].isspace()):
+            self._parts.append(" ")
+        self._parts.append(" ".join(words))
+        self._emitted = True
+        self._pending_space = text[-1].isspace()
+
+    def feed(self, text: str):
+        if self.strip_control:
+            text = text.translate(_CONTROL_CHARS)
+
+        if not self.dehyphenate:
+            self._emit(text)
+            return
+
+        text = _HYPHENATED_BREAK.sub("", self._carry + text)
+        self._carry = ""
+
+        # A trailing "x-" can only be joined once the next block shows whether
+        # a line break and another word follow, so hold it back. Otherwise keep
+        # the last character for the lookbehind of a hyphen in the next block.
+        content_end = len(text.rstrip())
+        if content_end and text[content_end - 1] == "-":
+            cut = max(content_end - 2, 0)
+        else:
+            cut = max(len(text) - 1, 0)
+        self._carry = text[cut:]
+        text = text[:cut]
+
+        self._emit(text)
+
+    def finish(self) -> str:
+        if self._carry:
+            self._emit(self._carry)
+            self._carry = ""
+        return "".join(self._parts)
+
+
+def _decode_blocks(view: memoryview, encoding: str, block_size: int):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for start in range(0, len(view), block_size):
+        yield decoder.decode(view[start : start + block_size])
+    yield decoder.decode(b"", final=True)
+
+
+def normalize_bytes(
+    data: bytes,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    strip_control: bool = False,
+    dehyphenate: bool = False,
+) -> str:
+    view = memoryview(data)
+    # Falling back for the whole document (not per block) keeps the output
+    # identical to decoding the full buffer as UTF-8 first, then latin-1.
+    for encoding in ("utf-8", "latin-1"):
+        normalizer = TextNormalizer(strip_control, dehyphenate)
+        try:
+            for text in _decode_blocks(view, encoding, block_size):
+                normalizer.feed(text)
+        except UnicodeDecodeError:
+            continue
+        return normalizer.finish()
+
+
+def normalize_stream(
+    blocks: Iterable[bytes],
+    strip_control: bool = False,
+    dehyphenate: bool = False,
+) -> str:
+    normalizer = TextNormalizer(strip_control, dehyphenate)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    for block in blocks:
+        try:
+            text = decoder.decode(block)
+        except UnicodeDecodeError:
+            # Streams cannot be rewound, so fall back to latin-1 for this block only.
+            pending, _ = decoder.getstate()
+            decoder.reset()
+            text = (pending + bytes(block)).decode("latin-1")
+        normalizer.feed(text)
+
+    try:
+        normalizer.feed(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        pending, _ = decoder.getstate()
+        normalizer.feed(pending.decode("latin-1"))
+
+    return normalizer.finish()
@@ -0,0 +1,93 @@
+import os
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+PREVIEW_CHARS = 300
+DEFAULT_MAX_RESULTS = 100
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_MAX_ENTRIES = 500
+
+
+def compact_result(result: Dict, keep_text: bool = False) -> Dict:
+    """Copy of a search result with its text cut to a preview; the full text
+    is fetched again only if the user opens it."""
+    text = result.get("text", "")
+    truncated = not keep_text and len(text) > PREVIEW_CHARS
+    return {
+        "id": result.get("id"),
+        "score": result.get("score", 0.0),
+        "metadata": result.get("metadata", {}),
+        "text": text[:PREVIEW_CHARS] + "..." if truncated else text,
+        "truncated": truncated,
+    }
+
+
+class _PagedSearch:
+    __slots__ = ("user_id", "query", "seen_ids", "results", "expires_at")
+
+    def __init__(self, user_id: str, query: str, seen_ids: List, expires_at: float):
+        self.user_id = user_id
+        self.query = query
+        self.seen_ids = seen_ids
+        self.results: Optional[List[Dict]] = None
+        self.expires_at = expires_at
+
+
+class ResultPageCache:
+    """Server-side continuation state for paged searches.
+
+    The first page comes from an ordinary top-k search; the deeper result list
+    is fetched once, on the first request for a second page. Cursors are
+    ``"<token>.<offset>"`` strings into that list, so replaying one returns the
+    same page instead of skipping results.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds or float(
+            os.getenv("SEARCH_PAGE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))
+        )
+        self.max_entries = max_entries or int(
+            os.getenv("SEARCH_PAGE_CACHE_ENTRIES", str(DEFAULT_MAX_ENTRIES))
+        )
+        self._entries: "OrderedDict[str, _PagedSearch]" = OrderedDict()
+        self._lock = Lock()
+
+    def open(self, user_id: str, query: str, seen_ids: List) -> str:
+        token = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._entries[token] = _PagedSearch(
+                user_id, query, list(seen_ids), now + self.ttl_seconds
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self.cursor(token, 0)
+
+    @staticmethod
+    def cursor(token: str, offset: int) -> str:
+        return f"{token}.{offset}"
+
+    def lookup(self, cursor: str, user_id: str) -> Tuple[str, _PagedSearch, int]:
+        token, _, offset = cursor.rpartition(".")
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(token)
+            if entry is None or entry.user_id != user_id or not offset.isdigit():
+                raise KeyError("Search cursor expired; run the search again")
+            entry.expires_at = now + self.ttl_seconds
+            self._entries.move_to_end(token)
+            return token, entry, int(offset)
+
+    def _expire(self, now: float):
+        # Every touch moves an entry to the end with a fresh deadline, so the
+        # oldest deadlines are always at the front.
+        while self._entries:
+            token, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[token]
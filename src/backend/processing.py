@@ -1,28 +1,30 @@
-import re
+from bisect import bisect_right
 from io import BytesIO
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
-import pypdf
+from backend.normalize import normalize_bytes
 
 
 def clean_text(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    text = text.strip()
-    return text
+    # str.split() breaks on exactly the characters matched by the regex \s, so
+    # this equals re.sub(r"\s+", " ", text).strip() without the extra copies.
+    return " ".join(text.split())
 
 
 def estimate_tokens(text: str) -> int:
     return len(text) // 4
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
+def chunk_spans(
+    text: str, chunk_size: int = 800, overlap: int = 150
+) -> List[Tuple[int, int]]:
     if not text:
         return []
 
     char_chunk_size = chunk_size * 4
     char_overlap = overlap * 4
 
-    chunks = []
+    spans = []
     start = 0
     text_length = len(text)
 
@@ -40,42 +42,86 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str
             if sentence_end > start + char_chunk_size // 2:
                 end = sentence_end + 1
 
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+        raw_chunk = text[start:end]
+        span_start = start + len(raw_chunk) - len(raw_chunk.lstrip())
+        span_end = start + len(raw_chunk.rstrip())
+        if span_end > span_start:
+            spans.append((span_start, span_end))
 
         start = end - char_overlap
         if start >= text_length:
             break
 
-    return chunks
+    return spans
 
 
-def load_pdf(file_content: bytes, filename: str) -> str:
-    try:
-        pdf_file = BytesIO(file_content)
-        reader = pypdf.PdfReader(pdf_file)
-        text_parts = []
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, overlap)]
+
+
+def page_for_offset(page_offsets: List[int], offset: int) -> int:
+    return max(bisect_right(page_offsets, offset), 1)
+
+
+def _extract_pdf(file_content: bytes) -> Tuple[str, List[int]]:
+    import pypdf
+
+    reader = pypdf.PdfReader(BytesIO(file_content))
+    text_parts = []
+    page_offsets = []
+    offset = 0
+
+    # Cleaning pages one at a time and joining with a single space yields the
+    # same text as cleaning the joined document, while keeping page offsets.
+    for page in reader.pages:
+        page_offsets.append(offset)
+        text = page.extract_text()
+        text = clean_text(text) if text else ""
+        if not text:
+            continue
+        if text_parts:
+            offset += 1
+            page_offsets[-1] = offset
+        text_parts.append(text)
+        offset += len(text)
 
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
+    return " ".join(text_parts), page_offsets
 
-        full_text = "\n\n".join(text_parts)
-        return clean_text(full_text)
+
+def load_pdf_pages(file_content: bytes, filename: str) -> Tuple[str, List[int]]:
+    from backend.resources import get_document_cache
+
+    document_cache = get_document_cache()
+    cache_key = document_cache.content_key(file_content)
+    try:
+        cached = document_cache.get(cache_key)
+    except OSError as e:
+        print(f"Error reading parsed-document cache for {filename}: {e}")
+        cached = None
+    if cached is not None:
+        return cached
+
+    try:
+        text, page_offsets = _extract_pdf(file_content)
     except Exception as e:
         raise ValueError(f"Error loading PDF {filename}: {str(e)}")
 
+    try:
+        document_cache.put(cache_key, text, page_offsets)
+    except OSError as e:
+        print(f"Error writing parsed-document cache for {filename}: {e}")
+
+    return text, page_offsets
+
+
+def load_pdf(file_content: bytes, filename: str) -> str:
+    text, _ = load_pdf_pages(file_content, filename)
+    return text
+
 
 def load_text_file(file_content: bytes, filename: str) -> str:
     try:
-        try:
-            text = file_content.decode("utf-8")
-        except UnicodeDecodeError:
-            text = file_content.decode("latin-1")
-
-        return clean_text(text)
+        return normalize_bytes(file_content)
     except Exception as e:
         raise ValueError(f"Error loading text file {filename}: {str(e)}")
 
@@ -88,8 +134,9 @@ def process_documents(uploaded_files: List, user_id: str = None) -> List[Dict]:
         filename = uploaded_file.name
         file_extension = filename.split(".")[-1].lower()
 
+        page_offsets = None
         if file_extension == "pdf":
-            text = load_pdf(file_content, filename)
+            text, page_offsets = load_pdf_pages(file_content, filename)
         elif file_extension in ["txt", "md"]:
             text = load_text_file(file_content, filename)
         else:
@@ -98,15 +145,24 @@ def process_documents(uploaded_files: List, user_id: str = None) -> List[Dict]:
         if not text:
             continue
 
-        chunks = chunk_text(text, chunk_size=800, overlap=150)
+        spans = chunk_spans(text, chunk_size=800, overlap=150)
 
-        for idx, chunk in enumerate(chunks):
+        for idx, (char_start, char_end) in enumerate(spans):
+            chunk_id = f"{filename.replace(' ', '_')}_chunk_{idx}"
             chunk_dict = {
-                "id": f"{filename.replace(' ', '_')}_chunk_{idx}",
-                "text": chunk,
+                # Vector ids are shared by every user of a namespace, so the
+                # same filename uploaded by two users must not collide.
+                "id": f"{user_id}:{chunk_id}" if user_id else chunk_id,
+                "text": text[char_start:char_end],
                 "source": filename,
                 "chunk_index": idx,
+                "chunk_id": chunk_id,
+                "char_start": char_start,
+                "char_end": char_end,
             }
+            if page_offsets:
+                chunk_dict["page_start"] = page_for_offset(page_offsets, char_start)
+                chunk_dict["page_end"] = page_for_offset(page_offsets, char_end - 1)
             if user_id:
                 chunk_dict["user_id"] = user_id
 
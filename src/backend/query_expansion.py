@@ -0,0 +1,88 @@
+import re
+from typing import Dict, Hashable, List, Optional
+
+DEFAULT_MAX_QUERIES = 4
+MIN_SUBQUERY_WORDS = 3
+# Standard reciprocal rank fusion constant; damps the weight of top ranks.
+RRF_K = 60
+
+_CLAUSE_BREAK = re.compile(
+    r"[?;\n]+|,?\s+\b(?:and also|as well as|and then|additionally|in addition)\b,?\s+",
+    re.IGNORECASE,
+)
+_COMPARISON = re.compile(
+    r"\b(?:compare|comparing|contrast|differences? between)\s+(?P<a>.+?)\s+"
+    r"(?:and|with|to|vs\.?|versus)\s+(?P<b>.+)",
+    re.IGNORECASE,
+)
+_LEADING_CONJUNCTION = re.compile(r"^(?:and|also|but|then|plus)\b,?\s*", re.IGNORECASE)
+_TRAILING_PUNCTUATION = " \t.,:!?"
+
+
+def _dedupe(queries: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for query in queries:
+        key = " ".join(query.lower().strip(_TRAILING_PUNCTUATION).split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+
+def decompose_query(question: str, max_queries: int = DEFAULT_MAX_QUERIES) -> List[str]:
+    question = question.strip()
+    queries = [question]
+
+    for clause in _CLAUSE_BREAK.split(question):
+        clause = _LEADING_CONJUNCTION.sub("", clause.strip(_TRAILING_PUNCTUATION))
+        if len(clause.split()) < MIN_SUBQUERY_WORDS:
+            continue
+        queries.append(clause)
+
+        comparison = _COMPARISON.search(clause)
+        if comparison:
+            queries.append(comparison.group("a").strip(_TRAILING_PUNCTUATION))
+            queries.append(comparison.group("b").strip(_TRAILING_PUNCTUATION))
+
+    return _dedupe(queries)[:max_queries]
+
+
+def expand_query(
+    question: str,
+    llm_client=None,
+    max_queries: int = DEFAULT_MAX_QUERIES,
+    user_id: Optional[str] = None,
+) -> List[str]:
+    queries = decompose_query(question, max_queries)
+    if llm_client is not None and len(queries) < max_queries:
+        queries += llm_client.generate_sub_queries(
+            question, max_queries - len(queries), user_id=user_id
+        )
+    return _dedupe(queries)[:max_queries]
+
+
+def _result_key(result: Dict) -> Hashable:
+    if result.get("id") is not None:
+        return result["id"]
+    metadata = result.get("metadata", {})
+    return (metadata.get("source"), metadata.get("chunk_id"), result.get("text"))
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict]], top_k: Optional[int] = None, k: int = RRF_K
+) -> List[Dict]:
+    fused: Dict[Hashable, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = _result_key(result)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "fusion_score": 0.0, "matched_queries": 0}
+            elif result.get("score", 0) > entry.get("score", 0):
+                entry["score"] = result["score"]
+            entry["fusion_score"] += 1 / (k + rank)
+            entry["matched_queries"] += 1
+
+    ranked = sorted(fused.values(), key=lambda entry: entry["fusion_score"], reverse=True)
+    return ranked[:top_k] if top_k is not None else ranked
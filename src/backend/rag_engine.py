@@ -1,12 +1,40 @@
+import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Dict, List
 
 from dotenv import load_dotenv
-from moorcheh_sdk import MoorchehClient
-from moorcheh_sdk.exceptions import APIError, AuthenticationError, InvalidInputError
+
+from backend.pagination import ResultPageCache, compact_result
+from backend.query_expansion import reciprocal_rank_fusion
+from backend.summaries import file_candidates
+from backend.singleflight import SingleFlight
 
 load_dotenv()
 
+DELETE_BATCH_SIZE = 100
+# Extra results fetched when the query is narrowed to candidate files, so
+# filtering still leaves enough to fill top_k.
+CANDIDATE_OVERFETCH = 3
+OVERVIEW_MAX_FILES = 10
+FETCH_BATCH_SIZE = 100
+SNAPSHOT_BATCH_SIZE = 256
+# Ids remembered for reset_namespace when there is no database to ask; the
+# oldest are forgotten first.
+MAX_TRACKED_CHUNK_IDS = 10000
+
+# Results fetched when the user pages past the first top_k.
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+
+_SEARCH_FLIGHTS = SingleFlight()
+_RESULT_PAGES = ResultPageCache()
+_FANOUT_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_FANOUT_WORKERS", "8")),
+    thread_name_prefix="search-fanout",
+)
+
 
 class RAGEngine:
     def __init__(
@@ -14,13 +42,45 @@ class RAGEngine:
         namespace: str,
         user_id: str = None,
         db=None,
+        client=None,
+        limiter=None,
+        embedder=None,
+        summarizer=None,
     ):
-        self.client = MoorchehClient()
+        if client is None:
+            from moorcheh_sdk import MoorchehClient
+
+            client = MoorchehClient()
+        self.client = client
+        self.limiter = limiter
+        self.embedder = embedder
+        self.summarizer = summarizer
         self.namespace = namespace
         self.user_id = user_id
         self.db = db
         self.chunk_ids = 0
-        self.chunk_ids_to_clear = []
+        self.chunk_ids_to_clear: "deque[str | int]" = deque(
+            maxlen=MAX_TRACKED_CHUNK_IDS
+        )
+
+    def for_user(self, user_id: str) -> "RAGEngine":
+        return RAGEngine(
+            namespace=self.namespace,
+            user_id=user_id,
+            db=self.db,
+            client=self.client,
+            limiter=self.limiter,
+            embedder=self.embedder,
+            summarizer=self.summarizer,
+        )
+
+    def _limit(self, action: str):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.acquire(self.user_id, action)
+
+    def close(self):
+        self.client.close()
 
     def list_namespaces(self):
         return self.client.list_namespaces()
@@ -40,109 +100,446 @@ class RAGEngine:
                 break
 
     def create_namespace(self):
-        self.client.create_namespace(namespace_name=self.namespace, type="text")
+        if self.embedder is not None:
+            self.client.create_namespace(
+                namespace_name=self.namespace,
+                type="vector",
+                vector_dimension=self.embedder.dimension,
+            )
+        else:
+            self.client.create_namespace(namespace_name=self.namespace, type="text")
+
+    def _upload(self, chunks: List[Dict], vectors=None) -> Dict:
+        if self.embedder is None:
+            return self.client.upload_documents(
+                namespace_name=self.namespace,
+                documents=chunks,
+            )
+
+        if vectors is None:
+            vectors = self.embedder.embed_documents(
+                [chunk["text"] for chunk in chunks]
+            )
+        payload = [
+            {
+                "id": chunk["id"],
+                "vector": vector.tolist(),
+                "metadata": {key: value for key, value in chunk.items() if key != "id"},
+            }
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        response = self.client.upload_vectors(
+            namespace_name=self.namespace, vectors=payload
+        )
+        document_ids = response.get(
+            "vector_ids_processed", [chunk["id"] for chunk in chunks]
+        )
+        return {
+            **response,
+            "queued_documents": len(document_ids),
+            "document_ids": document_ids,
+        }
+
+    def _delete_batch(self, ids: List[str | int]) -> Dict:
+        if self.embedder is not None:
+            return self.client.delete_vectors(namespace_name=self.namespace, ids=ids)
+        return self.client.delete_documents(namespace_name=self.namespace, ids=ids)
 
     def add_documents(self, chunks: List[Dict]):
         if not chunks:
             return
 
-        try:
-            file_boundaries = []
-            current_file = None
-            start_idx = 0
-
-            for idx, chunk in enumerate(chunks):
-                filename = chunk.get("source", "unknown")
-                if filename != current_file:
-                    if current_file is not None:
-                        file_boundaries.append((current_file, start_idx, idx))
-                    current_file = filename
-                    start_idx = idx
-
-            if current_file is not None:
-                file_boundaries.append((current_file, start_idx, len(chunks)))
-
-            response = self.client.upload_documents(
-                namespace_name=self.namespace,
-                documents=chunks,
+        with self._limit("ingest"):
+            return self._add_documents(chunks)
+
+    def index_documents(self, chunks: List[Dict]):
+        """Adds an upload of whole files as one ingest.
+
+        Files the user already has indexed are replaced: the new chunks are
+        uploaded first, and only then are the old chunks the new version no
+        longer has deleted, so a failed upload leaves the previous version
+        searchable.
+        """
+        if not chunks:
+            return None
+
+        with self._limit("ingest"):
+            previous_ids = self._indexed_file_ids(
+                {chunk.get("source", "unknown") for chunk in chunks}
             )
-            self.chunk_ids += response["queued_documents"]
-            document_ids = response["document_ids"]
-            self.chunk_ids_to_clear.extend(document_ids)
+            response = self._add_documents(chunks, summarize=False)
 
-            if self.db and self.user_id and document_ids:
-                for filename, start_idx, end_idx in file_boundaries:
-                    file_document_ids = document_ids[start_idx:end_idx]
-                    if file_document_ids:
-                        self.db.add_documents(self.user_id, file_document_ids, filename)
+            # Chunk ids are derived from the filename, so most are simply
+            # overwritten by the upload above.
+            new_ids = set(response["document_ids"])
+            stale_ids = [item for item in previous_ids if item not in new_ids]
+            if stale_ids:
+                deleted = self._delete_remote(stale_ids)
+                self._journal_failed_deletes(deleted)
+                self.db.delete_document_ids(stale_ids)
 
+            if self.summarizer is not None and self.db and self.user_id:
+                self.summarizer.schedule(self.user_id, chunks)
             return response
-        except InvalidInputError as e:
-            raise e
-        except AuthenticationError as e:
-            raise e
-        except APIError as e:
-            raise e
-        except Exception as e:
-            raise e
+
+    def _indexed_file_ids(self, filenames: set) -> List[str]:
+        if not (self.db and self.user_id):
+            return []
+        return [
+            document_id
+            for filename in sorted(filenames)
+            for document_id in self.db.get_file_document_ids(self.user_id, filename)
+        ]
+
+    def _add_documents(self, chunks: List[Dict], vectors=None, summarize=True):
+        file_boundaries = []
+        current_file = None
+        start_idx = 0
+
+        for idx, chunk in enumerate(chunks):
+            filename = chunk.get("source", "unknown")
+            if filename != current_file:
+                if current_file is not None:
+                    file_boundaries.append((current_file, start_idx, idx))
+                current_file = filename
+                start_idx = idx
+
+        if current_file is not None:
+            file_boundaries.append((current_file, start_idx, len(chunks)))
+
+        # Journal the ids first so a crash between the remote write and the
+        # local insert leaves a trail for the reconciler.
+        journal_ids = []
+        if self.db and self.user_id:
+            journal_ids = [chunk["id"] for chunk in chunks if "id" in chunk]
+            # An upsert of another user's id would overwrite their vector
+            # while the unique document_id records nothing for this user.
+            conflicts = self.db.get_foreign_document_ids(self.user_id, journal_ids)
+            if conflicts:
+                raise ValueError(
+                    f"{len(conflicts)} chunk id(s) are already indexed by another "
+                    "user; nothing was uploaded"
+                )
+            self.db.add_pending_uploads(self.user_id, self.namespace, journal_ids)
+
+        response = self._upload(chunks, vectors)
+        self.chunk_ids += response["queued_documents"]
+        document_ids = response["document_ids"]
+        if not (self.db and self.user_id):
+            self.chunk_ids_to_clear.extend(document_ids)
+
+        if self.db and self.user_id and document_ids:
+            for filename, start_idx, end_idx in file_boundaries:
+                file_document_ids = document_ids[start_idx:end_idx]
+                if file_document_ids:
+                    self.db.add_documents(self.user_id, file_document_ids, filename)
+
+            if summarize and self.summarizer is not None:
+                self.summarizer.schedule(self.user_id, chunks)
+
+        if journal_ids:
+            self.db.clear_pending_uploads(journal_ids)
+        return response
 
     def clear_documents(self, ids: List[str | int]):
         try:
-            response = self.client.delete_documents(
-                namespace_name=self.namespace, ids=ids
-            )
+            response = self._delete_batch(ids)
             self.chunk_ids -= len(ids)
-            self.chunk_ids_to_clear = [
-                id for id in self.chunk_ids_to_clear if id not in ids
-            ]
+            self._forget_ids(set(ids))
             return response
         except Exception as e:
             print(f"Error clearing documents from namespace {self.namespace}: {e}")
             raise e
 
+    def _delete_remote(self, ids: List[str | int]) -> Dict:
+        deleted_ids = []
+        errors = []
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start : start + DELETE_BATCH_SIZE]
+            response = self._delete_batch(batch)
+            deleted_ids.extend(response.get("deleted_ids", []))
+            errors.extend(response.get("errors", []))
+
+        self._forget_ids(set(deleted_ids))
+        self.chunk_ids -= len(deleted_ids)
+        return {"deleted_ids": deleted_ids, "errors": errors}
+
+    def _forget_ids(self, ids: set):
+        if ids:
+            remaining = [id for id in self.chunk_ids_to_clear if id not in ids]
+            self.chunk_ids_to_clear.clear()
+            self.chunk_ids_to_clear.extend(remaining)
+
+    def _journal_failed_deletes(self, response: Dict):
+        # The local rows go away regardless, so remote deletes that failed are
+        # handed to the reconciler instead of being forgotten.
+        failed_ids = [
+            error["id"]
+            for error in response.get("errors", [])
+            if isinstance(error, dict)
+            and "id" in error
+            and "not found" not in str(error.get("error", "")).lower()
+        ]
+        if failed_ids:
+            self.db.add_pending_uploads(self.user_id, self.namespace, failed_ids)
+
+    def delete_file(self, filename: str) -> Dict:
+        try:
+            if not (self.db and self.user_id):
+                raise ValueError("Per-file deletion requires a database and user id")
+
+            file_document_ids = self.db.get_file_document_ids(self.user_id, filename)
+            if not file_document_ids:
+                return {"deleted_ids": []}
+
+            response = self._delete_remote(file_document_ids)
+            self._journal_failed_deletes(response)
+            self.db.delete_file_documents(self.user_id, filename)
+            return response
+        except Exception as e:
+            print(f"Error deleting {filename} from namespace {self.namespace}: {e}")
+            raise e
+
+    def reindex_file(self, filename: str, chunks: List[Dict]):
+        file_chunks = [chunk for chunk in chunks if chunk.get("source") == filename]
+        if not file_chunks:
+            return None
+
+        return self.index_documents(file_chunks)
+
+    def _fetch_chunks(self, ids: List[str]) -> List[Dict]:
+        chunks = []
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            batch = ids[start : start + FETCH_BATCH_SIZE]
+            if self.embedder is None:
+                response = self.client.get_documents(
+                    namespace_name=self.namespace, ids=batch
+                )
+                documents = response.get("documents", [])
+            elif hasattr(self.client, "get_vectors"):
+                response = self.client.get_vectors(
+                    namespace_name=self.namespace, ids=batch
+                )
+                documents = response.get("vectors", [])
+            else:
+                raise ValueError(
+                    "Vectors cannot be read back from a remote vector namespace"
+                )
+
+            for document in documents:
+                metadata = {
+                    key: value
+                    for key, value in document.items()
+                    if key not in ("id", "text", "metadata", "vector")
+                }
+                metadata.update(document.get("metadata") or {})
+                text = document.get("text") or metadata.pop("text", "")
+                metadata.pop("text", None)
+                chunks.append(
+                    {
+                        "id": document["id"],
+                        "text": text,
+                        "metadata": metadata,
+                        "vector": document.get("vector"),
+                    }
+                )
+        return chunks
+
+    def export_snapshot(self, path: str) -> int:
+        from backend.snapshot import write_snapshot
+
+        if not (self.db and self.user_id):
+            raise ValueError("Snapshot export requires a database and user id")
+
+        rows = self.db.get_user_documents(self.user_id)
+        filenames = {row["document_id"]: row["filename"] for row in rows}
+        chunks = self._fetch_chunks([row["document_id"] for row in rows])
+        for chunk in chunks:
+            chunk["filename"] = filenames[chunk["id"]]
+
+        embedding_model = self.embedder.model_name if self.embedder else None
+        write_snapshot(path, chunks, embedding_model)
+        return len(chunks)
+
+    def import_snapshot(self, path: str, batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+        from backend.snapshot import read_snapshot
+
+        snapshot = read_snapshot(path)
+        if self.db and self.user_id:
+            # Checked for the whole snapshot up front so a conflict leaves
+            # nothing half imported.
+            conflicts = self.db.get_foreign_document_ids(self.user_id, snapshot.ids())
+            if conflicts:
+                raise ValueError(
+                    f"{len(conflicts)} chunk id(s) in this snapshot are already "
+                    "indexed by another user; nothing was imported"
+                )
+
+        # Stored vectors are reused only when they came from the same model.
+        reuse_vectors = (
+            self.embedder is not None
+            and snapshot.has_vectors
+            and snapshot.embedding_model == self.embedder.model_name
+        )
+
+        imported = 0
+        with self._limit("ingest"):
+            for chunks, vectors in snapshot.batches(batch_size):
+                if self.user_id:
+                    for chunk in chunks:
+                        chunk["user_id"] = self.user_id
+                self._add_documents(chunks, vectors if reuse_vectors else None)
+                imported += len(chunks)
+        return imported
+
     def reset_namespace(self):
         try:
             if self.db and self.user_id:
                 user_document_ids = self.db.get_user_document_ids(self.user_id)
                 if user_document_ids:
-                    response = self.client.delete_documents(
-                        namespace_name=self.namespace, ids=user_document_ids
-                    )
-                    deleted_ids = response.get("deleted_ids", [])
-                    self.chunk_ids_to_clear = [
-                        id for id in self.chunk_ids_to_clear if id not in deleted_ids
-                    ]
-                    self.chunk_ids -= len(deleted_ids)
+                    response = self._delete_remote(user_document_ids)
+                    self._journal_failed_deletes(response)
                     self.db.delete_user_documents(self.user_id)
                     return response
                 else:
-                    self.chunk_ids_to_clear = []
+                    self.chunk_ids_to_clear.clear()
                     self.chunk_ids = 0
                     return {"deleted_ids": []}
             else:
-                response = self.client.delete_documents(
-                    self.namespace, self.chunk_ids_to_clear
-                )
-                deleted_ids = response.get("deleted_ids", [])
-                self.chunk_ids_to_clear = [
-                    id for id in self.chunk_ids_to_clear if id not in deleted_ids
-                ]
-                self.chunk_ids -= len(deleted_ids)
-                return response
+                return self._delete_remote(list(self.chunk_ids_to_clear))
         except Exception as e:
             print(f"Error resetting namespace {self.namespace}: {e}")
             raise e
 
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        with self._limit("search"):
+            return self._search(query, top_k)
+
+    def multi_search(self, queries: List[str], top_k: int = 5) -> Dict:
+        # A fanned-out search is one user action, so it takes one token and one
+        # concurrency slot no matter how many sub-queries it runs.
+        with self._limit("search"):
+            if len(queries) == 1:
+                return {**self._search(queries[0], top_k), "queries": queries}
+
+            start_time = time.perf_counter()
+            responses = list(
+                _FANOUT_POOL.map(lambda query: self._search(query, top_k), queries)
+            )
+            time_taken = int((time.perf_counter() - start_time) * 1000)
+
+        return {
+            "results": reciprocal_rank_fusion(
+                [response["results"] for response in responses], top_k
+            ),
+            "time_taken": time_taken,
+            "queries": queries,
+        }
+
+    def search_page(self, query: str, page_size: int = 5) -> Dict:
+        response = self.search(query, top_k=page_size)
+        next_cursor = None
+        # A short first page means there is nothing further to page through.
+        if len(response["results"]) >= page_size:
+            next_cursor = _RESULT_PAGES.open(
+                self.user_id,
+                query,
+                [result.get("id") for result in response["results"]],
+            )
+        return {**response, "next_cursor": next_cursor}
+
+    def next_page(self, cursor: str, page_size: int = 10) -> Dict:
+        token, entry, offset = _RESULT_PAGES.lookup(cursor, self.user_id)
         start_time = time.perf_counter()
-        results = self.client.search(
-            namespaces=[self.namespace], query=query, top_k=top_k
+        if entry.results is None:
+            with self._limit("search"):
+                response = self._search(entry.query, SEARCH_MAX_RESULTS)
+            seen_ids = set(entry.seen_ids)
+            keep_text = not self._can_fetch_text()
+            entry.results = [
+                compact_result(result, keep_text)
+                for result in response["results"]
+                if result.get("id") not in seen_ids
+            ]
+            entry.seen_ids = []
+        time_taken = int((time.perf_counter() - start_time) * 1000)
+
+        page = entry.results[offset : offset + page_size]
+        end = offset + len(page)
+        return {
+            "results": page,
+            "time_taken": time_taken,
+            "next_cursor": ResultPageCache.cursor(token, end)
+            if end < len(entry.results)
+            else None,
+        }
+
+    def _can_fetch_text(self) -> bool:
+        return self.embedder is None or hasattr(self.client, "get_vectors")
+
+    def load_text(self, result: Dict) -> str:
+        if not result.get("truncated"):
+            return result.get("text", "")
+
+        chunks = self._fetch_chunks([result["id"]])
+        if not chunks:
+            return result.get("text", "")
+        chunk = chunks[0]
+        if self.user_id and chunk["metadata"].get("user_id") != self.user_id:
+            raise PermissionError("Chunk belongs to another user")
+        return chunk["text"]
+
+    def get_file_summaries(self) -> List[Dict]:
+        if not (self.db and self.user_id):
+            return []
+        return self.db.get_file_summaries(self.user_id)
+
+    def overview_results(self, question: str) -> List[Dict]:
+        file_summaries = self.get_file_summaries()
+        candidates = set(file_candidates(question, file_summaries))
+        if candidates:
+            file_summaries = [
+                file_summary
+                for file_summary in file_summaries
+                if file_summary["filename"] in candidates
+            ]
+
+        return [
+            {
+                "id": f"summary:{file_summary['filename']}",
+                "text": file_summary["summary"],
+                "score": 1.0,
+                "metadata": {
+                    "source": file_summary["filename"],
+                    "keywords": file_summary["keywords"],
+                },
+            }
+            for file_summary in file_summaries[:OVERVIEW_MAX_FILES]
+        ]
+
+    def _candidate_sources(self, query: str) -> set:
+        if self.summarizer is None:
+            return set()
+        return set(file_candidates(query, self.get_file_summaries()))
+
+    def _search(self, query: str, top_k: int) -> List[Dict]:
+        start_time = time.perf_counter()
+        sources = self._candidate_sources(query)
+        fetch_k = top_k * CANDIDATE_OVERFETCH if sources else top_k
+        # Identical concurrent queries against the namespace share one upstream
+        # call. A backend that filters by owner returns per-user results, so
+        # the user is part of the key there; otherwise filtering happens
+        # afterwards for each caller.
+        owner = self.user_id if self._filters_by_user() else None
+        results = _SEARCH_FLIGHTS.do(
+            (self.namespace, query, fetch_k, owner),
+            lambda: self._remote_search(query, fetch_k, owner),
         )
         end_time = time.perf_counter()
         elapsed_seconds = end_time - start_time
         time_taken = int(elapsed_seconds * 1000)
 
-        filtered_results = results["results"]
+        filtered_results = list(results["results"])
         if self.user_id:
             filtered_results = [
                 result
@@ -150,11 +547,47 @@ class RAGEngine:
                 if result.get("metadata", {}).get("user_id") == self.user_id
             ]
 
+        if sources:
+            # Prefer passages from the files whose keywords match the query and
+            # only fall back to other files when they cannot fill top_k.
+            preferred = [
+                result
+                for result in filtered_results
+                if result.get("metadata", {}).get("source") in sources
+            ]
+            others = [
+                result
+                for result in filtered_results
+                if result.get("metadata", {}).get("source") not in sources
+            ]
+            filtered_results = (preferred + others)[:top_k]
+
         return {
             "results": filtered_results,
             "time_taken": time_taken,
         }
 
+    def _filters_by_user(self) -> bool:
+        return self.user_id is not None and getattr(
+            self.client, "supports_user_filter", False
+        )
+
+    def _remote_search(self, query: str, top_k: int, owner: str = None) -> Dict:
+        if self.embedder is None:
+            return self.client.search(
+                namespaces=[self.namespace], query=query, top_k=top_k
+            )
+
+        query_vector = self.embedder.embed_query(query).tolist()
+        kwargs = {"user_id": owner} if owner is not None else {}
+        results = self.client.search(
+            namespaces=[self.namespace], query=query_vector, top_k=top_k, **kwargs
+        )
+        # Vector namespaces return the chunk text inside metadata only.
+        for result in results["results"]:
+            result.setdefault("text", result.get("metadata", {}).get("text", ""))
+        return results
+
     def get_chunk_count(self) -> int:
         if self.db and self.user_id:
             return self.db.get_user_document_count(self.user_id)
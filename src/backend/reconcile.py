@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+DEFAULT_GRACE_SECONDS = 1800.0
+# get_documents accepts at most 100 ids per call.
+DEFAULT_PAGE_SIZE = 100
+
+
+class ReconcileReport:
+    __slots__ = (
+        "rows_checked",
+        "stale_rows",
+        "pending_checked",
+        "orphans",
+        "orphans_deleted",
+        "delete_errors",
+        "compacted_rows",
+        "freed_bytes",
+        "stale_check_skipped",
+    )
+
+    def __init__(self):
+        self.rows_checked = 0
+        self.stale_rows = 0
+        self.pending_checked = 0
+        self.orphans = 0
+        self.orphans_deleted = 0
+        self.delete_errors = 0
+        self.compacted_rows = 0
+        self.freed_bytes = 0
+        self.stale_check_skipped = False
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Reconciler:
+    """Brings the vector namespace and ``indexed_documents`` back in line.
+
+    * Local rows whose vector is gone are deleted (stale rows).
+    * Ids left in the ``pending_uploads`` journal without a local row are
+      deleted remotely (orphans). With the local vector store, which can list
+      its ids, every stored id is checked the same way.
+
+    Only rows and journal entries older than ``grace_seconds`` are touched, so
+    uploads and deletes still in flight are left alone. The database is
+    assumed to index this one namespace, as the app does.
+    """
+
+    def __init__(
+        self,
+        rag_engine,
+        grace_seconds: float = DEFAULT_GRACE_SECONDS,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        dry_run: bool = False,
+    ):
+        if rag_engine.db is None:
+            raise ValueError("Reconciliation requires a database")
+        self.rag_engine = rag_engine
+        self.db = rag_engine.db
+        self.client = rag_engine.client
+        self.namespace = rag_engine.namespace
+        self.grace_seconds = grace_seconds
+        self.page_size = page_size
+        self.dry_run = dry_run
+
+    def run(self) -> ReconcileReport:
+        report = ReconcileReport()
+        # Matches the naive UTC timestamps the database stores.
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        cutoff = now - timedelta(seconds=self.grace_seconds)
+        self._remove_stale_rows(cutoff, report)
+        self._delete_journaled_orphans(cutoff, report)
+        if hasattr(self.client, "list_ids"):
+            self._delete_listed_orphans(report)
+            self._compact(report)
+        return report
+
+    def _remote_ids(self, ids: List[str]) -> Optional[Set[str]]:
+        if self.rag_engine.embedder is None:
+            response = self.client.get_documents(
+                namespace_name=self.namespace, ids=ids
+            )
+            return {document["id"] for document in response.get("documents", [])}
+        if hasattr(self.client, "get_vectors"):
+            response = self.client.get_vectors(namespace_name=self.namespace, ids=ids)
+            return {vector["id"] for vector in response.get("vectors", [])}
+        # Remote vector namespaces cannot be read back by id.
+        return None
+
+    def _remove_stale_rows(self, cutoff: datetime, report: ReconcileReport):
+        for page in self.db.iter_document_pages(self.page_size, created_before=cutoff):
+            ids = [row["document_id"] for row in page]
+            remote_ids = self._remote_ids(ids)
+            if remote_ids is None:
+                report.stale_check_skipped = True
+                return
+
+            report.rows_checked += len(ids)
+            stale_ids = [item for item in ids if item not in remote_ids]
+            report.stale_rows += len(stale_ids)
+            if stale_ids and not self.dry_run:
+                # The cutoff keeps a row re-inserted by a concurrent re-index.
+                self.db.delete_document_ids(stale_ids, created_before=cutoff)
+
+    def _delete_orphans(self, ids: List[str], report: ReconcileReport) -> List[str]:
+        report.orphans += len(ids)
+        if self.dry_run or not ids:
+            return []
+
+        response = self.rag_engine._delete_batch(ids)
+        errors = response.get("errors", [])
+        failed = {
+            error["id"]
+            for error in errors
+            if isinstance(error, dict)
+            and "not found" not in str(error.get("error", "")).lower()
+        }
+        report.orphans_deleted += len(response.get("deleted_ids", []))
+        report.delete_errors += len(failed)
+        return [item for item in ids if item not in failed]
+
+    def _delete_journaled_orphans(self, cutoff: datetime, report: ReconcileReport):
+        last_id = None
+        while True:
+            pending = [
+                entry["document_id"]
+                for entry in self.db.get_pending_uploads(
+                    self.namespace, cutoff, self.page_size, after_document_id=last_id
+                )
+            ]
+            if not pending:
+                return
+            last_id = pending[-1]
+            report.pending_checked += len(pending)
+
+            recorded = self.db.get_existing_document_ids(pending)
+            orphans = [item for item in pending if item not in recorded]
+            resolved = list(recorded) + self._delete_orphans(orphans, report)
+            if not self.dry_run:
+                # Entries re-journaled after the cutoff belong to a live upload.
+                self.db.clear_pending_uploads(resolved, created_before=cutoff)
+
+    def _delete_listed_orphans(self, report: ReconcileReport):
+        remote_ids = self.client.list_ids(self.namespace)
+        for start in range(0, len(remote_ids), self.page_size):
+            ids = remote_ids[start : start + self.page_size]
+            # Uploads still in flight are journaled; older journal entries were
+            # already handled above. The journal is read before the rows: an
+            # upload records its row before clearing its entry, so one that
+            # finishes between the two reads is seen in at least one of them.
+            in_flight = self.db.get_pending_document_ids(ids)
+            recorded = self.db.get_existing_document_ids(ids)
+            orphans = [
+                item for item in ids if item not in recorded and item not in in_flight
+            ]
+            self._delete_orphans(orphans, report)
+
+    def _compact(self, report: ReconcileReport):
+        if self.dry_run:
+            return
+        before = self.client.memory_bytes(self.namespace)
+        report.compacted_rows = self.client.compact(self.namespace)
+        report.freed_bytes = before - self.client.memory_bytes(self.namespace)
@@ -0,0 +1,190 @@
+import os
+from threading import RLock
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+if TYPE_CHECKING:
+    from backend.auth import OAuthHandler
+    from backend.db import Database
+    from backend.doc_cache import DocumentCache
+    from backend.embeddings import EmbeddingService
+    from backend.limits import RateLimiter
+    from backend.llm import LLMClient
+    from backend.local_llm import LocalGenerator
+    from backend.rag_engine import RAGEngine
+    from backend.sessions import SessionRegistry
+    from backend.summaries import SummaryIndexer
+    from backend.vector_store import LocalVectorClient
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._resources: Dict[str, Any] = {}
+        self._lock = RLock()
+
+    def get(self, key: str, factory: Callable[[], Any]) -> Any:
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            resource = self._resources.get(key)
+            if resource is None:
+                resource = factory()
+                self._resources[key] = resource
+            return resource
+
+    def close(self):
+        with self._lock:
+            resources = list(self._resources.values())
+            self._resources.clear()
+
+        # Close in reverse creation order so dependents go before what they use.
+        for resource in reversed(resources):
+            close = getattr(resource, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing shared resource {resource!r}: {e}")
+
+
+_REGISTRY = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    return _REGISTRY
+
+
+def get_database() -> "Database":
+    def factory():
+        from backend.db import Database
+
+        return Database()
+
+    return _REGISTRY.get("database", factory)
+
+
+def get_document_cache() -> "DocumentCache":
+    def factory():
+        from backend.doc_cache import DocumentCache
+
+        return DocumentCache()
+
+    return _REGISTRY.get("document_cache", factory)
+
+
+def get_rate_limiter() -> "RateLimiter":
+    def factory():
+        from backend.limits import DatabaseBucketStore, RateLimiter
+
+        default_backend = "database" if os.getenv("CONNECTION_STRING") else "memory"
+        backend = os.getenv("RATE_LIMIT_BACKEND", default_backend).lower()
+        if backend == "database":
+            # Opening the database waits for the first limited call, so a
+            # configured CONNECTION_STRING does not slow the login page.
+            return RateLimiter(
+                store_factory=lambda: DatabaseBucketStore(get_database())
+            )
+        if backend == "memory":
+            return RateLimiter()
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+    return _REGISTRY.get("rate_limiter", factory)
+
+
+def get_llm_client() -> "LLMClient":
+    def factory():
+        from backend.llm import LLMClient
+
+        local_generator = None
+        if os.getenv("LOCAL_LLM_MODEL"):
+            local_generator = get_local_generator()
+        return LLMClient(limiter=get_rate_limiter(), local_generator=local_generator)
+
+    return _REGISTRY.get("llm_client", factory)
+
+
+def get_local_generator() -> "LocalGenerator":
+    def factory():
+        from backend.local_llm import LocalGenerator
+
+        return LocalGenerator()
+
+    return _REGISTRY.get("local_generator", factory)
+
+
+def get_oauth_handler() -> "OAuthHandler":
+    def factory():
+        from backend.auth import OAuthHandler
+
+        return OAuthHandler()
+
+    return _REGISTRY.get("oauth_handler", factory)
+
+
+def get_embedding_service() -> "EmbeddingService":
+    def factory():
+        from backend.embeddings import EmbeddingService
+
+        return EmbeddingService()
+
+    return _REGISTRY.get("embedding_service", factory)
+
+
+def get_local_vector_client() -> "LocalVectorClient":
+    def factory():
+        from backend.vector_store import LocalVectorClient
+
+        return LocalVectorClient()
+
+    return _REGISTRY.get("local_vector_client", factory)
+
+
+def get_summary_indexer() -> "SummaryIndexer":
+    def factory():
+        from backend.summaries import SummaryIndexer
+
+        return SummaryIndexer(get_database())
+
+    return _REGISTRY.get("summary_indexer", factory)
+
+
+def get_session_registry() -> "SessionRegistry":
+    def factory():
+        from backend.sessions import SessionRegistry
+
+        return SessionRegistry()
+
+    return _REGISTRY.get("session_registry", factory)
+
+
+def get_rag_engine(namespace: str, user_id: str = None) -> "RAGEngine":
+    def factory():
+        from backend.rag_engine import RAGEngine
+
+        client = None
+        embedder = None
+        if os.getenv("EMBEDDING_MODE", "remote").lower() == "local":
+            embedder = get_embedding_service()
+        if os.getenv("VECTOR_BACKEND", "moorcheh").lower() == "local":
+            client = get_local_vector_client()
+            embedder = get_embedding_service()
+
+        summarizer = None
+        if os.getenv("SUMMARIES_ENABLED", "").lower() in ("1", "true"):
+            summarizer = get_summary_indexer()
+
+        return RAGEngine(
+            namespace=namespace,
+            db=get_database(),
+            client=client,
+            limiter=get_rate_limiter(),
+            embedder=embedder,
+            summarizer=summarizer,
+        )
+
+    shared_engine = _REGISTRY.get(f"rag_engine:{namespace}", factory)
+    if user_id is None:
+        return shared_engine
+    return shared_engine.for_user(user_id)
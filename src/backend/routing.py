@@ -0,0 +1,122 @@
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# Weight of the newest sample in the rolling latency average.
+LATENCY_EWMA_ALPHA = 0.2
+MAX_CONSECUTIVE_ERRORS = 3
+ERROR_COOLDOWN_SECONDS = 60.0
+# An endpoint that rejects the call outright (e.g. a model without chat
+# support) is parked for much longer than one that merely timed out.
+UNSUPPORTED_COOLDOWN_SECONDS = 3600.0
+UNSUPPORTED_STATUS_CODES = (400, 404, 405, 422)
+
+Endpoint = Tuple[str, str]
+
+
+def is_unsupported_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in UNSUPPORTED_STATUS_CODES:
+        return True
+    return "not supported" in str(error).lower()
+
+
+class EndpointStats:
+    __slots__ = (
+        "calls",
+        "errors",
+        "consecutive_errors",
+        "latency_ewma",
+        "last_error",
+        "unavailable_until",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.latency_ewma: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.unavailable_until = 0.0
+
+
+class EndpointRouter:
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = list(endpoints)
+        self._stats: Dict[Endpoint, EndpointStats] = {
+            endpoint: EndpointStats() for endpoint in self.endpoints
+        }
+        self._lock = Lock()
+
+    def ordered(self, now: float = None) -> List[Endpoint]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+
+            def rank(item):
+                index, endpoint = item
+                stats = self._stats[endpoint]
+                cooling_down = stats.unavailable_until > now
+                latency = stats.latency_ewma
+                # Healthy measured endpoints by latency, then untried ones in
+                # configured order, then ones still cooling down as a last resort.
+                return (
+                    cooling_down,
+                    latency is None,
+                    latency or 0.0,
+                    index,
+                )
+
+            return [endpoint for _, endpoint in sorted(enumerate(self.endpoints), key=rank)]
+
+    def available(self, now: float = None) -> List[Endpoint]:
+        now = time.monotonic() if now is None else now
+        ordered = self.ordered(now)
+        with self._lock:
+            return [
+                endpoint
+                for endpoint in ordered
+                if self._stats[endpoint].unavailable_until <= now
+            ]
+
+    def record_success(self, endpoint: Endpoint, latency: float):
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats.calls += 1
+            stats.consecutive_errors = 0
+            stats.unavailable_until = 0.0
+            if stats.latency_ewma is None:
+                stats.latency_ewma = latency
+            else:
+                stats.latency_ewma += LATENCY_EWMA_ALPHA * (latency - stats.latency_ewma)
+
+    def record_failure(self, endpoint: Endpoint, error: Exception):
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats.calls += 1
+            stats.errors += 1
+            stats.consecutive_errors += 1
+            stats.last_error = str(error)[:200]
+            if is_unsupported_error(error):
+                stats.unavailable_until = now + UNSUPPORTED_COOLDOWN_SECONDS
+            elif stats.consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                stats.unavailable_until = now + ERROR_COOLDOWN_SECONDS
+
+    def stats(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "api": api,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "error_rate": stats.errors / stats.calls if stats.calls else 0.0,
+                    "latency_ms": None
+                    if stats.latency_ewma is None
+                    else int(stats.latency_ewma * 1000),
+                    "healthy": stats.unavailable_until <= now,
+                    "last_error": stats.last_error,
+                }
+                for (model, api), stats in self._stats.items()
+            ]
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+DEFAULT_IDLE_SECONDS = 1800.0
+# Measuring every session walks their conversations, so the gauge is
+# refreshed at most this often.
+STATS_TTL_SECONDS = 10.0
+
+
+def approximate_size(obj, _seen: set = None) -> int:
+    """Bytes held by plain containers, strings and slots records reachable
+    from ``obj``; objects with a ``__dict__`` (clients, engines) are shared
+    and not followed."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approximate_size(key, seen) + approximate_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += approximate_size(item, seen)
+    elif hasattr(type(obj), "__slots__") and not hasattr(obj, "__dict__"):
+        for name in type(obj).__slots__:
+            size += approximate_size(getattr(obj, name, None), seen)
+    return size
+
+
+class UserSession:
+    __slots__ = ("user_id", "rag_engine", "conversation", "last_seen")
+
+    def __init__(self, user_id: str, rag_engine, conversation):
+        self.user_id = user_id
+        self.rag_engine = rag_engine
+        self.conversation = conversation
+        self.last_seen = time.monotonic()
+
+    def footprint(self) -> int:
+        return approximate_size(self.conversation.turns) + approximate_size(
+            self.rag_engine.chunk_ids_to_clear
+        )
+
+    def release(self):
+        self.conversation.reset()
+        self.rag_engine.chunk_ids_to_clear.clear()
+
+
+class SessionRegistry:
+    """Per-browser-session engines and conversations, dropped after
+    ``idle_seconds`` without a request.
+
+    Sessions are kept in least-recently-used order, so each sweep only looks
+    at the ones it evicts.
+    """
+
+    def __init__(self, idle_seconds: float = None):
+        if idle_seconds is None:
+            idle_seconds = float(
+                os.getenv("SESSION_IDLE_SECONDS", str(DEFAULT_IDLE_SECONDS))
+            )
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._lock = Lock()
+        self.evicted = 0
+        self._stats: Optional[Dict[str, Optional[int]]] = None
+        self._stats_at = 0.0
+
+    def get(
+        self,
+        session_id: str,
+        user_id: str,
+        factory: Callable[[], UserSession],
+    ) -> UserSession:
+        now = time.monotonic()
+        self.evict_idle(now)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.user_id == user_id:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+                return session
+
+        replaced = session
+        session = factory()
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+        if replaced is not None:
+            replaced.release()
+        return session
+
+    def discard(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.release()
+
+    def evict_idle(self, now: float = None) -> int:
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.idle_seconds
+        expired = []
+        with self._lock:
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if session.last_seen > cutoff:
+                    break
+                del self._sessions[session_id]
+                expired.append(session)
+            self.evicted += len(expired)
+
+        for session in expired:
+            session.release()
+        return len(expired)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        now = time.monotonic()
+        if self._stats is not None and now - self._stats_at < STATS_TTL_SECONDS:
+            return self._stats
+
+        with self._lock:
+            sessions = list(self._sessions.values())
+            evicted = self.evicted
+        footprint = sum(session.footprint() for session in sessions)
+        self._stats_at = now
+        self._stats = {
+            "sessions": len(sessions),
+            "evicted": evicted,
+            "bytes": footprint,
+            "bytes_per_session": footprint // len(sessions) if sessions else None,
+        }
+        return self._stats
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.release()
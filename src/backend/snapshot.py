@@ -0,0 +1,67 @@
+import json
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COMPRESSION = "zstd"
+
+
+def write_snapshot(path: str, records: List[Dict], embedding_model: str = None):
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {
+            "id": [record["id"] for record in records],
+            "filename": [record["filename"] for record in records],
+            "text": [record["text"] for record in records],
+            # Chunk metadata varies by file type, so it is stored as JSON text.
+            "metadata": [json.dumps(record["metadata"]) for record in records],
+        }
+    )
+    if records and all(record.get("vector") is not None for record in records):
+        frame["vector"] = [
+            np.asarray(record["vector"], dtype=np.float32) for record in records
+        ]
+
+    frame.attrs = {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "embedding_model": embedding_model,
+    }
+    frame.to_parquet(path, compression=SNAPSHOT_COMPRESSION, index=False)
+
+
+def read_snapshot(path: str) -> "SnapshotReader":
+    return SnapshotReader(path)
+
+
+class SnapshotReader:
+    def __init__(self, path: str):
+        import pandas as pd
+
+        self.frame = pd.read_parquet(path, memory_map=True)
+        self.embedding_model: Optional[str] = self.frame.attrs.get("embedding_model")
+        self.has_vectors = "vector" in self.frame.columns
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def ids(self) -> List[str]:
+        return self.frame["id"].tolist()
+
+    def batches(self, batch_size: int) -> Iterator[tuple]:
+        frame = self.frame
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start : start + batch_size]
+            # The exported filename is what indexed_documents recorded, so it
+            # becomes the source the chunks are re-recorded under.
+            chunks = [
+                {**json.loads(metadata), "id": chunk_id, "text": text, "source": filename}
+                for chunk_id, filename, text, metadata in zip(
+                    batch["id"], batch["filename"], batch["text"], batch["metadata"]
+                )
+            ]
+            vectors = None
+            if self.has_vectors:
+                vectors = np.stack(batch["vector"].to_numpy()).astype(np.float32)
+            yield chunks, vectors
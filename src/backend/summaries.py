@@ -0,0 +1,125 @@
+import re
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+from backend.extractive import content_terms, extract_sentences
+
+CHUNK_SUMMARY_CHARS = 240
+FILE_SUMMARY_CHARS = 600
+CHUNK_KEYWORDS = 8
+FILE_KEYWORDS = 12
+SUMMARY_BATCH_SIZE = 200
+# A file is a routing candidate when this share of the question's terms are
+# among its keywords or its name.
+CANDIDATE_MIN_OVERLAP = 0.5
+
+_OVERVIEW_QUESTION = re.compile(
+    r"\b(?:what(?:'s| is| are)\s+(?:this|these|the|my|each)\s+"
+    r"(?:paper|papers|document|documents|file|files|article|articles)\s+about"
+    r"|summari[sz]e|summary|overview"
+    r"|main (?:topics|themes|points|ideas)|key (?:points|takeaways))\b",
+    re.IGNORECASE,
+)
+
+
+def is_overview_question(question: str) -> bool:
+    return bool(_OVERVIEW_QUESTION.search(question))
+
+
+def extract_keywords(text: str, limit: int) -> List[str]:
+    return [term for term, _ in Counter(content_terms(text)).most_common(limit)]
+
+
+def _summarize(text: str, keywords: List[str], max_chars: int) -> str:
+    sentences = extract_sentences(
+        " ".join(keywords), [{"text": text}], max_chars=max_chars
+    )
+    if sentences:
+        return " ".join(item["sentence"] for item in sentences)
+    return text[:max_chars]
+
+
+def summarize_chunk(chunk: Dict) -> Dict[str, str]:
+    text = chunk.get("text", "")
+    keywords = extract_keywords(text, CHUNK_KEYWORDS)
+    return {
+        "summary": _summarize(text, keywords, CHUNK_SUMMARY_CHARS),
+        "keywords": " ".join(keywords),
+    }
+
+
+def file_candidates(
+    question: str,
+    file_summaries: List[Dict],
+    min_overlap: float = CANDIDATE_MIN_OVERLAP,
+) -> List[str]:
+    terms = set(content_terms(question))
+    if not terms:
+        return []
+
+    candidates = []
+    for file_summary in file_summaries:
+        vocabulary = set(file_summary["keywords"]) | set(
+            content_terms(file_summary["filename"])
+        )
+        if len(terms & vocabulary) / len(terms) >= min_overlap:
+            candidates.append(file_summary["filename"])
+    return candidates
+
+
+class SummaryIndexer:
+    def __init__(self, db, max_workers: int = 1):
+        self.db = db
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summaries"
+        )
+
+    def schedule(self, user_id: str, chunks: List[Dict]) -> Future:
+        return self._pool.submit(self._index, user_id, list(chunks))
+
+    def _index(self, user_id: str, chunks: List[Dict]):
+        try:
+            self._index_chunks(user_id, chunks)
+        except Exception as e:
+            print(f"Error summarizing documents for {user_id}: {e}")
+
+    def _index_chunks(self, user_id: str, chunks: List[Dict]):
+        filenames = []
+        for start in range(0, len(chunks), SUMMARY_BATCH_SIZE):
+            rows = []
+            for chunk in chunks[start : start + SUMMARY_BATCH_SIZE]:
+                filename = chunk.get("source", "unknown")
+                if filename not in filenames:
+                    filenames.append(filename)
+                rows.append(
+                    {
+                        "document_id": chunk["id"],
+                        "user_id": user_id,
+                        "filename": filename,
+                        **summarize_chunk(chunk),
+                    }
+                )
+            self.db.add_chunk_summaries(rows)
+
+        # A file can arrive over several uploads, so its summary is rebuilt
+        # from every stored chunk summary rather than just this batch.
+        for filename in filenames:
+            chunk_summaries = self.db.get_chunk_summaries(user_id, filename)
+            keyword_counts = Counter(
+                keyword
+                for chunk_summary in chunk_summaries
+                for keyword in chunk_summary["keywords"].split()
+            )
+            keywords = [
+                keyword for keyword, _ in keyword_counts.most_common(FILE_KEYWORDS)
+            ]
+            summary = _summarize(
+                " ".join(chunk_summary["summary"] for chunk_summary in chunk_summaries),
+                keywords,
+                FILE_SUMMARY_CHARS,
+            )
+            self.db.set_file_summary(user_id, filename, summary, " ".join(keywords))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,560 @@
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_VECTOR_STORE_DIR = "data/vector_store"
+DEFAULT_QUANTIZATION = "int8"
+# Shortlist size per requested hit before exact rescoring, chosen for >= 0.95
+# recall@10 on benchmarks/vector_store.py. Sign bits lose far more ranking
+# information than int8, so binary needs a much longer shortlist.
+DEFAULT_RESCORE_FACTORS = {"binary": 40, "int8": 4}
+SCAN_BLOCK_ROWS = 1024
+
+
+class QuantizedVectorStore:
+    def __init__(
+        self,
+        path: str,
+        dimension: int = None,
+        mode: str = DEFAULT_QUANTIZATION,
+        rescore_factor: int = None,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = RLock()
+
+        config_path = self.path / "config.json"
+        if config_path.exists():
+            config = json.loads(config_path.read_text())
+            dimension = config["dimension"]
+            mode = config["mode"]
+        elif dimension is not None:
+            config_path.write_text(json.dumps({"dimension": dimension, "mode": mode}))
+
+        if mode not in ("binary", "int8"):
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.dimension = dimension
+        self.mode = mode
+        self.rescore_factor = rescore_factor or DEFAULT_RESCORE_FACTORS[mode]
+
+        # Only ids, owner codes and the byte span of each row's line in
+        # records.jsonl stay in RAM; metadata (chunk text included) is read
+        # back from the memory-mapped file for the rows a caller asks for.
+        self._ids: List[str] = []
+        self._spans = np.empty((0, 2), dtype=np.int64)
+        self._records = None
+        self._rows: Dict[str, int] = {}
+        self._owners: Dict[str, int] = {}
+        self._owner_codes = np.empty(0, dtype=np.int32)
+        self._alive = np.empty(0, dtype=bool)
+        self._codes = None
+        self._scales = None
+        self._vectors = None
+
+        if self.dimension is not None:
+            self._load()
+
+    @property
+    def code_width(self) -> int:
+        if self.mode == "binary":
+            return (self.dimension + 7) // 8
+        return self.dimension
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _remap(self):
+        rows = len(self._ids)
+        if rows == 0:
+            self._codes = np.empty((0, self.code_width), dtype=self._code_dtype())
+            self._scales = None
+            self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+            self._records = None
+            return
+
+        self._records = np.memmap(self._file("records.jsonl"), dtype=np.uint8, mode="r")
+
+        self._codes = np.memmap(
+            self._file("codes.bin"),
+            dtype=self._code_dtype(),
+            mode="r",
+            shape=(rows, self.code_width),
+        )
+        self._vectors = np.memmap(
+            self._file("vectors.f32"),
+            dtype=np.float32,
+            mode="r",
+            shape=(rows, self.dimension),
+        )
+        self._scales = None
+        if self.mode == "int8":
+            self._scales = np.memmap(
+                self._file("scales.f32"), dtype=np.float32, mode="r", shape=(rows,)
+            )
+
+    def _append(self, name: str, data: bytes):
+        with open(self._file(name), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _code_dtype(self):
+        return np.uint8 if self.mode == "binary" else np.int8
+
+    def _owner_code(self, owner: Optional[str]) -> int:
+        if owner is None:
+            return -1
+        if owner not in self._owners:
+            self._owners[owner] = len(self._owners)
+        return self._owners[owner]
+
+    def _metadata_at(self, records, row_span) -> Dict:
+        start, end = row_span
+        return json.loads(records[start:end].tobytes())["metadata"]
+
+    def _read_records(self) -> List[Tuple[Dict, int, int]]:
+        """Records up to the first torn or out-of-order line, each with the
+        byte offsets where its line starts and ends. Row metadata is reduced
+        to its owner so loading does not hold every chunk's text at once."""
+        records_path = self._file("records.jsonl")
+        records = []
+        if not records_path.exists():
+            return records
+
+        rows = 0
+        offset = 0
+        with open(records_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if "deleted" not in record:
+                    if record.get("row", rows) != rows:
+                        break
+                    rows += 1
+                    record = {
+                        "id": record["id"],
+                        "owner": record["metadata"].get("user_id"),
+                    }
+                records.append((record, offset, offset + len(line)))
+                offset += len(line)
+        return records
+
+    def _data_rows(self) -> Tuple[int, Dict[str, int]]:
+        row_bytes = {
+            "codes.bin": self.code_width * np.dtype(self._code_dtype()).itemsize,
+            "vectors.f32": self.dimension * 4,
+        }
+        if self.mode == "int8":
+            row_bytes["scales.f32"] = 4
+        sizes = [
+            self._file(name).stat().st_size // width
+            if self._file(name).exists()
+            else 0
+            for name, width in row_bytes.items()
+        ]
+        return min(sizes), row_bytes
+
+    def _load(self):
+        # add() appends the data files first and the records last, so after a
+        # crash the stores agree on a prefix: keep the longest one every file
+        # has, and cut everything back to it.
+        records = self._read_records()
+        data_rows, row_bytes = self._data_rows()
+
+        kept = 0
+        rows = 0
+        for record, _, end in records:
+            if "deleted" not in record:
+                if rows == data_rows:
+                    break
+                rows += 1
+            kept = end
+
+        records_path = self._file("records.jsonl")
+        if records_path.exists() and records_path.stat().st_size != kept:
+            os.truncate(records_path, kept)
+        for name, width in row_bytes.items():
+            path = self._file(name)
+            if path.exists() and path.stat().st_size != rows * width:
+                os.truncate(path, rows * width)
+
+        owner_codes = []
+        alive = []
+        spans = []
+        for record, start, end in records:
+            if end > kept:
+                break
+            if "deleted" in record:
+                item_id = record["deleted"]
+                # Tombstones name the row they retire; older ones without a
+                # row retire whichever row the id has at that point.
+                row = record.get("row", self._rows.get(item_id))
+                if row is not None:
+                    alive[row] = False
+                    if self._rows.get(item_id) == row:
+                        del self._rows[item_id]
+                continue
+            # A later row for an id supersedes the earlier one.
+            previous = self._rows.get(record["id"])
+            if previous is not None:
+                alive[previous] = False
+            self._rows[record["id"]] = len(self._ids)
+            self._ids.append(record["id"])
+            spans.append((start, end))
+            owner_codes.append(self._owner_code(record["owner"]))
+            alive.append(True)
+
+        self._owner_codes = np.asarray(owner_codes, dtype=np.int32)
+        self._alive = np.asarray(alive, dtype=bool)
+        self._spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self._remap()
+
+    def _quantize(self, vectors: np.ndarray):
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def add(self, ids: List[str], vectors, metadata: List[Dict]):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not (len(ids) == len(vectors) == len(metadata)):
+            raise ValueError("ids, vectors and metadata must have matching lengths")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._file("config.json").write_text(
+                    json.dumps({"dimension": self.dimension, "mode": self.mode})
+                )
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}"
+                )
+
+            codes, scales = self._quantize(vectors)
+            self._append("codes.bin", codes.tobytes())
+            self._append("vectors.f32", vectors.tobytes())
+            if scales is not None:
+                self._append("scales.f32", scales.tobytes())
+
+            # Records go last and carry their row number; _load() trusts only
+            # rows that every file has. Re-added ids are tombstoned after
+            # their new rows in the same append, so a crash can never keep the
+            # tombstone without the replacement.
+            first_row = len(self._ids)
+            lines = [
+                (
+                    json.dumps(
+                        {"row": first_row + index, "id": item_id, "metadata": item_metadata}
+                    )
+                    + "\n"
+                ).encode()
+                for index, (item_id, item_metadata) in enumerate(zip(ids, metadata))
+            ]
+            replaced = {
+                item_id: self._rows[item_id] for item_id in ids if item_id in self._rows
+            }
+            tombstones = [
+                (json.dumps({"deleted": item_id, "row": row}) + "\n").encode()
+                for item_id, row in replaced.items()
+            ]
+            records_path = self._file("records.jsonl")
+            offset = records_path.stat().st_size if records_path.exists() else 0
+            self._append("records.jsonl", b"".join(lines + tombstones))
+
+            owner_codes = []
+            spans = []
+            for item_id, item_metadata, line in zip(ids, metadata, lines):
+                self._rows[item_id] = len(self._ids)
+                self._ids.append(item_id)
+                spans.append((offset, offset + len(line)))
+                offset += len(line)
+                owner_codes.append(self._owner_code(item_metadata.get("user_id")))
+
+            self._owner_codes = np.concatenate(
+                [self._owner_codes, np.asarray(owner_codes, dtype=np.int32)]
+            )
+            self._spans = np.concatenate(
+                [self._spans, np.asarray(spans, dtype=np.int64)]
+            )
+            alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            alive[list(replaced.values())] = False
+            # Within one batch the last occurrence of an id wins.
+            for row in range(first_row, len(self._ids)):
+                if self._rows[self._ids[row]] != row:
+                    alive[row] = False
+            self._alive = alive
+            self._remap()
+
+        return list(ids)
+
+    def delete(self, ids: List[str]) -> List[str]:
+        with self._lock:
+            rows = {
+                item_id: self._rows[item_id] for item_id in ids if item_id in self._rows
+            }
+            if not rows:
+                return []
+            self._append(
+                "records.jsonl",
+                "".join(
+                    json.dumps({"deleted": item_id, "row": row}) + "\n"
+                    for item_id, row in rows.items()
+                ).encode(),
+            )
+            for item_id, row in rows.items():
+                del self._rows[item_id]
+                self._alive[row] = False
+        return list(rows)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def get(self, ids: List[str], include_vectors: bool = False) -> List[Dict]:
+        with self._lock:
+            records = []
+            for item_id in ids:
+                row = self._rows.get(item_id)
+                if row is None:
+                    continue
+                record = {
+                    "id": item_id,
+                    "metadata": self._metadata_at(self._records, self._spans[row]),
+                }
+                if include_vectors:
+                    record["vector"] = np.array(self._vectors[row])
+                records.append(record)
+            return records
+
+    def _approximate_scores(self, query_code: np.ndarray, codes) -> np.ndarray:
+        if self.mode == "binary":
+            distances = np.bitwise_count(codes ^ query_code).sum(axis=1, dtype=np.int32)
+            return (self.dimension - 2 * distances).astype(np.float32)
+        return codes.astype(np.float32) @ query_code
+
+    def search(
+        self, query, top_k: int = 10, user_id: Optional[str] = None
+    ) -> List[Dict]:
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            rows = len(self._ids)
+            if rows == 0 or self.dimension is None:
+                return []
+
+            # delete() flips bits in place; scan a copy.
+            mask = self._alive.copy()
+            if user_id is not None:
+                owner = self._owners.get(user_id)
+                if owner is None:
+                    return []
+                mask = mask & (self._owner_codes == owner)
+            # compact() swaps in new lists and files rather than mutating
+            # these, so the references stay a consistent snapshot.
+            codes, scales, vectors = self._codes, self._scales, self._vectors
+            ids, records, spans = self._ids, self._records, self._spans
+
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        query_codes, _ = self._quantize(query[None, :])
+        query_code = query_codes[0]
+        if self.mode == "int8":
+            query_code = query_code.astype(np.float32)
+
+        scores = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, rows)
+            scores[start:end] = self._approximate_scores(query_code, codes[start:end])
+        if scales is not None:
+            scores *= scales
+
+        candidate_scores = scores[candidates]
+        shortlist_size = min(candidates.size, top_k * self.rescore_factor)
+        if shortlist_size < candidates.size:
+            top = np.argpartition(-candidate_scores, shortlist_size - 1)[:shortlist_size]
+            shortlist = np.sort(candidates[top])
+        else:
+            shortlist = candidates
+
+        # Exact rescoring only touches the shortlisted float rows on disk.
+        exact = vectors[shortlist] @ query
+        order = np.argsort(-exact)[:top_k]
+
+        return [
+            {
+                "id": ids[shortlist[i]],
+                "score": float(exact[i]),
+                "metadata": self._metadata_at(records, spans[shortlist[i]]),
+            }
+            for i in order
+        ]
+
+    def memory_bytes(self) -> int:
+        """Bytes resident for searching: the Python id index plus the arrays,
+        counting the memory-mapped codes and scales every scan pages in. The
+        float vectors and records are read only for the rows returned."""
+        with self._lock:
+            rows = len(self._ids)
+            code_bytes = rows * self.code_width if self.dimension else 0
+            scale_bytes = rows * 4 if self.mode == "int8" else 0
+            index_bytes = (
+                sys.getsizeof(self._ids)
+                + sum(sys.getsizeof(item_id) for item_id in self._ids)
+                + sys.getsizeof(self._rows)
+                + sum(sys.getsizeof(row) for row in self._rows.values())
+                + sys.getsizeof(self._owners)
+                + sum(sys.getsizeof(owner) for owner in self._owners)
+            )
+            array_bytes = (
+                self._alive.nbytes + self._owner_codes.nbytes + self._spans.nbytes
+            )
+            return code_bytes + scale_bytes + index_bytes + array_bytes
+
+    def compact(self) -> int:
+        with self._lock:
+            keep = np.flatnonzero(self._alive)
+            removed = len(self._ids) - keep.size
+            if removed == 0:
+                return 0
+
+            tmp_path = self.path.with_name(self.path.name + ".compact")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            compacted = QuantizedVectorStore(
+                tmp_path, self.dimension, self.mode, self.rescore_factor
+            )
+            for start in range(0, keep.size, SCAN_BLOCK_ROWS):
+                block = keep[start : start + SCAN_BLOCK_ROWS]
+                compacted.add(
+                    [self._ids[row] for row in block],
+                    np.asarray(self._vectors[block]),
+                    [
+                        self._metadata_at(self._records, self._spans[row])
+                        for row in block
+                    ],
+                )
+
+            self._codes = self._scales = self._vectors = self._records = None
+            for name in ("codes.bin", "scales.f32", "vectors.f32", "records.jsonl"):
+                source = tmp_path / name
+                if source.exists():
+                    os.replace(source, self._file(name))
+                else:
+                    self._file(name).unlink(missing_ok=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+            self._ids, self._rows = [], {}
+            self._spans = np.empty((0, 2), dtype=np.int64)
+            self._owners = {}
+            self._load()
+            return removed
+
+
+class LocalVectorClient:
+    # search() can restrict the scan to one user's rows before ranking.
+    supports_user_filter = True
+
+    def __init__(self, root: str = None, mode: str = None):
+        self.root = Path(
+            root or os.getenv("VECTOR_STORE_DIR", DEFAULT_VECTOR_STORE_DIR)
+        )
+        self.mode = mode or os.getenv("VECTOR_STORE_QUANTIZATION", DEFAULT_QUANTIZATION)
+        self._stores: Dict[str, QuantizedVectorStore] = {}
+        self._lock = RLock()
+
+    def _store(
+        self, namespace_name: str, dimension: int = None
+    ) -> QuantizedVectorStore:
+        with self._lock:
+            store = self._stores.get(namespace_name)
+            if store is None:
+                store = QuantizedVectorStore(
+                    self.root / namespace_name, dimension=dimension, mode=self.mode
+                )
+                self._stores[namespace_name] = store
+            return store
+
+    def list_namespaces(self) -> Dict:
+        names = []
+        if self.root.exists():
+            names = sorted(path.name for path in self.root.iterdir() if path.is_dir())
+        return {
+            "namespaces": [{"namespace_name": name, "type": "vector"} for name in names]
+        }
+
+    def create_namespace(
+        self, namespace_name: str, type: str, vector_dimension: int = None
+    ):
+        if type != "vector":
+            raise ValueError("The local vector store only supports vector namespaces")
+        self._store(namespace_name, vector_dimension)
+        return {"namespace_name": namespace_name, "type": type}
+
+    def delete_namespace(self, namespace_name: str):
+        with self._lock:
+            self._stores.pop(namespace_name, None)
+            shutil.rmtree(self.root / namespace_name, ignore_errors=True)
+
+    def upload_vectors(self, namespace_name: str, vectors: List[Dict]) -> Dict:
+        store = self._store(namespace_name)
+        ids = store.add(
+            [item["id"] for item in vectors],
+            np.asarray([item["vector"] for item in vectors], dtype=np.float32),
+            [item.get("metadata", {}) for item in vectors],
+        )
+        return {"status": "success", "vector_ids_processed": ids, "errors": []}
+
+    def get_vectors(self, namespace_name: str, ids: List[str]) -> Dict:
+        return {"vectors": self._store(namespace_name).get(ids, include_vectors=True)}
+
+    def list_ids(self, namespace_name: str) -> List[str]:
+        return self._store(namespace_name).ids()
+
+    def compact(self, namespace_name: str) -> int:
+        return self._store(namespace_name).compact()
+
+    def memory_bytes(self, namespace_name: str) -> int:
+        return self._store(namespace_name).memory_bytes()
+
+    def delete_vectors(self, namespace_name: str, ids: List[str]) -> Dict:
+        deleted = self._store(namespace_name).delete(ids)
+        missing = set(ids) - set(deleted)
+        return {
+            "status": "partial" if missing else "success",
+            "deleted_ids": deleted,
+            "errors": [{"id": item_id, "error": "ID not found"} for item_id in missing],
+        }
+
+    def search(
+        self, namespaces: List[str], query, top_k: int = 10, user_id: str = None
+    ) -> Dict:
+        start_time = time.perf_counter()
+        results = []
+        for namespace_name in namespaces:
+            results.extend(self._store(namespace_name).search(query, top_k, user_id))
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return {
+            "results": results[:top_k],
+            "execution_time": time.perf_counter() - start_time,
+        }
+
+    def close(self):
+        pass
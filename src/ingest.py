@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+SUPPORTED_EXTENSIONS = {"pdf", "txt", "md"}
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_STATE_FILE = ".ingest_state.jsonl"
+
+load_dotenv()
+
+
+class SourceFile:
+    """File-like stand-in for Streamlit's UploadedFile, read lazily from disk."""
+
+    def __init__(self, name: str, path: str = None, content: bytes = None):
+        self.name = name
+        self.path = path
+        self.content = content
+
+    def read(self) -> bytes:
+        if self.content is not None:
+            return self.content
+        with open(self.path, "rb") as file:
+            return file.read()
+
+
+def _is_supported(name: str) -> bool:
+    return name.rsplit(".", 1)[-1].lower() in SUPPORTED_EXTENSIONS
+
+
+def iter_sources(source: str) -> Iterator[SourceFile]:
+    root = Path(source)
+    if root.is_dir():
+        for path in sorted(root.rglob("*")):
+            if path.is_file() and _is_supported(path.name):
+                yield SourceFile(path.relative_to(root).as_posix(), path=str(path))
+    elif zipfile.is_zipfile(root):
+        with zipfile.ZipFile(root) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and _is_supported(member.filename):
+                    yield SourceFile(member.filename, content=archive.read(member))
+    elif tarfile.is_tarfile(root):
+        # "r|*" streams the archive sequentially instead of indexing it first.
+        with tarfile.open(root, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and _is_supported(member.name):
+                    yield SourceFile(
+                        member.name.removeprefix("./"),
+                        content=archive.extractfile(member).read(),
+                    )
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+
+def _parse(source: SourceFile, user_id: str) -> Tuple[str, List[Dict], int]:
+    from backend.processing import process_documents
+
+    content = source.read()
+    chunks = process_documents(
+        [SourceFile(source.name, content=content)], user_id=user_id
+    )
+    return source.name, chunks, len(content)
+
+
+class IngestState:
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.done = set()
+        self.failed = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    entry = json.loads(line)
+                    if entry["status"] == "done":
+                        self.done.add(entry["file"])
+                        self.failed.discard(entry["file"])
+                    else:
+                        self.failed.add(entry["file"])
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def record(self, filename: str, status: str, error: str = None):
+        entry = {"file": filename, "status": status}
+        if error:
+            entry["error"] = error
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Ingestor:
+    def __init__(self, rag_engine, state: IngestState, batch_size: int):
+        self.rag_engine = rag_engine
+        self.state = state
+        self.batch_size = batch_size
+        self.pending: List[Tuple[str, List[Dict]]] = []
+        self.pending_chunks = 0
+        self.files = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.failures: List[Tuple[str, str]] = []
+
+    def fail(self, filename: str, error: str):
+        self.failures.append((filename, error))
+        self.state.record(filename, "failed", error)
+
+    def add(self, filename: str, chunks: List[Dict], size: int):
+        self.bytes += size
+        if not chunks:
+            self.state.record(filename, "done")
+            self.files += 1
+            return
+        self.pending.append((filename, chunks))
+        self.pending_chunks += len(chunks)
+        if self.pending_chunks >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        filenames = [filename for filename, _ in self.pending]
+        chunks = [chunk for _, file_chunks in self.pending for chunk in file_chunks]
+        self.pending = []
+        self.pending_chunks = 0
+
+        # Files are only marked done once every one of their chunks is uploaded,
+        # so an interrupted run re-processes partially uploaded files.
+        try:
+            for start in range(0, len(chunks), self.batch_size):
+                self.rag_engine.add_documents(chunks[start : start + self.batch_size])
+        except Exception as e:
+            for filename in filenames:
+                self.fail(filename, f"upload failed: {e}")
+            return
+
+        for filename in filenames:
+            self.state.record(filename, "done")
+        self.files += len(filenames)
+        self.chunks += len(chunks)
+
+
+def _print_summary(ingestor: Ingestor, skipped: int, elapsed: float):
+    elapsed = max(elapsed, 1e-9)
+    print(
+        f"Indexed {ingestor.files} file(s), {ingestor.chunks} chunk(s), "
+        f"{ingestor.bytes / (1024 * 1024):.1f} MiB in {elapsed:.1f}s "
+        f"({ingestor.files / elapsed:.2f} files/s, {ingestor.chunks / elapsed:.1f} chunks/s); "
+        f"skipped {skipped}, failed {len(ingestor.failures)}."
+    )
+    for filename, error in ingestor.failures:
+        print(f"  FAILED {filename}: {error}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Index a directory, zip or tar archive of documents for one user."
+    )
+    parser.add_argument("source", help="Directory, .zip or .tar(.gz) archive")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--namespace", default=os.getenv("NAMESPACE"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip files the state file records as done or failed",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="With --resume, retry files that failed previously",
+    )
+    args = parser.parse_args(argv)
+    if not args.namespace:
+        parser.error("--namespace or the NAMESPACE environment variable is required")
+
+    from backend.resources import get_database, get_rag_engine, get_registry
+
+    db = get_database()
+    rag_engine = get_rag_engine(args.namespace, user_id=args.user_id)
+    # Per-user web request limits do not apply to operator-run bulk ingestion.
+    rag_engine.limiter = None
+
+    indexed = {file_info["filename"] for file_info in db.get_user_files(args.user_id)}
+    state = IngestState(args.state_file, args.resume)
+    skip = indexed | state.done
+    if not args.retry_failed:
+        skip |= state.failed
+
+    ingestor = Ingestor(rag_engine, state, args.batch_size)
+    skipped = 0
+    start_time = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            in_flight: Dict = {}
+
+            def drain(return_when):
+                done, _ = wait(in_flight, return_when=return_when)
+                for future in done:
+                    name = in_flight.pop(future)
+                    try:
+                        filename, chunks, size = future.result()
+                    except Exception as e:
+                        ingestor.fail(name, str(e))
+                        continue
+                    ingestor.add(filename, chunks, size)
+
+            for source in iter_sources(args.source):
+                if source.name in skip:
+                    skipped += 1
+                    continue
+                # Bound how many files are read ahead of the parsers.
+                if len(in_flight) >= args.workers * 2:
+                    drain(FIRST_COMPLETED)
+                in_flight[pool.submit(_parse, source, args.user_id)] = source.name
+
+            if in_flight:
+                drain(ALL_COMPLETED)
+        ingestor.flush()
+    except KeyboardInterrupt:
+        print("Interrupted; run again with --resume to continue.")
+    finally:
+        state.close()
+        _print_summary(ingestor, skipped, time.perf_counter() - start_time)
+        get_registry().close()
+
+    return 1 if ingestor.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+from dotenv import load_dotenv
+
+from backend.reconcile import DEFAULT_GRACE_SECONDS, DEFAULT_PAGE_SIZE
+
+load_dotenv()
+
+
+def _print_report(report, elapsed: float, dry_run: bool):
+    verb = "would delete" if dry_run else "deleted"
+    if report.stale_check_skipped:
+        print("Stale-row check skipped: vectors cannot be read back from this namespace.")
+    else:
+        print(
+            f"Checked {report.rows_checked} local row(s); "
+            f"{verb} {report.stale_rows} without a remote document."
+        )
+    print(
+        f"Checked {report.pending_checked} journaled upload(s); found "
+        f"{report.orphans} orphaned id(s), {verb} "
+        f"{report.orphans if dry_run else report.orphans_deleted}, "
+        f"{report.delete_errors} failed."
+    )
+    if report.compacted_rows:
+        print(
+            f"Compacted {report.compacted_rows} dead row(s), "
+            f"freeing {report.freed_bytes / 1024:.0f} KiB."
+        )
+    print(f"Finished in {elapsed:.1f}s.")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Delete orphaned vectors and stale indexed_documents rows "
+        "left behind by failed uploads and deletes."
+    )
+    parser.add_argument("--namespace", default=os.getenv("NAMESPACE"))
+    parser.add_argument(
+        "--grace-minutes",
+        type=float,
+        default=DEFAULT_GRACE_SECONDS / 60,
+        help="Leave rows and uploads younger than this alone",
+    )
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report without deleting anything"
+    )
+    parser.add_argument(
+        "--interval-minutes",
+        type=float,
+        help="Keep running, reconciling once per interval (e.g. as a sidecar)",
+    )
+    args = parser.parse_args(argv)
+    if not args.namespace:
+        parser.error("--namespace or the NAMESPACE environment variable is required")
+
+    from backend.reconcile import Reconciler
+    from backend.resources import get_rag_engine, get_registry
+
+    reconciler = Reconciler(
+        get_rag_engine(args.namespace),
+        grace_seconds=args.grace_minutes * 60,
+        page_size=args.page_size,
+        dry_run=args.dry_run,
+    )
+
+    try:
+        while True:
+            start_time = time.perf_counter()
+            try:
+                report = reconciler.run()
+            except Exception as e:
+                print(f"Error reconciling namespace {args.namespace}: {e}")
+                if args.interval_minutes is None:
+                    return 1
+            else:
+                _print_report(report, time.perf_counter() - start_time, args.dry_run)
+
+            if args.interval_minutes is None:
+                return 0
+            time.sleep(args.interval_minutes * 60)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        get_registry().close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+EMBEDDING_DIMENSION = 16
+
+
+class HashEmbedder:
+    """Deterministic unit vectors keyed on the text, so identical texts match
+    exactly and different texts are nearly orthogonal."""
+
+    model_name = "hash"
+    dimension = EMBEDDING_DIMENSION
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    from backend.db import Database
+
+    monkeypatch.delenv("CONNECTION_STRING", raising=False)
+    db = Database(str(tmp_path / "db" / "indexed_documents.db"))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def embedder():
+    return HashEmbedder()
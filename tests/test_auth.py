@@ -0,0 +1,256 @@
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+
+from backend import auth
+from backend.auth import (
+    OAuthHandler,
+    _DatabaseSessionVersions,
+    _DatabaseStateStore,
+    _SessionVersions,
+    _StateStore,
+)
+
+OAUTH_SECRET = "oauth-client-secret-0123456789abcdef"
+SESSION_SECRET = "session-signing-secret-0123456789abcdef"
+
+
+class FakeSessionState(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        del self[key]
+
+
+@pytest.fixture
+def fake_st(monkeypatch):
+    fake = SimpleNamespace(session_state=FakeSessionState())
+    monkeypatch.setattr(auth, "st", fake)
+    return fake
+
+
+@pytest.fixture
+def handler(monkeypatch, fake_st):
+    monkeypatch.setenv("OAUTH_CLIENT_ID", "client")
+    monkeypatch.setenv("OAUTH_CLIENT_SECRET", OAUTH_SECRET)
+    monkeypatch.setenv("SESSION_SECRET", SESSION_SECRET)
+    monkeypatch.setattr(auth, "_SESSION_VERSIONS", _SessionVersions())
+    return OAuthHandler()
+
+
+USER = {"user_id": "u1", "username": "alice"}
+
+
+def test_session_secret_does_not_fall_back_to_client_secret(monkeypatch, fake_st):
+    monkeypatch.setenv("OAUTH_CLIENT_ID", "client")
+    monkeypatch.setenv("OAUTH_CLIENT_SECRET", OAUTH_SECRET)
+    monkeypatch.delenv("SESSION_SECRET", raising=False)
+
+    handler = OAuthHandler()
+    forged = jwt.encode(
+        {"sub": "u1", "exp": int(time.time()) + 60, "ver": 0},
+        OAUTH_SECRET,
+        algorithm="HS256",
+    )
+
+    assert handler.session_secret is None
+    assert handler.restore_session(forged) is None
+
+
+def test_session_token_round_trip(handler, fake_st):
+    token = handler.issue_session_token(USER)
+
+    assert handler.restore_session(token) == USER
+    assert fake_st.session_state.authenticated is True
+    # A second restore is served from the verified-token cache.
+    assert handler.restore_session(token) == USER
+
+
+@pytest.mark.parametrize(
+    "payload, secret",
+    [
+        ({"sub": "u1", "exp": 10**10, "ver": 0}, "wrong-secret-" + "x" * 32),
+        ({"sub": "u1", "exp": 1, "ver": 0}, SESSION_SECRET),
+        ({"sub": "u1", "exp": 10**10}, SESSION_SECRET),
+    ],
+    ids=["bad-signature", "expired", "no-version"],
+)
+def test_invalid_session_tokens_are_rejected(handler, payload, secret):
+    token = jwt.encode(payload, secret, algorithm="HS256")
+    assert handler.restore_session(token) is None
+
+
+def test_logout_revokes_issued_tokens(handler, fake_st):
+    token = handler.issue_session_token(USER)
+    other_user = handler.issue_session_token({"user_id": "u2", "username": "bob"})
+    assert handler.restore_session(token) == USER
+
+    handler.logout()
+
+    assert "user_info" not in fake_st.session_state
+    assert handler.restore_session(token) is None
+    assert handler.restore_session(other_user)["user_id"] == "u2"
+    # Signing in again issues a token under the new version.
+    assert handler.restore_session(handler.issue_session_token(USER)) == USER
+
+
+def test_revocation_is_shared_through_the_database(handler, monkeypatch, database):
+    monkeypatch.setattr(auth, "_SESSION_VERSIONS", _DatabaseSessionVersions(database))
+    token = handler.issue_session_token(USER)
+    assert handler.restore_session(token) == USER
+
+    # Another worker, with its own token cache, logs the user out.
+    database.bump_session_version("u1")
+
+    assert handler.restore_session(token) is None
+    assert database.get_session_version("u1") == 1
+    assert database.bump_session_version("u1") == 2
+
+
+def test_session_cookie_is_secure_and_clearable(handler, monkeypatch):
+    import streamlit.components.v1 as components
+
+    rendered = []
+    monkeypatch.setattr(components, "html", lambda body, height: rendered.append(body))
+
+    handler.write_session_cookie("abc.def.ghi")
+    handler.clear_session_cookie()
+
+    assert f"{auth.SESSION_COOKIE_NAME}=abc.def.ghi;" in rendered[0]
+    assert f"max-age={auth.SESSION_TTL_SECONDS};" in rendered[0]
+    assert "SameSite=Lax; Secure" in rendered[0]
+    assert f"{auth.SESSION_COOKIE_NAME}=; path=/; max-age=0;" in rendered[1]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(auth, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=["memory", "database"])
+def make_state_store(request):
+    def make(**kwargs):
+        if request.param == "memory":
+            return _StateStore(**kwargs)
+        database = request.getfixturevalue("database")
+        return _DatabaseStateStore(lambda: database, OAUTH_SECRET, **kwargs)
+
+    return make
+
+
+def test_state_is_consumed_once(make_state_store, clock):
+    store = make_state_store()
+    state = store.issue()
+
+    assert store.consume(state)
+    assert not store.consume(state)
+    assert not store.consume("never-issued")
+
+
+def test_expired_state_is_rejected(make_state_store, clock):
+    store = make_state_store(ttl_seconds=60)
+    state = store.issue()
+
+    clock[0] += 61
+
+    assert not store.consume(state)
+
+
+def test_memory_state_store_is_capped_dropping_oldest(clock):
+    store = _StateStore(max_size=3)
+    states = []
+    for _ in range(5):
+        states.append(store.issue())
+        clock[0] += 1
+
+    assert [store.consume(state) for state in states] == [
+        False,
+        False,
+        True,
+        True,
+        True,
+    ]
+
+
+def test_database_states_are_signed_and_issued_without_the_database(clock):
+    store = _DatabaseStateStore(lambda: pytest.fail("issue hit the database"), "k")
+    state = store.issue()
+    nonce, expires_at, signature = state.split(".")
+
+    forged = [
+        f"{nonce}x.{expires_at}.{signature}",
+        f"{nonce}.{int(expires_at) + 3600}.{signature}",
+        f"{nonce}.{expires_at}.{signature[:-1]}0",
+        _DatabaseStateStore(None, "other-key").issue(),
+        "no-dots",
+    ]
+    assert not any(store.consume(item) for item in forged)
+
+
+def _count_states(database):
+    from backend.db import OAuthState
+
+    session = database._get_session()
+    try:
+        return session.query(OAuthState).count()
+    finally:
+        session.close()
+
+
+def test_database_state_store_purges_once_per_interval(database, clock):
+    from sqlalchemy import event
+
+    store = _DatabaseStateStore(
+        lambda: database, OAUTH_SECRET, ttl_seconds=60, max_size=50
+    )
+    statements = []
+    event.listen(
+        database.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement.split()[0]),
+    )
+
+    for _ in range(store.purge_interval - 1):
+        assert store.consume(store.issue())
+    # Between purges a callback is one insert: no count, no scan.
+    assert statements == ["INSERT"] * (store.purge_interval - 1)
+
+    clock[0] += 61
+    states = []
+    for _ in range(80):
+        states.append(store.issue())
+        clock[0] += 0.01
+    assert all(store.consume(state) for state in states)
+    assert _count_states(database) <= store.max_size + store.purge_interval
+    assert not store.consume(states[-1])
+
+
+def test_database_state_cap_is_approximate_under_concurrent_logins(database):
+    import threading
+
+    store = _DatabaseStateStore(lambda: database, OAUTH_SECRET, max_size=10)
+    errors = []
+
+    def login():
+        try:
+            for _ in range(20):
+                store.consume(store.issue())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=login) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Each worker can add up to one purge interval past the cap.
+    assert _count_states(database) <= 10 + 6 * store.purge_interval
@@ -0,0 +1,116 @@
+from backend.conversation import ConversationSession
+
+
+class FakeEngine:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def search(self, query, top_k=5):
+        self.calls.append(("search", query))
+        return {"results": self.results[:top_k], "time_taken": 1}
+
+    def search_page(self, query, page_size=5):
+        self.calls.append(("search_page", query))
+        return {"results": self.results[:page_size], "time_taken": 1}
+
+    def multi_search(self, queries, top_k=5):
+        self.calls.append(("multi_search", tuple(queries)))
+        return {"results": self.results[:top_k], "time_taken": 1, "queries": queries}
+
+
+def _result(id, text):
+    return {"id": id, "text": text, "score": 0.5}
+
+
+TRANSFORMER = _result("t", "The transformer uses self-attention layers over tokens.")
+BERT = _result("b", "BERT pretrains a bidirectional encoder with masked tokens.")
+
+
+def _session(results=(TRANSFORMER, BERT), answer="answer"):
+    session = ConversationSession(FakeEngine(list(results)), max_turns=2)
+    response = session.retrieve("How does the transformer architecture work?")
+    session.record(
+        "How does the transformer architecture work?", answer, response["results"]
+    )
+    return session
+
+
+def test_first_question_searches_and_sets_topic():
+    session = _session()
+
+    assert session.rag_engine.calls == [
+        ("search_page", "How does the transformer architecture work?")
+    ]
+    assert session.topic == "How does the transformer architecture work?"
+
+
+def test_follow_up_covered_by_cache_skips_search():
+    session = _session()
+
+    response = session.retrieve("What about its self-attention layers?", top_k=1)
+
+    assert response["mode"] == "cached"
+    assert response["results"] == [TRANSFORMER]
+    assert len(session.rag_engine.calls) == 1
+
+
+def test_follow_up_with_new_terms_searches_with_topic_prefix():
+    session = _session(
+        results=[BERT], answer="An encoder-decoder; GPT keeps only the decoding half."
+    )
+    session.rag_engine.results = [_result("g", "GPT decodes left to right.")]
+
+    response = session.retrieve("How does that architecture compare with GPT decoding?")
+
+    assert response["mode"] == "incremental"
+    assert session.rag_engine.calls[-1] == (
+        "search",
+        "How does the transformer architecture work? "
+        "How does that architecture compare with GPT decoding?",
+    )
+    assert {result["id"] for result in response["results"]} == {"g", "b"}
+
+
+def test_unrelated_question_starts_a_new_search():
+    session = _session()
+
+    response = session.retrieve(
+        "Summarize recent work on protein folding models",
+        queries=["protein folding", "recent protein folding models"],
+    )
+
+    assert response["mode"] == "search"
+    assert session.rag_engine.calls[-1][0] == "multi_search"
+    assert session.topic == "Summarize recent work on protein folding models"
+
+
+def test_marker_words_alone_do_not_make_a_follow_up():
+    session = _session(results=[TRANSFORMER])
+
+    # Short questions and incidental markers start a new search.
+    assert not session.is_follow_up("What is dropout?")
+    assert not session.is_follow_up("How does that transformer paper compare to BERT")
+    assert not session.is_follow_up("Then what regularizes convolutional networks?")
+    assert session.is_follow_up("And then?")
+    assert session.is_follow_up("What about its attention layers?")
+
+    response = session.retrieve("What is dropout?")
+    assert response["mode"] == "search" and session.topic == "What is dropout?"
+
+
+def test_history_is_bounded_and_truncated():
+    session = ConversationSession(FakeEngine([]), max_turns=2)
+    for index in range(3):
+        session.record(f"question {index}", "x" * 400, [_result(str(index), "text")])
+
+    history = session.history()
+
+    assert "question 0" not in history
+    assert history.count("Q: ") == 2
+    assert "x" * 300 + "..." in history and "x" * 301 not in history
+    assert [result["id"] for result in session.cached_results()] == ["2", "1"]
+
+    session.reset()
+    assert session.history() == "" and session.topic is None
+    assert not session.is_follow_up("and then?")
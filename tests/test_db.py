@@ -0,0 +1,63 @@
+import pytest
+
+from backend import db as db_module
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(db_module, "INSERT_BATCH_SIZE", 3)
+    monkeypatch.setattr(db_module, "DELETE_BATCH_SIZE", 2)
+
+
+@pytest.fixture(params=["bulk", "individual"])
+def insert_path(request, database, monkeypatch):
+    if request.param == "individual":
+        monkeypatch.setattr(database, "_insert_ignoring_conflicts", lambda table: None)
+    return database
+
+
+def _ids(prefix, count):
+    return [f"{prefix}_chunk_{index}" for index in range(count)]
+
+
+def test_add_documents_spans_batches_and_ignores_duplicates(
+    insert_path, small_batches
+):
+    database = insert_path
+    database.add_documents("alice", _ids("a.txt", 7), "a.txt")
+    # Re-adding overlapping ids neither fails nor duplicates or re-owns rows.
+    database.add_documents("alice", _ids("a.txt", 9), "a.txt")
+    database.add_documents("bob", _ids("a.txt", 2), "a.txt")
+    database.add_documents("alice", [], "empty.txt")
+
+    assert sorted(database.get_user_document_ids("alice")) == sorted(_ids("a.txt", 9))
+    assert database.get_user_document_ids("bob") == []
+    assert database.get_user_files("alice") == [{"filename": "a.txt", "count": 9}]
+
+
+def test_lookups_and_deletes_span_batches(database, small_batches):
+    database.add_documents("alice", _ids("a.txt", 5), "a.txt")
+    database.add_documents("bob", _ids("b.txt", 3), "b.txt")
+    candidates = _ids("a.txt", 6) + _ids("b.txt", 3)
+
+    assert database.get_existing_document_ids(candidates) == set(
+        _ids("a.txt", 5) + _ids("b.txt", 3)
+    )
+    assert database.get_foreign_document_ids("alice", candidates) == set(
+        _ids("b.txt", 3)
+    )
+
+    assert database.delete_document_ids(_ids("a.txt", 6)) == 5
+    assert database.get_user_document_ids("alice") == []
+    assert database.get_user_document_count("bob") == 3
+
+
+def test_iter_document_pages_visits_every_row_once(database):
+    database.add_documents("alice", _ids("a.txt", 5), "a.txt")
+
+    pages = list(database.iter_document_pages(page_size=2))
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(row["document_id"] for page in pages for row in page) == sorted(
+        _ids("a.txt", 5)
+    )
@@ -0,0 +1,76 @@
+import os
+import threading
+
+from backend.doc_cache import DocumentCache
+
+
+def test_round_trip_and_disabled_cache(tmp_path):
+    cache = DocumentCache(tmp_path, max_bytes=1024)
+    key = cache.content_key(b"file bytes")
+
+    assert cache.get(key) is None
+    cache.put(key, "héllo wörld", [0, 6])
+    assert cache.get(key) == ("héllo wörld", [0, 6])
+    cache.put(cache.content_key(b"empty"), "", [])
+    assert cache.get(cache.content_key(b"empty")) == ("", [])
+
+    disabled = DocumentCache(tmp_path / "off", max_bytes=0)
+    disabled.put(key, "text", [0])
+    assert disabled.get(key) is None
+    assert not (tmp_path / "off").exists()
+
+
+def test_overwriting_a_key_does_not_double_count(tmp_path):
+    cache = DocumentCache(tmp_path, max_bytes=1024)
+
+    cache.put("ab12", "x" * 100, [0])
+    cache.put("ab12", "y" * 40, [0])
+
+    assert cache._total_bytes == 40 == cache._scan_size()
+    assert cache.get("ab12")[0] == "y" * 40
+
+
+def test_concurrent_writers_of_one_key(tmp_path):
+    cache = DocumentCache(tmp_path, max_bytes=1024 * 1024)
+    errors = []
+
+    def put(index):
+        try:
+            for _ in range(20):
+                cache.put("cd34", str(index) * 100, [0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert cache._total_bytes == 100 == cache._scan_size()
+    assert not list(tmp_path.glob("**/*.tmp"))
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = DocumentCache(tmp_path, max_bytes=250)
+    for index, key in enumerate(["aa01", "bb02"]):
+        cache.put(key, "z" * 100, [0])
+        text_path, _ = cache._paths(key)
+        os.utime(text_path, (index, index))
+    cache.get("aa01")  # touched: now the most recently used
+
+    cache.put("cc03", "z" * 100, [0])
+
+    assert cache.get("bb02") is None
+    assert cache.get("aa01") is not None and cache.get("cc03") is not None
+    assert cache._total_bytes == 200
+
+
+def test_only_older_parser_versions_are_purged(tmp_path):
+    for name in ("v1", "v3", "notes"):
+        (tmp_path / name).mkdir()
+
+    DocumentCache(tmp_path, max_bytes=1024, parser_version="2")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["notes", "v2", "v3"]
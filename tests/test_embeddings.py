@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.embeddings import EmbeddingService
+
+
+class FakeModel:
+    """Embeds numeric strings as ``[value]``; records every batch and can be
+    held inside ``encode`` to let requests queue up."""
+
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        self.entered.set()
+        self.release.wait(5)
+        if "fail" in texts:
+            raise RuntimeError("model failed")
+        return np.asarray([[float(text)] for text in texts], dtype=np.float32)
+
+
+def _service(max_batch_size=4):
+    service = EmbeddingService(
+        model_name="fake", max_batch_size=max_batch_size, max_wait_ms=1
+    )
+    service._model = FakeModel()
+    return service
+
+
+def test_requests_larger_than_a_batch_are_split_in_order():
+    service = _service()
+    texts = [str(i) for i in range(10)]
+
+    vectors = service.embed_documents(texts)
+
+    assert vectors[:, 0].tolist() == list(range(10))
+    assert [len(batch) for batch in service._model.batches] == [4, 4, 2]
+
+
+def test_queries_are_interleaved_between_slices():
+    service = _service()
+    model = service._model
+    model.release.clear()
+
+    documents = service.submit([str(i) for i in range(12)])
+    assert model.entered.wait(5)
+    # The first slice is being encoded; a query arriving now must not wait
+    # for the remaining two slices.
+    query = service.submit(["100"])
+    model.release.set()
+
+    assert query.result(5)[0][0] == 100.0
+    assert documents.result(5)[:, 0].tolist() == list(range(12))
+    assert model.batches[1] == ["100", "4", "5", "6"]
+    assert [len(batch) for batch in model.batches] == [4, 4, 4, 1]
+
+
+def test_failure_in_one_slice_fails_the_request_and_service_recovers():
+    service = _service()
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        service.embed_documents(["1", "2", "3", "4", "fail", "6", "7"])
+
+    assert service.embed_query("8")[0] == 8.0
+    assert not service._carry
@@ -0,0 +1,61 @@
+from backend.extractive import (
+    extract_sentences,
+    extractive_answer,
+    split_sentences,
+)
+
+CHUNKS = [
+    {
+        "text": "Transformers were introduced in 2017 for translation. "
+        "Self-attention lets every token attend to every other token. "
+        "The authors trained on eight GPUs for several days.",
+        "source": "attention.pdf",
+    },
+    {
+        "text": "Recurrent networks process tokens one step at a time. "
+        "Self-attention lets every token attend to every other token directly.",
+        "metadata": {"source": "rnn.pdf"},
+    },
+]
+
+
+def test_split_sentences_drops_fragments():
+    text = "Short one. This sentence is long enough to keep. Ok? 3 items remain here."
+
+    assert split_sentences(text) == [
+        "This sentence is long enough to keep.",
+        "3 items remain here.",
+    ]
+
+
+def test_extract_picks_relevant_sentences_without_near_duplicates():
+    sentences = extract_sentences("How does self-attention relate tokens?", CHUNKS)
+
+    assert [item["sentence"] for item in sentences] == [
+        "Self-attention lets every token attend to every other token.",
+        "Recurrent networks process tokens one step at a time.",
+    ]
+    assert [item["source"] for item in sentences] == ["attention.pdf", "rnn.pdf"]
+
+
+def test_extract_respects_the_character_budget():
+    sentences = extract_sentences("tokens self-attention GPUs", CHUNKS, max_chars=80)
+
+    assert len(sentences) == 1
+    assert sum(len(item["sentence"]) for item in sentences) <= 80
+
+
+def test_extract_returns_nothing_without_overlap():
+    assert extract_sentences("the and what", CHUNKS) == []
+    assert extract_sentences("protein folding", CHUNKS) == []
+    assert extract_sentences("tokens", []) == []
+
+
+def test_answer_cites_passage_ranks_and_sources():
+    answer = extractive_answer("When were transformers introduced?", CHUNKS)
+
+    assert answer == (
+        "Based on attention.pdf:\n\n"
+        "Transformers were introduced in 2017 for translation. [1]"
+    )
+    assert extractive_answer("protein folding", CHUNKS) == ""
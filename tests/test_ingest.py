@@ -0,0 +1,133 @@
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from ingest import IngestState, Ingestor, SourceFile, _parse, iter_sources
+
+FILES = {"a.txt": b"alpha", "docs/b.md": b"beta", "skip.bin": b"\x00"}
+
+
+def _names(source):
+    return [(item.name, item.read()) for item in iter_sources(str(source))]
+
+
+EXPECTED = [("a.txt", b"alpha"), ("docs/b.md", b"beta")]
+
+
+def test_iter_sources_walks_directories(tmp_path):
+    for name, content in FILES.items():
+        path = tmp_path / "src" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    assert _names(tmp_path / "src") == EXPECTED
+
+
+def test_iter_sources_reads_zip_and_tar(tmp_path):
+    with zipfile.ZipFile(tmp_path / "docs.zip", "w") as archive:
+        for name, content in FILES.items():
+            archive.writestr(name, content)
+    with tarfile.open(tmp_path / "docs.tar.gz", "w:gz") as archive:
+        for name, content in FILES.items():
+            info = tarfile.TarInfo("./" + name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+    assert _names(tmp_path / "docs.zip") == EXPECTED
+    assert _names(tmp_path / "docs.tar.gz") == EXPECTED
+
+
+def test_iter_sources_rejects_plain_files(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha")
+
+    with pytest.raises(ValueError):
+        list(iter_sources(str(tmp_path / "a.txt")))
+
+
+def test_parse_chunks_with_user_and_size():
+    source = SourceFile("a.txt", content=b"Some   text.")
+
+    name, chunks, size = _parse(source, "alice")
+
+    assert (name, size) == ("a.txt", 12)
+    assert [chunk["text"] for chunk in chunks] == ["Some text."]
+    assert chunks[0]["user_id"] == "alice"
+
+
+def _entries(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_state_resume_tracks_latest_status(tmp_path):
+    path = tmp_path / "state.jsonl"
+    state = IngestState(str(path), resume=False)
+    state.record("a.txt", "failed", "boom")
+    state.record("b.txt", "done")
+    state.record("a.txt", "done")
+    state.record("c.txt", "failed", "bad pdf")
+    state.close()
+
+    resumed = IngestState(str(path), resume=True)
+    resumed.close()
+
+    assert resumed.done == {"a.txt", "b.txt"}
+    assert resumed.failed == {"c.txt"}
+    # Without --resume the state file starts over.
+    IngestState(str(path), resume=False).close()
+    assert _entries(path) == []
+
+
+class RecordingEngine:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def add_documents(self, chunks):
+        if self.fail:
+            raise ConnectionError("offline")
+        self.batches.append([chunk["id"] for chunk in chunks])
+
+
+def _chunks(filename, count):
+    return [{"id": f"{filename}_{index}"} for index in range(count)]
+
+
+def test_ingestor_uploads_in_batches_and_marks_files_done(tmp_path):
+    state = IngestState(str(tmp_path / "state.jsonl"), resume=False)
+    engine = RecordingEngine()
+    ingestor = Ingestor(engine, state, batch_size=3)
+
+    ingestor.add("a.txt", _chunks("a", 2), 10)
+    assert engine.batches == []
+    ingestor.add("empty.txt", [], 0)
+    ingestor.add("b.txt", _chunks("b", 2), 20)
+    ingestor.flush()
+    state.close()
+
+    assert engine.batches == [["a_0", "a_1", "b_0"], ["b_1"]]
+    assert (ingestor.files, ingestor.chunks, ingestor.bytes) == (3, 4, 30)
+    assert [entry["file"] for entry in _entries(tmp_path / "state.jsonl")] == [
+        "empty.txt",
+        "a.txt",
+        "b.txt",
+    ]
+
+
+def test_failed_upload_marks_every_pending_file_failed(tmp_path):
+    state = IngestState(str(tmp_path / "state.jsonl"), resume=False)
+    ingestor = Ingestor(RecordingEngine(fail=True), state, batch_size=10)
+
+    ingestor.add("a.txt", _chunks("a", 1), 1)
+    ingestor.add("b.txt", _chunks("b", 1), 1)
+    ingestor.flush()
+    state.close()
+
+    assert [name for name, _ in ingestor.failures] == ["a.txt", "b.txt"]
+    assert ingestor.files == 0
+    assert {entry["status"] for entry in _entries(tmp_path / "state.jsonl")} == {
+        "failed"
+    }
@@ -0,0 +1,116 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from backend import limits
+from backend.limits import (
+    DatabaseBucketStore,
+    MemoryBucketStore,
+    RateLimiter,
+    RateLimitExceeded,
+)
+
+TIERS = {
+    "default": {"search": {"rate": 1.0, "burst": 2, "concurrency": 1}},
+    "unlimited": {},
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(limits, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return DatabaseBucketStore(request.getfixturevalue("database"))
+
+
+def test_bucket_allows_burst_then_reports_refill_time(store):
+    assert store.take("u:search", rate=0.5, burst=2, now=0.0) == 0.0
+    assert store.take("u:search", rate=0.5, burst=2, now=0.0) == 0.0
+    assert store.take("u:search", rate=0.5, burst=2, now=0.0) == pytest.approx(2.0)
+    assert store.take("u:search", rate=0.5, burst=2, now=1.0) == pytest.approx(1.0)
+    assert store.take("u:search", rate=0.5, burst=2, now=2.0) == 0.0
+    # A long idle period refills only up to the burst size.
+    assert [store.take("u:search", 0.5, 2, 100.0) for _ in range(3)][-1] > 0
+    assert store.take("other:search", rate=0.5, burst=2, now=2.0) == 0.0
+
+
+def test_limiter_raises_with_retry_after(clock):
+    limiter = RateLimiter(tiers=TIERS, user_tiers={})
+    for _ in range(2):
+        with limiter.acquire("alice", "search"):
+            pass
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        with limiter.acquire("alice", "search"):
+            pass
+    assert excinfo.value.action == "search"
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+
+    clock[0] += 1
+    with limiter.acquire("alice", "search"):
+        pass
+
+
+def test_limiter_caps_concurrent_calls_per_user(clock):
+    limiter = RateLimiter(tiers=TIERS, user_tiers={})
+    inside = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with limiter.acquire("alice", "search"):
+            inside.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert inside.wait(5)
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            with limiter.acquire("alice", "search"):
+                pass
+        assert excinfo.value.retry_after == limits.CONCURRENCY_RETRY_AFTER
+        # Other users are not affected.
+        with limiter.acquire("bob", "search"):
+            pass
+    finally:
+        release.set()
+        holder.join()
+
+    clock[0] += 10
+    with limiter.acquire("alice", "search"):
+        pass
+    assert limiter._active == {}
+
+
+def test_unlimited_tiers_and_anonymous_calls_skip_limits(clock):
+    limiter = RateLimiter(tiers=TIERS, user_tiers={"admin": "unlimited"})
+
+    for _ in range(10):
+        with limiter.acquire("admin", "search"):
+            pass
+        with limiter.acquire(None, "search"):
+            pass
+        with limiter.acquire("alice", "ingest"):
+            pass
+
+
+def test_tiers_come_from_environment(monkeypatch):
+    monkeypatch.setenv(
+        "RATE_LIMIT_TIERS", '{"pro": {"search": {"rate": 5, "burst": 50}}}'
+    )
+    monkeypatch.setenv("RATE_LIMIT_USER_TIERS", '{"carol": "pro"}')
+
+    limiter = RateLimiter()
+
+    assert limiter.tier_for("carol") == "pro"
+    assert limiter._limits_for("carol", "search") == {"rate": 5, "burst": 50}
+    default_search = limits.DEFAULT_TIERS["default"]["search"]
+    assert limiter._limits_for("dave", "search") == default_search
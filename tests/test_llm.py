@@ -0,0 +1,175 @@
+import pytest
+
+from backend.limits import RateLimiter
+from backend.llm import LLMClient
+
+CHUNKS = [
+    {
+        "source": "paper.pdf",
+        "text": "The cache stores prefilled system prompts. Batches share one forward pass.",
+    }
+]
+
+
+class FakeGenerator:
+    model_name = "fake-local"
+
+    def __init__(self, pieces=("The ", "answer."), fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def stream(self, user_message, max_new_tokens=512):
+        self.calls += 1
+        for index, piece in enumerate(self.pieces):
+            if index == self.fail_after:
+                raise RuntimeError("generator crashed")
+            yield piece
+        if self.fail_after == len(self.pieces):
+            raise RuntimeError("generator crashed")
+
+    def generate(self, user_message, max_new_tokens=512):
+        return "".join(self.stream(user_message, max_new_tokens))
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    monkeypatch.delenv("LLM_LOCAL_ENDPOINT", raising=False)
+    monkeypatch.setenv("HF_LLM_MODELS", "remote-model")
+
+    def make(generator=None, token="", remote=None):
+        monkeypatch.setenv("HF_TOKEN", token)
+        client = LLMClient(local_generator=generator)
+        if remote is not None:
+            client._call_endpoint = remote
+        return client
+
+    return make
+
+
+def _stats(client):
+    return {(row["model"], row["api"]): row for row in client.endpoint_stats()}
+
+
+def test_streams_tokens_from_local_generator(make_client):
+    client = make_client(FakeGenerator())
+
+    pieces = list(client.stream_answer("What is cached?", CHUNKS))
+
+    assert pieces == ["The ", "answer."]
+    stats = _stats(client)[("fake-local", "transformers")]
+    assert stats["calls"] == 1 and stats["errors"] == 0
+
+
+def test_stream_uses_router_order_and_skips_failed_endpoints(make_client):
+    calls = []
+
+    def remote(model, api, *args):
+        calls.append(api)
+        if api == "chat":
+            raise RuntimeError("chat is down")
+        return " remote answer "
+
+    generator = FakeGenerator()
+    client = make_client(generator, token="hf_test", remote=remote)
+
+    pieces = list(client.stream_answer("What is cached?", CHUNKS))
+
+    assert pieces == ["remote answer"]
+    assert calls == ["chat", "text_generation"]
+    assert generator.calls == 0
+    assert _stats(client)[("remote-model", "chat")]["errors"] == 1
+
+
+def test_stream_falls_back_to_local_generator_when_remotes_fail(make_client):
+    def remote(*args):
+        raise RuntimeError("rate limited")
+
+    client = make_client(FakeGenerator(), token="hf_test", remote=remote)
+
+    assert "".join(client.stream_answer("What is cached?", CHUNKS)) == "The answer."
+
+
+def test_stream_falls_back_to_extractive_answer_when_all_endpoints_fail(make_client):
+    client = make_client(FakeGenerator(fail_after=0))
+
+    answer = "".join(client.stream_answer("What does the cache store?", CHUNKS))
+
+    assert answer.startswith("⚠️ The generation service is unavailable")
+    assert "prefilled system prompts" in answer
+    assert _stats(client)[("fake-local", "transformers")]["errors"] == 1
+
+
+def test_stream_failure_midway_keeps_partial_answer(make_client):
+    generator = FakeGenerator(fail_after=1)
+    client = make_client(generator, token="hf_test", remote=lambda *args: "unused")
+    # Make the local generator the preferred endpoint.
+    client.router.record_success(("fake-local", "transformers"), 0.001)
+
+    pieces = list(client.stream_answer("What does the cache store?", CHUNKS))
+
+    assert pieces[0] == "The "
+    assert "stopped partway through" in pieces[1]
+    assert generator.calls == 1
+
+
+def test_stream_without_endpoints_is_extractive(make_client):
+    client = make_client()
+
+    answer = "".join(client.stream_answer("What does the cache store?", CHUNKS))
+
+    assert "prefilled system prompts" in answer
+    assert not answer.startswith("⚠️")
+
+
+def test_stream_holds_generate_limit_for_whole_stream(make_client):
+    events = []
+
+    class Limiter:
+        def acquire(self, user_id, action):
+            events.append(("acquire", user_id, action))
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            events.append(("release",))
+
+    client = make_client(FakeGenerator())
+    client.limiter = Limiter()
+
+    stream = client.stream_answer("What is cached?", CHUNKS, user_id="alice")
+    assert next(stream) == "The "
+    assert events == [("acquire", "alice", "generate")]
+    list(stream)
+    assert events[-1] == ("release",)
+
+
+def test_sub_queries_go_through_the_router_under_the_generate_limit(make_client):
+    calls = []
+
+    def prompt(model, api, text, max_length):
+        calls.append(api)
+        if api == "chat":
+            raise RuntimeError("chat is down")
+        return "1. attention cost\n- \n2) \"kv cache size\"\n3. batching"
+
+    tiers = {"default": {"generate": {"rate": 0.01, "burst": 1}}}
+    client = make_client(token="hf_test")
+    client.limiter = RateLimiter(tiers=tiers, user_tiers={})
+    client._call_prompt = prompt
+
+    queries = client.generate_sub_queries("Why is decoding slow?", 2, user_id="alice")
+
+    assert queries == ["attention cost", "kv cache size"]
+    assert calls == ["chat", "text_generation"]
+    assert _stats(client)[("remote-model", "chat")]["errors"] == 1
+    # The token is spent: further sub-queries are skipped, not raised.
+    assert client.generate_sub_queries("Why?", 2, user_id="alice") == []
+    assert len(calls) == 2
+    assert client.generate_sub_queries("Why?", 2, user_id="bob") != []
+
+
+def test_sub_queries_need_an_endpoint(make_client):
+    assert make_client().generate_sub_queries("Why is decoding slow?") == []
@@ -0,0 +1,78 @@
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCHMARK = Path(__file__).resolve().parent.parent / "benchmarks" / "load_test.py"
+
+
+def _load_benchmark():
+    spec = importlib.util.spec_from_file_location("load_test_benchmark", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_parse_latency_and_mix():
+    load_test = _load_benchmark()
+
+    assert load_test.parse_latency("fixed:250")() == 0.25
+    assert 0.01 <= load_test.parse_latency("uniform:10,20")() <= 0.02
+    assert load_test.parse_latency("lognormal:80,0.5")() > 0
+    with pytest.raises(ValueError):
+        load_test.parse_latency("gamma:1,2")
+    assert load_test.parse_mix("search=6, ask=3,ingest=1") == {
+        "search": 6.0,
+        "ask": 3.0,
+        "ingest": 1.0,
+    }
+
+
+def test_percentile_picks_nearest_rank():
+    load_test = _load_benchmark()
+    values = list(range(1, 101))
+
+    assert load_test._percentile(values, 0.5) == 51
+    assert load_test._percentile(values, 0.99) == 99
+    assert load_test._percentile(values, 1.0) == 100
+    assert load_test._percentile([7], 0.9) == 7
+
+
+def test_short_run_exercises_every_action_without_errors(tmp_path):
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("CONNECTION_STRING", "LOAD_TEST_DATABASE_URL")
+    }
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(BENCHMARK),
+            "--users=2",
+            "--duration=2",
+            "--think-ms=5",
+            "--moorcheh-latency=fixed:1",
+            "--llm-latency=fixed:1",
+            "--ingest-words=50",
+            "--mix=search=1,ask=1,ingest=1",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    assert result.returncode == 0, result.stderr
+    table = result.stdout.split("p99 ms\n", 1)[1].split("DB pool:", 1)[0]
+    assert {line.split()[0] for line in table.splitlines()} == {
+        "ask",
+        "ingest",
+        "login",
+        "search",
+    }
+    assert "errors:" not in result.stdout
+    assert "DB pool:" in result.stdout and "Memory:" in result.stdout
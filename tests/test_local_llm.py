@@ -0,0 +1,46 @@
+import numpy as np
+
+from backend.local_llm import _DONE, LocalGenerator, _BatchStreamer, _GenerationRequest
+
+
+class FakeTokenizer:
+    eos_token_id = 0
+    pad_token_id = 0
+
+    def decode(self, tokens, skip_special_tokens=True):
+        return "".join(chr(ord("a") + token - 1) for token in tokens)
+
+
+def _drain(request):
+    items = []
+    while True:
+        item = request.output.get_nowait()
+        if item is _DONE:
+            return items
+        items.append(item)
+
+
+def test_batch_streamer_routes_tokens_to_each_request():
+    short = _GenerationRequest([1], max_new_tokens=2)
+    long = _GenerationRequest([1, 2], max_new_tokens=5)
+    streamer = _BatchStreamer(FakeTokenizer(), [short, long])
+
+    streamer.put(np.array([[9, 9], [9, 9]]))  # prompt ids are skipped
+    for step in ([1, 2], [2, 3], [3, 4], [0, 0]):
+        streamer.put(np.array(step))
+    streamer.end()
+
+    # The short request stops at its own budget even though the batch ran on.
+    assert _drain(short) == ["a", "b"]
+    assert _drain(long) == ["b", "c", "d"]
+
+
+def test_requests_arriving_together_share_a_batch():
+    generator = LocalGenerator(model_name="fake", max_batch_size=2, max_wait_ms=50)
+    requests = [_GenerationRequest([index], 4) for index in range(3)]
+    for request in requests:
+        generator._queue.put(request)
+
+    # Micro-batching is per request: the third waits for the next batch.
+    assert generator._next_batch() == requests[:2]
+    assert generator._next_batch() == requests[2:]
@@ -0,0 +1,57 @@
+import pytest
+
+from backend.normalize import TextNormalizer, normalize_bytes, normalize_stream
+from backend.processing import clean_text
+
+SAMPLE = "  Héllo,\t wörld!\n\n  Ünïcode — text\r\nwith   gaps.  ".encode("utf-8")
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 1 << 20])
+def test_block_size_does_not_change_output(block_size):
+    expected = clean_text(SAMPLE.decode("utf-8"))
+
+    assert normalize_bytes(SAMPLE, block_size=block_size) == expected
+
+
+@pytest.mark.parametrize("block_size", [1, 5])
+def test_stream_matches_whole_buffer(block_size):
+    blocks = [SAMPLE[i : i + block_size] for i in range(0, len(SAMPLE), block_size)]
+
+    assert normalize_stream(blocks) == normalize_bytes(SAMPLE)
+
+
+def test_invalid_utf8_falls_back_to_latin1_for_whole_document():
+    data = "café olé".encode("latin-1")
+
+    assert normalize_bytes(data, block_size=2) == "café olé"
+
+
+def test_stream_falls_back_per_block():
+    blocks = ["naïve ".encode("utf-8"), "café".encode("latin-1")]
+
+    assert normalize_stream(blocks) == "naïve café"
+
+
+def test_strip_control_characters():
+    data = b"tab\there\x00 null\x07bell\x1b[0m"
+
+    assert normalize_bytes(data) == "tab here\x00 null\x07bell\x1b[0m"
+    assert normalize_bytes(data, strip_control=True) == "tab here nullbell[0m"
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 1 << 20])
+def test_dehyphenate_joins_words_across_blocks(block_size):
+    data = b"infor-\n  mation and well-known re-\nsults -\n end"
+
+    assert (
+        normalize_bytes(data, block_size=block_size, dehyphenate=True)
+        == "information and well-known results - end"
+    )
+
+
+def test_normalizer_feeds_incrementally():
+    normalizer = TextNormalizer()
+    for piece in ["  one", " two\n", "\nthree", "   "]:
+        normalizer.feed(piece)
+
+    assert normalizer.finish() == "one two three"
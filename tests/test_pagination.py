@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend import pagination
+from backend.pagination import PREVIEW_CHARS, ResultPageCache, compact_result
+from backend.rag_engine import RAGEngine
+from backend.vector_store import LocalVectorClient
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pagination, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_compact_result_truncates_to_a_preview():
+    result = {"id": "a", "score": 0.5, "text": "x" * 1000, "metadata": {"source": "a"}}
+
+    compact = compact_result(result)
+
+    assert compact["text"] == "x" * PREVIEW_CHARS + "..." and compact["truncated"]
+    assert compact_result(result, keep_text=True)["text"] == "x" * 1000
+    assert not compact_result({"id": "b", "text": "short"})["truncated"]
+
+
+def test_cursors_are_per_user_and_replayable(clock):
+    cache = ResultPageCache(ttl_seconds=60, max_entries=10)
+    cursor = cache.open("alice", "query", ["a", "b"])
+    token, _, offset = cursor.rpartition(".")
+
+    assert offset == "0"
+    found_token, entry, found_offset = cache.lookup(cursor, "alice")
+    assert (found_token, entry.query, entry.seen_ids, found_offset) == (
+        token,
+        "query",
+        ["a", "b"],
+        0,
+    )
+    assert cache.lookup(ResultPageCache.cursor(token, 5), "alice")[2] == 5
+    for bad in (f"{token}.-1", f"{token}.x", "unknown.0"):
+        with pytest.raises(KeyError):
+            cache.lookup(bad, "alice")
+    with pytest.raises(KeyError):
+        cache.lookup(cursor, "bob")
+
+
+def test_cursors_expire_after_idle_ttl(clock):
+    cache = ResultPageCache(ttl_seconds=60, max_entries=10)
+    cursor = cache.open("alice", "query", [])
+
+    clock[0] += 50
+    cache.lookup(cursor, "alice")
+    # Each lookup extends the deadline.
+    clock[0] += 50
+    cache.lookup(cursor, "alice")
+    clock[0] += 60
+    with pytest.raises(KeyError):
+        cache.lookup(cursor, "alice")
+
+
+def test_oldest_cursors_are_dropped_past_capacity(clock):
+    cache = ResultPageCache(ttl_seconds=60, max_entries=2)
+    first = cache.open("alice", "one", [])
+    second = cache.open("alice", "two", [])
+    cache.lookup(first, "alice")
+
+    cache.open("alice", "three", [])
+
+    assert cache.lookup(first, "alice")[1].query == "one"
+    with pytest.raises(KeyError):
+        cache.lookup(second, "alice")
+
+
+@pytest.fixture
+def engine(tmp_path, database, embedder):
+    client = LocalVectorClient(root=tmp_path / "vectors")
+    client.create_namespace("docs", "vector", embedder.dimension)
+    engine = RAGEngine(
+        "docs", user_id="alice", db=database, client=client, embedder=embedder
+    )
+    engine.index_documents(
+        [
+            {
+                "id": f"a.txt_chunk_{index}",
+                "text": f"passage {index} " + "word " * 100,
+                "source": "a.txt",
+                "user_id": "alice",
+            }
+            for index in range(8)
+        ]
+    )
+    return engine
+
+
+def test_next_page_continues_without_repeating_the_first_page(engine):
+    first = engine.search_page("passage 3", page_size=3)
+    first_ids = [result["id"] for result in first["results"]]
+
+    second = engine.next_page(first["next_cursor"], page_size=3)
+    replay = engine.next_page(first["next_cursor"], page_size=3)
+    third = engine.next_page(second["next_cursor"], page_size=3)
+
+    second_ids = [result["id"] for result in second["results"]]
+    third_ids = [result["id"] for result in third["results"]]
+    assert [result["id"] for result in replay["results"]] == second_ids
+    assert len(second_ids) == 3 and len(third_ids) == 2
+    assert sorted(first_ids + second_ids + third_ids) == sorted(
+        f"a.txt_chunk_{index}" for index in range(8)
+    )
+    assert third["next_cursor"] is None
+    # Deeper pages hold previews; the full text is fetched on demand.
+    result = second["results"][0]
+    assert result["truncated"]
+    assert engine.load_text(result).startswith(result["text"][:-3])
+
+    engine.user_id = "bob"
+    with pytest.raises(KeyError):
+        engine.next_page(first["next_cursor"])
+
+
+def test_short_first_page_has_no_cursor(engine):
+    assert engine.search_page("passage 1", page_size=20)["next_cursor"] is None
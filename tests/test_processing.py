@@ -0,0 +1,92 @@
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from backend import processing, resources
+from backend.processing import (
+    chunk_spans,
+    chunk_text,
+    page_for_offset,
+    process_documents,
+)
+from backend.resources import ResourceRegistry
+
+
+def test_chunk_spans_slice_to_chunk_text():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(400))
+
+    spans = chunk_spans(text, chunk_size=100, overlap=20)
+
+    assert [text[start:end] for start, end in spans] == chunk_text(text, 100, 20)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        # Chunks end on a sentence boundary and overlap the next one.
+        assert text[end - 1] == "."
+        assert next_start < end
+        assert text[start:end] == text[start:end].strip()
+
+
+def test_chunk_spans_skip_whitespace_only_text():
+    assert chunk_spans("") == []
+    assert chunk_spans("   \n  ") == []
+
+
+def test_page_for_offset():
+    offsets = [0, 10, 25]
+
+    assert [page_for_offset(offsets, offset) for offset in (0, 9, 10, 24, 25, 99)] == [
+        1,
+        1,
+        2,
+        2,
+        3,
+        3,
+    ]
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    import pypdf
+
+    pages = ["First   page.\n", "", "Second page text.", "Third."]
+    reader = SimpleNamespace(pages=[FakePage(page) for page in pages])
+    monkeypatch.setattr(pypdf, "PdfReader", lambda stream: reader)
+    monkeypatch.setenv("DOC_CACHE_MAX_BYTES", "0")
+    monkeypatch.setattr(resources, "_REGISTRY", ResourceRegistry())
+
+
+def test_pdf_page_offsets_survive_empty_pages(fake_pdf):
+    text, offsets = processing.load_pdf_pages(b"%PDF", "paper.pdf")
+
+    assert text == "First page. Second page text. Third."
+    assert text[offsets[2] :].startswith("Second")
+    assert text[offsets[3] :] == "Third."
+    assert page_for_offset(offsets, text.index("Second")) == 3
+
+
+def test_process_documents_records_spans_and_pages(fake_pdf):
+    uploaded = BytesIO(b"%PDF")
+    uploaded.name = "my paper.pdf"
+    notes = BytesIO(b"Plain   notes\r\nfile.")
+    notes.name = "notes.txt"
+
+    chunks = process_documents([uploaded, notes], user_id="alice")
+
+    pdf_chunk, text_chunk = chunks
+    assert pdf_chunk["id"] == "alice:my_paper.pdf_chunk_0"
+    assert pdf_chunk["chunk_id"] == "my_paper.pdf_chunk_0"
+    assert (pdf_chunk["page_start"], pdf_chunk["page_end"]) == (1, 4)
+    assert pdf_chunk["char_start"] == 0
+    assert pdf_chunk["char_end"] == len(pdf_chunk["text"])
+    assert pdf_chunk["user_id"] == "alice" and pdf_chunk["source"] == "my paper.pdf"
+    assert text_chunk["text"] == "Plain notes file."
+    assert "page_start" not in text_chunk
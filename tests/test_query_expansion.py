@@ -0,0 +1,136 @@
+from contextlib import contextmanager
+
+import pytest
+
+from backend.query_expansion import (
+    RRF_K,
+    decompose_query,
+    expand_query,
+    reciprocal_rank_fusion,
+)
+from backend.rag_engine import RAGEngine
+from backend.vector_store import LocalVectorClient
+
+
+def test_decompose_splits_clauses_and_comparisons():
+    question = "Compare BM25 retrieval with dense retrieval; how are embeddings trained?"
+
+    assert decompose_query(question, max_queries=10) == [
+        question,
+        "Compare BM25 retrieval with dense retrieval",
+        "BM25 retrieval",
+        "dense retrieval",
+        "how are embeddings trained",
+    ]
+
+
+def test_decompose_keeps_short_questions_whole():
+    assert decompose_query("What is RAG?") == ["What is RAG?"]
+    assert decompose_query("What is chunking and also how does overlap help?") == [
+        "What is chunking and also how does overlap help?",
+        "What is chunking",
+        "how does overlap help",
+    ]
+
+
+def test_decompose_drops_duplicates_and_caps_count():
+    question = "how does caching work? How does  caching work; why cache at all?"
+
+    assert decompose_query(question, max_queries=2) == [
+        question,
+        "how does caching work",
+    ]
+    assert len(decompose_query(question)) == 3
+
+
+class FakeLLM:
+    def __init__(self, queries):
+        self.queries = queries
+        self.requested = []
+
+    def generate_sub_queries(self, question, count, user_id=None):
+        self.requested.append(count)
+        return self.queries[:count]
+
+
+def test_expand_query_tops_up_from_the_llm_only_when_needed():
+    llm = FakeLLM(["what is rag", "retrieval augmented generation", "rag pipeline"])
+
+    assert expand_query("What is RAG", llm, max_queries=3) == [
+        "What is RAG",
+        "retrieval augmented generation",
+    ]
+    assert llm.requested == [2]
+
+    llm.requested.clear()
+    question = "Compare BM25 retrieval with dense retrieval"
+    assert len(expand_query(question, llm, max_queries=3)) == 3
+    assert llm.requested == []
+
+
+def _result(id, score):
+    return {"id": id, "score": score, "text": id}
+
+
+def test_rrf_rewards_results_found_by_several_queries():
+    fused = reciprocal_rank_fusion(
+        [
+            [_result("a", 0.9), _result("b", 0.8)],
+            [_result("c", 0.95), _result("b", 0.85)],
+            [_result("b", 0.7)],
+        ]
+    )
+
+    assert [entry["id"] for entry in fused] == ["b", "a", "c"]
+    top = fused[0]
+    assert top["matched_queries"] == 3
+    assert top["score"] == 0.85
+    assert top["fusion_score"] == pytest.approx(2 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert len(reciprocal_rank_fusion([[_result("a", 1), _result("b", 1)]], 1)) == 1
+
+
+def test_rrf_keys_results_without_ids_on_source_and_chunk():
+    def unnamed(chunk_id):
+        return {"text": "t", "metadata": {"source": "a.txt", "chunk_id": chunk_id}}
+
+    fused = reciprocal_rank_fusion([[unnamed(0), unnamed(1)], [unnamed(1)]])
+
+    assert [entry["metadata"]["chunk_id"] for entry in fused] == [1, 0]
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.charges = []
+
+    @contextmanager
+    def acquire(self, user_id, action):
+        self.charges.append((user_id, action))
+        yield
+
+
+def test_multi_search_charges_once_and_fuses(tmp_path, database, embedder):
+    client = LocalVectorClient(root=tmp_path / "vectors")
+    client.create_namespace("docs", "vector", embedder.dimension)
+    engine = RAGEngine(
+        "docs",
+        user_id="alice",
+        db=database,
+        client=client,
+        limiter=CountingLimiter(),
+        embedder=embedder,
+    )
+    texts = ["bm25 retrieval", "dense retrieval", "unrelated"]
+    engine.index_documents(
+        [
+            {"id": f"a.txt_chunk_{i}", "text": text, "source": "a.txt", "user_id": "alice"}
+            for i, text in enumerate(texts)
+        ]
+    )
+    engine.limiter.charges.clear()
+
+    response = engine.multi_search(["bm25 retrieval", "dense retrieval"], top_k=2)
+
+    assert engine.limiter.charges == [("alice", "search")]
+    assert response["queries"] == ["bm25 retrieval", "dense retrieval"]
+    assert {result["text"] for result in response["results"]} == set(texts[:2])
+    assert all("fusion_score" in result for result in response["results"])
@@ -0,0 +1,117 @@
+import pytest
+
+from backend.rag_engine import RAGEngine
+from backend.reconcile import Reconciler
+from backend.vector_store import LocalVectorClient
+
+NAMESPACE = "docs"
+
+
+@pytest.fixture
+def engine(tmp_path, database, embedder):
+    client = LocalVectorClient(root=tmp_path / "vectors")
+    client.create_namespace(NAMESPACE, "vector", embedder.dimension)
+    engine = RAGEngine(
+        NAMESPACE, user_id="alice", db=database, client=client, embedder=embedder
+    )
+    engine.add_documents(
+        [
+            {"id": f"a.txt_chunk_{i}", "text": f"chunk {i}", "source": "a.txt"}
+            for i in range(3)
+        ]
+    )
+    return engine
+
+
+def _upload(engine, ids):
+    vectors = engine.embedder.embed_documents(ids)
+    engine.client.upload_vectors(
+        NAMESPACE,
+        [{"id": item, "vector": vector, "metadata": {}} for item, vector in zip(ids, vectors)],
+    )
+
+
+def _leave_debris(engine):
+    # A row whose vector is gone, an upload that crashed before its row was
+    # written, and a vector nothing ever recorded.
+    engine.db.add_documents("alice", ["gone.txt_chunk_0"], "gone.txt")
+    _upload(engine, ["crashed_chunk_0"])
+    engine.db.add_pending_uploads("alice", NAMESPACE, ["crashed_chunk_0"])
+    _upload(engine, ["stray_chunk_0"])
+
+
+def test_reconcile_removes_stale_rows_and_orphans(engine):
+    _leave_debris(engine)
+
+    report = Reconciler(engine, grace_seconds=0).run()
+
+    assert report.stale_rows == 1
+    assert report.orphans == 2
+    assert report.orphans_deleted == 2
+    assert report.delete_errors == 0
+    assert report.compacted_rows == 2
+    kept = [f"a.txt_chunk_{i}" for i in range(3)]
+    assert sorted(engine.client.list_ids(NAMESPACE)) == kept
+    assert engine.db.get_user_document_ids("alice") == kept
+    assert engine.db.get_pending_document_ids(["crashed_chunk_0"]) == set()
+
+
+def test_dry_run_reports_without_deleting(engine):
+    _leave_debris(engine)
+
+    report = Reconciler(engine, grace_seconds=0, dry_run=True).run()
+
+    assert (report.stale_rows, report.orphans, report.orphans_deleted) == (1, 2, 0)
+    assert len(engine.client.list_ids(NAMESPACE)) == 5
+    assert "gone.txt_chunk_0" in engine.db.get_user_document_ids("alice")
+    assert engine.db.get_pending_document_ids(["crashed_chunk_0"]) == {"crashed_chunk_0"}
+
+
+def test_grace_period_protects_uploads_in_flight(engine):
+    _leave_debris(engine)
+
+    report = Reconciler(engine, grace_seconds=3600).run()
+
+    # Young rows and journaled uploads are left for a later run; the stray
+    # vector has no journal entry, so nothing is uploading it.
+    assert report.stale_rows == 0
+    assert report.orphans == 1
+    ids = set(engine.client.list_ids(NAMESPACE))
+    assert "crashed_chunk_0" in ids and "stray_chunk_0" not in ids
+    assert "gone.txt_chunk_0" in engine.db.get_user_document_ids("alice")
+
+
+def test_upload_finishing_mid_check_is_not_an_orphan(engine, monkeypatch):
+    # The vector and journal entry are in place; the row is not written yet.
+    _upload(engine, ["live_chunk_0"])
+    engine.db.add_pending_uploads("alice", NAMESPACE, ["live_chunk_0"])
+    db = engine.db
+    reads = []
+
+    def finish_upload():
+        db.add_documents("alice", ["live_chunk_0"], "live.txt")
+        db.clear_pending_uploads(["live_chunk_0"])
+
+    def after_first_read(method):
+        def read(document_ids):
+            result = method(document_ids)
+            reads.append(method.__name__)
+            # The upload completes between the reconciler's two lookups.
+            if len(reads) == 1:
+                finish_upload()
+            return result
+
+        return read
+
+    monkeypatch.setattr(
+        db, "get_existing_document_ids", after_first_read(db.get_existing_document_ids)
+    )
+    monkeypatch.setattr(
+        db, "get_pending_document_ids", after_first_read(db.get_pending_document_ids)
+    )
+
+    report = Reconciler(engine, grace_seconds=3600).run()
+
+    assert len(reads) == 2
+    assert report.orphans == 0
+    assert "live_chunk_0" in engine.client.list_ids(NAMESPACE)
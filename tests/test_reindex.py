@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from io import BytesIO
+
+import pytest
+
+from backend.processing import process_documents
+from backend.rag_engine import RAGEngine
+from backend.vector_store import LocalVectorClient
+
+
+class FlakyClient(LocalVectorClient):
+    fail_uploads = False
+
+    def upload_vectors(self, namespace_name, vectors):
+        if self.fail_uploads:
+            raise ConnectionError("upload failed")
+        return super().upload_vectors(namespace_name, vectors)
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.charges = []
+
+    @contextmanager
+    def acquire(self, user_id, action):
+        self.charges.append((user_id, action))
+        yield
+
+
+class RecordingSummarizer:
+    def __init__(self, db):
+        self.db = db
+        self.scheduled = []
+
+    def schedule(self, user_id, chunks):
+        # What a summarizer running right now would see for the file.
+        chunk_ids = sorted(chunk["id"] for chunk in chunks)
+        self.scheduled.append((chunk_ids, self.db.get_user_document_ids(user_id)))
+
+
+def _chunks(filename, texts):
+    return [
+        {
+            "id": f"{filename}_chunk_{index}",
+            "text": text,
+            "source": filename,
+            "user_id": "alice",
+        }
+        for index, text in enumerate(texts)
+    ]
+
+
+@pytest.fixture
+def engine(tmp_path, database, embedder):
+    client = FlakyClient(root=tmp_path / "vectors")
+    client.create_namespace("docs", "vector", embedder.dimension)
+    engine = RAGEngine(
+        "docs",
+        user_id="alice",
+        db=database,
+        client=client,
+        limiter=CountingLimiter(),
+        embedder=embedder,
+    )
+    engine.index_documents(_chunks("a.txt", ["old zero", "old one", "old two"]))
+    return engine
+
+
+def test_reindex_replaces_content_and_drops_only_stale_ids(engine):
+    engine.reindex_file("a.txt", _chunks("a.txt", ["new zero", "new one"]))
+
+    assert sorted(engine.client.list_ids("docs")) == ["a.txt_chunk_0", "a.txt_chunk_1"]
+    assert engine.db.get_file_document_ids("alice", "a.txt") == [
+        "a.txt_chunk_0",
+        "a.txt_chunk_1",
+    ]
+    top = engine.search("new one", top_k=1)["results"][0]
+    assert top["id"] == "a.txt_chunk_1" and top["text"] == "new one"
+
+
+def test_failed_upload_keeps_previous_version(engine):
+    engine.client.fail_uploads = True
+
+    with pytest.raises(ConnectionError):
+        engine.reindex_file("a.txt", _chunks("a.txt", ["new zero"]))
+
+    assert len(engine.client.list_ids("docs")) == 3
+    assert len(engine.db.get_file_document_ids("alice", "a.txt")) == 3
+    assert engine.search("old two", top_k=1)["results"][0]["text"] == "old two"
+
+
+def test_mixed_upload_is_charged_once(engine):
+    engine.limiter.charges.clear()
+
+    engine.index_documents(
+        _chunks("a.txt", ["new zero"]) + _chunks("b.txt", ["bee zero", "bee one"])
+    )
+
+    assert engine.limiter.charges == [("alice", "ingest")]
+    assert engine.db.get_user_files("alice") == [
+        {"filename": "a.txt", "count": 1},
+        {"filename": "b.txt", "count": 2},
+    ]
+
+
+def test_summaries_are_scheduled_after_stale_rows_are_gone(engine):
+    engine.summarizer = RecordingSummarizer(engine.db)
+
+    engine.index_documents(_chunks("a.txt", ["new zero"]))
+
+    assert engine.summarizer.scheduled == [(["a.txt_chunk_0"], ["a.txt_chunk_0"])]
+
+
+def _upload(name, text, user_id):
+    uploaded = BytesIO(text.encode())
+    uploaded.name = name
+    return process_documents([uploaded], user_id=user_id)
+
+
+def test_same_filename_from_two_users_stays_separate(engine):
+    bob = engine.for_user("bob")
+    engine.index_documents(_upload("notes.txt", "Alice's graph notes.", "alice"))
+    bob.index_documents(_upload("notes.txt", "Bob's protein notes.", "bob"))
+
+    bob.delete_file("notes.txt")
+
+    assert engine.db.get_file_document_ids("alice", "notes.txt") == [
+        "alice:notes.txt_chunk_0"
+    ]
+    top = engine.search("Alice's graph notes.", top_k=1)["results"][0]
+    assert top["id"] == "alice:notes.txt_chunk_0"
+    assert top["text"] == "Alice's graph notes."
+    assert "bob:notes.txt_chunk_0" not in engine.client.list_ids("docs")
+
+
+def test_upload_of_another_users_ids_is_refused(engine):
+    bob = engine.for_user("bob")
+    stolen = [
+        {**chunk, "text": "overwritten", "user_id": "bob"}
+        for chunk in _chunks("a.txt", ["x"])
+    ]
+
+    with pytest.raises(ValueError, match="another user"):
+        bob.index_documents(stolen)
+
+    assert engine.search("old zero", top_k=1)["results"][0]["text"] == "old zero"
+    assert bob.db.get_user_document_ids("bob") == []
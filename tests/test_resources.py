@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from backend import resources
+from backend.limits import DatabaseBucketStore
+from backend.resources import ResourceRegistry
+
+
+class Resource:
+    def __init__(self, name, closed, fail=False):
+        self.name = name
+        self.closed = closed
+        self.fail = fail
+
+    def close(self):
+        self.closed.append(self.name)
+        if self.fail:
+            raise RuntimeError("close failed")
+
+
+def test_factory_runs_once_under_concurrent_first_use():
+    registry = ResourceRegistry()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("client", factory)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+
+
+def test_close_runs_in_reverse_order_and_survives_errors():
+    registry = ResourceRegistry()
+    closed = []
+    registry.get("database", lambda: Resource("database", closed))
+    registry.get("limiter", lambda: Resource("limiter", closed, fail=True))
+    registry.get("plain", object)
+    registry.get("engine", lambda: Resource("engine", closed))
+
+    registry.close()
+
+    assert closed == ["engine", "limiter", "database"]
+    # A closed registry builds fresh resources on next use.
+    assert registry.get("database", lambda: "new") == "new"
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("CONNECTION_STRING", "RATE_LIMIT_BACKEND", "SUMMARIES_ENABLED"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("VECTOR_STORE_DIR", str(tmp_path / "vectors"))
+    registry = ResourceRegistry()
+    monkeypatch.setattr(resources, "_REGISTRY", registry)
+    yield registry
+    registry.close()
+
+
+def test_engines_share_clients_across_users(registry):
+    alice = resources.get_rag_engine("docs", user_id="alice")
+    bob = resources.get_rag_engine("docs", user_id="bob")
+
+    assert (alice.user_id, bob.user_id) == ("alice", "bob")
+    assert alice.client is bob.client is resources.get_local_vector_client()
+    assert alice.db is bob.db is resources.get_database()
+    assert alice.limiter is resources.get_rate_limiter()
+    assert alice.embedder is resources.get_embedding_service()
+    assert resources.get_rag_engine("docs").user_id is None
+    assert resources.get_rag_engine("other") is not resources.get_rag_engine("docs")
+
+
+def test_database_rate_limiter_opens_the_database_on_first_acquire(
+    registry, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CONNECTION_STRING", f"sqlite:///{tmp_path / 'limits.db'}")
+
+    limiter = resources.get_rate_limiter()
+    assert "database" not in registry._resources
+
+    with limiter.acquire("alice", "search"):
+        pass
+    with limiter.acquire(None, "search"):
+        pass
+
+    assert isinstance(limiter.store, DatabaseBucketStore)
+    assert limiter.store.db is registry._resources["database"]
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend import routing
+from backend.routing import EndpointRouter, is_unsupported_error
+
+FAST = ("fast-model", "openai")
+SLOW = ("slow-model", "openai")
+UNTRIED = ("new-model", "huggingface")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(routing, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _http_error(status_code):
+    error = RuntimeError(f"HTTP {status_code}")
+    error.response = SimpleNamespace(status_code=status_code)
+    return error
+
+
+def test_is_unsupported_error():
+    assert is_unsupported_error(_http_error(404))
+    assert is_unsupported_error(ValueError("Chat completion is not supported"))
+    assert not is_unsupported_error(_http_error(503))
+    assert not is_unsupported_error(TimeoutError("read timed out"))
+
+
+def test_measured_endpoints_rank_by_latency_before_untried_ones(clock):
+    router = EndpointRouter([UNTRIED, SLOW, FAST])
+
+    assert router.ordered() == [UNTRIED, SLOW, FAST]
+
+    router.record_success(SLOW, 2.0)
+    router.record_success(FAST, 0.5)
+    assert router.ordered() == [FAST, SLOW, UNTRIED]
+
+    # The rolling average moves gradually rather than on one sample.
+    router.record_success(FAST, 5.0)
+    assert router.ordered() == [FAST, SLOW, UNTRIED]
+    router.record_success(FAST, 10.0)
+    router.record_success(FAST, 10.0)
+    assert router.ordered() == [SLOW, FAST, UNTRIED]
+
+
+def test_repeated_errors_cool_an_endpoint_down(clock):
+    router = EndpointRouter([FAST, SLOW])
+    router.record_success(FAST, 0.1)
+
+    for _ in range(routing.MAX_CONSECUTIVE_ERRORS - 1):
+        router.record_failure(FAST, TimeoutError("timed out"))
+    assert router.available() == [FAST, SLOW]
+
+    router.record_failure(FAST, TimeoutError("timed out"))
+    assert router.available() == [SLOW]
+    # Cooling endpoints stay in the full ordering as a last resort.
+    assert router.ordered() == [SLOW, FAST]
+
+    clock[0] += routing.ERROR_COOLDOWN_SECONDS
+    assert router.available() == [FAST, SLOW]
+
+
+def test_unsupported_errors_park_an_endpoint_for_longer(clock):
+    router = EndpointRouter([FAST, SLOW])
+
+    router.record_failure(FAST, _http_error(400))
+    clock[0] += routing.ERROR_COOLDOWN_SECONDS
+    assert router.available() == [SLOW]
+
+    clock[0] += routing.UNSUPPORTED_COOLDOWN_SECONDS
+    assert FAST in router.available()
+
+
+def test_success_resets_errors_and_stats_report(clock):
+    router = EndpointRouter([FAST, SLOW])
+    router.record_failure(FAST, TimeoutError("timed out"))
+    router.record_failure(FAST, TimeoutError("timed out"))
+    router.record_success(FAST, 0.25)
+    router.record_failure(FAST, TimeoutError("timed out"))
+
+    assert router.available() == [FAST, SLOW]
+    fast, slow = router.stats()
+    assert fast == {
+        "model": "fast-model",
+        "api": "openai",
+        "calls": 4,
+        "errors": 3,
+        "error_rate": 0.75,
+        "latency_ms": 250,
+        "healthy": True,
+        "last_error": "timed out",
+    }
+    assert slow["calls"] == 0 and slow["error_rate"] == 0.0
+    assert slow["latency_ms"] is None
@@ -0,0 +1,111 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from backend import sessions
+from backend.conversation import ConversationSession, Turn
+from backend.sessions import SessionRegistry, UserSession, approximate_size
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+class FakeEngine:
+    def __init__(self):
+        self.chunk_ids_to_clear = set()
+
+
+def _factory(user_id, created):
+    def factory():
+        session = UserSession(user_id, FakeEngine(), ConversationSession(None, 4))
+        created.append(session)
+        return session
+
+    return factory
+
+
+def test_approximate_size_follows_containers_and_slots_only():
+    text = "x" * 1000
+    turn = Turn("question", text, [{"text": text}])
+    engine = SimpleNamespace(payload="y" * 10_000)
+    cyclic = []
+    cyclic.append(cyclic)
+
+    assert approximate_size(turn) > 1000
+    # The shared string is only counted once.
+    assert approximate_size([text, text]) < 2 * sys.getsizeof(text)
+    assert approximate_size({"engine": engine}) < 10_000
+    assert approximate_size(cyclic) == sys.getsizeof(cyclic)
+
+
+def test_get_reuses_sessions_per_user(clock):
+    registry = SessionRegistry(idle_seconds=60)
+    created = []
+
+    alice = registry.get("browser-1", "alice", _factory("alice", created))
+    assert registry.get("browser-1", "alice", _factory("alice", created)) is alice
+
+    alice.conversation.record("q", "a", [])
+    alice.rag_engine.chunk_ids_to_clear.add("chunk")
+    # A different user on the same browser session gets a fresh session and
+    # the old one's state is released.
+    bob = registry.get("browser-1", "bob", _factory("bob", created))
+    assert bob is not alice and len(created) == 2
+    assert not alice.conversation.turns and not alice.rag_engine.chunk_ids_to_clear
+
+
+def test_idle_sessions_are_evicted_in_lru_order(clock):
+    registry = SessionRegistry(idle_seconds=60)
+    created = []
+    first = registry.get("one", "alice", _factory("alice", created))
+    clock[0] += 30
+    registry.get("two", "bob", _factory("bob", created))
+    clock[0] += 20
+    # Touching "one" moves it behind "two".
+    assert registry.get("one", "alice", _factory("alice", created)) is first
+
+    clock[0] += 45
+    assert registry.evict_idle() == 1
+    assert registry.stats()["sessions"] == 1
+
+    clock[0] += 60
+    registry.get("three", "carol", _factory("carol", created))
+    assert registry.evicted == 2
+    assert registry.get("one", "alice", _factory("alice", created)) is not first
+
+
+def test_discard_and_close_release_sessions(clock):
+    registry = SessionRegistry(idle_seconds=60)
+    created = []
+    alice = registry.get("one", "alice", _factory("alice", created))
+    bob = registry.get("two", "bob", _factory("bob", created))
+    alice.conversation.record("q", "a", [])
+    bob.conversation.record("q", "a", [])
+
+    registry.discard("one")
+    registry.discard("missing")
+    assert not alice.conversation.turns and bob.conversation.turns
+
+    registry.close()
+    assert not bob.conversation.turns
+    assert registry.evict_idle(clock[0] + 1000) == 0
+
+
+def test_stats_are_cached_between_refreshes(clock):
+    registry = SessionRegistry(idle_seconds=600)
+    alice = registry.get("one", "alice", _factory("alice", []))
+
+    empty = registry.stats()
+    alice.conversation.record("question", "answer " * 500, [{"text": "passage"}])
+    assert registry.stats() is empty
+
+    clock[0] += sessions.STATS_TTL_SECONDS
+    refreshed = registry.stats()
+    assert refreshed["sessions"] == 1 and refreshed["evicted"] == 0
+    assert refreshed["bytes"] > empty["bytes"] + 3000
+    assert refreshed["bytes_per_session"] == refreshed["bytes"]
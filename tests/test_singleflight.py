@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from backend.singleflight import SingleFlight
+
+
+def _start(flight, key, fn, count):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def search():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["result"]
+
+    leader, results, errors = _start(flight, "query", search, 1)
+    assert started.wait(5)
+    followers, follower_results, _ = _start(flight, "query", search, 5)
+    time.sleep(0.05)
+    assert flight.in_flight() == 1
+    release.set()
+    _join(leader + followers)
+
+    assert len(calls) == 1
+    assert results + follower_results == [["result"]] * 6
+    assert errors == []
+    assert flight.in_flight() == 0
+
+
+def test_leader_error_reaches_followers_and_is_not_cached():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        started.set()
+        release.wait(5)
+        raise ConnectionError("search backend down")
+
+    leader, _, leader_errors = _start(flight, "query", failing, 1)
+    assert started.wait(5)
+    followers, results, errors = _start(flight, "query", failing, 3)
+    time.sleep(0.05)
+    release.set()
+    _join(leader + followers)
+
+    assert results == []
+    assert len(attempts) == 1
+    assert len(leader_errors + errors) == 4
+    assert all(isinstance(error, ConnectionError) for error in leader_errors + errors)
+    # The key is released, so the next call runs again.
+    assert flight.do("query", lambda: "recovered") == "recovered"
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    threads, _, _ = _start(flight, "slow", lambda: release.wait(5), 1)
+    try:
+        assert flight.do("fast", lambda: 42) == 42
+    finally:
+        release.set()
+        _join(threads)
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    values = iter([1, 2])
+
+    assert flight.do("key", lambda: next(values)) == 1
+    assert flight.do("key", lambda: next(values)) == 2
+    with pytest.raises(StopIteration):
+        flight.do("key", lambda: next(values))
@@ -0,0 +1,84 @@
+import pytest
+
+from backend.db import Database
+from backend.rag_engine import RAGEngine
+from backend.snapshot import read_snapshot
+from backend.vector_store import LocalVectorClient
+
+
+def _engine(tmp_path, database, embedder, user_id, namespace="docs"):
+    client = LocalVectorClient(root=tmp_path / "vectors")
+    client.create_namespace(namespace, "vector", embedder.dimension)
+    return RAGEngine(
+        namespace, user_id=user_id, db=database, client=client, embedder=embedder
+    )
+
+
+def _index(engine, filename, count):
+    engine.add_documents(
+        [
+            {
+                "id": f"{filename}_chunk_{i}",
+                "text": f"{filename} {i}",
+                "source": filename,
+                "page": i,
+                "user_id": engine.user_id,
+            }
+            for i in range(count)
+        ]
+    )
+
+
+def test_round_trip_restores_vectors_and_filenames(tmp_path, database, embedder):
+    alice = _engine(tmp_path, database, embedder, "alice")
+    _index(alice, "a.pdf", 3)
+    _index(alice, "b.txt", 2)
+    path = tmp_path / "alice.parquet"
+    assert alice.export_snapshot(str(path)) == 5
+
+    snapshot = read_snapshot(str(path))
+    assert snapshot.has_vectors and snapshot.embedding_model == "hash"
+
+    restored_db = Database(str(tmp_path / "restored" / "indexed_documents.db"))
+    try:
+        restored = _engine(tmp_path / "restored", restored_db, embedder, "alice")
+        assert restored.import_snapshot(str(path), batch_size=2) == 5
+        assert restored_db.get_user_files("alice") == [
+            {"filename": "a.pdf", "count": 3},
+            {"filename": "b.txt", "count": 2},
+        ]
+        top = restored.search("a.pdf 1", top_k=1)["results"][0]
+        assert top["id"] == "a.pdf_chunk_1"
+        assert top["metadata"]["page"] == 1
+        assert restored_db.get_pending_document_ids(snapshot.ids()) == set()
+    finally:
+        restored_db.close()
+
+
+def test_import_into_another_user_fails_without_touching_owner(
+    tmp_path, database, embedder
+):
+    alice = _engine(tmp_path, database, embedder, "alice")
+    _index(alice, "a.pdf", 3)
+    path = tmp_path / "alice.parquet"
+    alice.export_snapshot(str(path))
+
+    bob = alice.for_user("bob")
+    with pytest.raises(ValueError, match="another user"):
+        bob.import_snapshot(str(path))
+
+    assert database.get_user_document_ids("bob") == []
+    assert database.get_user_document_count("alice") == 3
+    stored = alice.client.get_vectors("docs", ["a.pdf_chunk_0"])["vectors"]
+    assert stored[0]["metadata"]["user_id"] == "alice"
+
+
+def test_reimport_for_same_user_is_idempotent(tmp_path, database, embedder):
+    alice = _engine(tmp_path, database, embedder, "alice")
+    _index(alice, "a.pdf", 3)
+    path = tmp_path / "alice.parquet"
+    alice.export_snapshot(str(path))
+
+    assert alice.import_snapshot(str(path)) == 3
+    assert database.get_user_document_count("alice") == 3
+    assert len(alice.client.list_ids("docs")) == 3
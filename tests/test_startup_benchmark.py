@@ -0,0 +1,60 @@
+import importlib.util
+from pathlib import Path
+
+BENCHMARK = Path(__file__).resolve().parent.parent / "benchmarks" / "startup.py"
+
+
+def _load_benchmark():
+    spec = importlib.util.spec_from_file_location("startup_benchmark", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_login_path_follows_app_imports():
+    startup = _load_benchmark()
+
+    modules, calls = startup.login_path()
+
+    assert {
+        "backend.conversation",
+        "backend.limits",
+        "backend.query_expansion",
+        "backend.resources",
+        "backend.sessions",
+        "backend.summaries",
+    } <= set(modules)
+    assert "streamlit" not in modules and "os" not in modules
+    assert ("backend.resources", "get_llm_client") in calls
+    assert ("backend.resources", "get_oauth_handler") in calls
+
+
+def test_login_path_skips_calls_made_only_after_login(tmp_path):
+    startup = _load_benchmark()
+    app = tmp_path / "app.py"
+    app.write_text(
+        "import os\n"
+        "from backend.resources import get_database, get_llm_client as llm\n"
+        "client = llm()\n"
+        "if os.getenv('X'):\n"
+        "    db = get_database()\n"
+        "def later():\n"
+        "    from backend.ingest_only import run\n"
+    )
+
+    assert startup.login_path(app) == (
+        ("backend.resources",),
+        (("backend.resources", "get_llm_client"),),
+    )
+
+
+def test_database_backends_stay_closed_until_after_login(tmp_path):
+    startup = _load_benchmark()
+    modules, calls = startup.login_path()
+    env = startup.backend_env(f"sqlite:///{tmp_path / 'startup.db'}")
+
+    result = startup.measure(startup.BASELINE_MODULES + modules, 1, calls, env)
+
+    # The auth URL is rendered without importing sqlalchemy or creating tables.
+    assert "sqlalchemy" not in result["loaded"]
+    assert not (tmp_path / "startup.db").exists()
@@ -0,0 +1,105 @@
+import pytest
+
+from backend.summaries import (
+    CHUNK_SUMMARY_CHARS,
+    SummaryIndexer,
+    extract_keywords,
+    file_candidates,
+    is_overview_question,
+    summarize_chunk,
+)
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        ("What are these papers about?", True),
+        ("Summarize my documents", True),
+        ("Give me an overview", True),
+        ("What are the key takeaways?", True),
+        ("What learning rate did they use?", False),
+        ("Which paper is about attention?", False),
+    ],
+)
+def test_is_overview_question(question, expected):
+    assert is_overview_question(question) is expected
+
+
+def test_chunk_summary_is_bounded_and_keyworded():
+    text = (
+        "Graph neural networks pass messages between graph nodes. "
+        "Message passing aggregates neighbour features at every layer. "
+    ) * 5
+
+    summary = summarize_chunk({"text": text})
+
+    assert extract_keywords(text, 3) == ["graph", "neural", "networks"]
+    assert summary["keywords"].split()[:3] == ["graph", "neural", "networks"]
+    # Repeated sentences appear once.
+    assert summary["summary"] == (
+        "Graph neural networks pass messages between graph nodes. "
+        "Message passing aggregates neighbour features at every layer."
+    )
+    assert len(summary["summary"]) <= CHUNK_SUMMARY_CHARS
+
+
+def test_file_candidates_match_keywords_or_filename():
+    file_summaries = [
+        {"filename": "gnn_survey.pdf", "keywords": ["graph", "message", "nodes"]},
+        {"filename": "vision.pdf", "keywords": ["image", "convolution"]},
+    ]
+
+    question = "How does message passing over graph nodes work?"
+    assert file_candidates(question, file_summaries) == ["gnn_survey.pdf"]
+    assert file_candidates("What does the survey say?", file_summaries) == [
+        "gnn_survey.pdf"
+    ]
+    assert file_candidates("Explain image segmentation losses", file_summaries) == []
+    assert file_candidates("what is it", file_summaries) == []
+
+
+def _chunk(id, filename, text):
+    return {"id": id, "source": filename, "text": text}
+
+
+def test_indexer_rebuilds_file_summary_across_uploads(database):
+    indexer = SummaryIndexer(database)
+    try:
+        indexer.schedule(
+            "alice",
+            [
+                _chunk("g0", "gnn.pdf", "Graph networks pass messages between nodes."),
+                _chunk("v0", "vision.pdf", "Convolutions slide filters over images."),
+            ],
+        ).result()
+        indexer.schedule(
+            "alice",
+            [_chunk("g1", "gnn.pdf", "Graph attention weights neighbour messages.")],
+        ).result()
+    finally:
+        indexer.close()
+
+    summaries = {row["filename"]: row for row in database.get_file_summaries("alice")}
+    assert sorted(summaries) == ["gnn.pdf", "vision.pdf"]
+    gnn = summaries["gnn.pdf"]
+    assert gnn["keywords"][:2] == ["graph", "messages"]
+    assert "Graph networks" in gnn["summary"] and "Graph attention" in gnn["summary"]
+    chunk_summaries = database.get_chunk_summaries("alice", "gnn.pdf")
+    assert [row["summary"] for row in chunk_summaries] == [
+        "Graph networks pass messages between nodes.",
+        "Graph attention weights neighbour messages.",
+    ]
+    assert database.get_file_summaries("bob") == []
+
+
+def test_indexer_errors_do_not_escape_the_worker():
+    class BrokenDatabase:
+        def add_chunk_summaries(self, rows):
+            raise RuntimeError("database is locked")
+
+    indexer = SummaryIndexer(BrokenDatabase())
+    try:
+        future = indexer.schedule("alice", [_chunk("a", "a.txt", "text")])
+        assert future.result() is None
+    finally:
+        indexer.close()
@@ -0,0 +1,270 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.rag_engine import RAGEngine
+from backend.vector_store import (
+    DEFAULT_RESCORE_FACTORS,
+    LocalVectorClient,
+    QuantizedVectorStore,
+)
+
+DIMENSION = 32
+
+
+def _unit(rng, rows, dimension=DIMENSION):
+    vectors = rng.standard_normal((rows, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeEmbedder:
+    """Chunks whose text starts with "big" point almost exactly at the query;
+    everything else points partly away from it."""
+
+    def __init__(self):
+        self.query = np.zeros(DIMENSION, dtype=np.float32)
+        self.query[0] = 1.0
+        self.rng = np.random.default_rng(0)
+
+    def _embed(self, text):
+        vector = self.query.copy()
+        if not text.startswith("big"):
+            vector[1] = 1.5
+        vector += 0.01 * self.rng.standard_normal(DIMENSION).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def embed_documents(self, texts):
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_query(self, text):
+        return self.query
+
+
+def test_default_quantization_is_int8(tmp_path):
+    store = QuantizedVectorStore(tmp_path / "store", DIMENSION)
+    assert store.mode == "int8"
+    assert store.rescore_factor == DEFAULT_RESCORE_FACTORS["int8"]
+    assert LocalVectorClient(root=tmp_path).mode == "int8"
+
+
+@pytest.mark.parametrize("mode", ["binary", "int8"])
+def test_default_rescore_factor_reaches_target_recall(tmp_path, mode):
+    # Sentence-embedding width; sign bits of a handful of dimensions say
+    # little, so recall is only meaningful at realistic sizes.
+    dimension = 384
+    rng = np.random.default_rng(1)
+    centers = _unit(rng, 16, dimension)
+    # Clustered like benchmarks/vector_store.py; queries come from the same
+    # distribution as the corpus.
+    corpus = centers[rng.integers(0, 16, 4020)] + 0.6 * _unit(rng, 4020, dimension)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    vectors, queries = corpus[:4000], corpus[4000:]
+
+    store = QuantizedVectorStore(tmp_path / mode, dimension, mode)
+    store.add([str(i) for i in range(len(vectors))], vectors, [{}] * len(vectors))
+
+    hits = 0
+    for query in queries:
+        expected = set(np.argsort(-(vectors @ query))[:10].tolist())
+        found = {int(result["id"]) for result in store.search(query, 10)}
+        hits += len(found & expected)
+    assert hits / (10 * len(queries)) >= 0.95
+
+
+def test_search_filters_by_owner_before_ranking(tmp_path):
+    store = QuantizedVectorStore(tmp_path / "store", DIMENSION)
+    vectors = _unit(np.random.default_rng(2), 6)
+    store.add(
+        [f"id{i}" for i in range(6)],
+        vectors,
+        [{"user_id": "alice" if i < 2 else "bob"} for i in range(6)],
+    )
+
+    results = store.search(vectors[0], top_k=10, user_id="alice")
+    assert {result["id"] for result in results} == {"id0", "id1"}
+    assert store.search(vectors[0], top_k=10, user_id="nobody") == []
+
+
+def test_small_user_is_not_crowded_out_by_large_library(tmp_path):
+    client = LocalVectorClient(root=tmp_path)
+    client.create_namespace("shared", "vector", DIMENSION)
+    embedder = FakeEmbedder()
+    big = RAGEngine("shared", user_id="big", client=client, embedder=embedder)
+    small = RAGEngine("shared", user_id="small", client=client, embedder=embedder)
+
+    big.add_documents(
+        [{"id": f"big-{i}", "text": f"big chunk {i}", "user_id": "big"} for i in range(300)]
+    )
+    small.add_documents(
+        [
+            {"id": f"small-{i}", "text": f"small chunk {i}", "user_id": "small"}
+            for i in range(3)
+        ]
+    )
+
+    results = small.search("question", top_k=5)["results"]
+    assert {result["id"] for result in results} == {"small-0", "small-1", "small-2"}
+    assert len(big.search("question", top_k=5)["results"]) == 5
+
+
+def test_delete_and_compact_survive_reload(tmp_path):
+    vectors = _unit(np.random.default_rng(3), 10)
+    store = QuantizedVectorStore(tmp_path / "store", DIMENSION)
+    store.add([f"id{i}" for i in range(10)], vectors, [{"n": i} for i in range(10)])
+    store.delete(["id1", "id3"])
+    assert store.compact() == 2
+
+    reloaded = QuantizedVectorStore(tmp_path / "store")
+    assert len(reloaded) == 8
+    assert sorted(reloaded.ids()) == sorted(f"id{i}" for i in range(10) if i not in (1, 3))
+    top = reloaded.search(vectors[4], top_k=1)[0]
+    assert top["id"] == "id4" and top["metadata"] == {"n": 4}
+
+
+def _store_with_rows(path, rows):
+    vectors = _unit(np.random.default_rng(4), rows)
+    store = QuantizedVectorStore(path, DIMENSION)
+    store.add([f"id{i}" for i in range(rows)], vectors, [{"n": i} for i in range(rows)])
+    return store, vectors
+
+
+def test_crash_before_records_drops_unrecorded_rows(tmp_path):
+    path = tmp_path / "store"
+    _, vectors = _store_with_rows(path, 5)
+    # Data for two more rows reached disk, their records did not.
+    extra = _unit(np.random.default_rng(5), 2)
+    with open(path / "vectors.f32", "ab") as f:
+        f.write(extra.tobytes())
+    with open(path / "codes.bin", "ab") as f:
+        f.write(b"\0" * 2 * DIMENSION)
+
+    store = QuantizedVectorStore(path)
+    assert len(store) == 5
+    assert (path / "vectors.f32").stat().st_size == 5 * DIMENSION * 4
+
+    # Rows added after recovery line up with their ids again.
+    new_vector = _unit(np.random.default_rng(6), 1)
+    store.add(["new"], new_vector, [{"n": "new"}])
+    reloaded = QuantizedVectorStore(path)
+    top = reloaded.search(new_vector[0], top_k=1)[0]
+    assert top["id"] == "new" and top["metadata"] == {"n": "new"}
+    assert reloaded.search(vectors[2], top_k=1)[0]["id"] == "id2"
+
+
+def test_torn_record_line_is_discarded_with_its_data(tmp_path):
+    path = tmp_path / "store"
+    _store_with_rows(path, 4)
+    with open(path / "records.jsonl", "rb") as f:
+        lines = f.readlines()
+    # The last record was cut off mid-line.
+    with open(path / "records.jsonl", "wb") as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:10])
+
+    store = QuantizedVectorStore(path)
+    assert sorted(store.ids()) == ["id0", "id1", "id2"]
+    assert (path / "codes.bin").stat().st_size == 3 * DIMENSION
+    assert (path / "records.jsonl").read_bytes() == b"".join(lines[:-1])
+
+
+def test_search_during_compaction_returns_consistent_rows(tmp_path):
+    rng = np.random.default_rng(7)
+    store = QuantizedVectorStore(tmp_path / "store", DIMENSION)
+    vectors = _unit(rng, 2000)
+    store.add(
+        [f"id{i}" for i in range(2000)], vectors, [{"id": f"id{i}"} for i in range(2000)]
+    )
+    queries = _unit(rng, 20)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            for query in queries:
+                try:
+                    for result in store.search(query, top_k=10):
+                        if result["metadata"]["id"] != result["id"]:
+                            errors.append(f"{result['id']} has {result['metadata']}")
+                except Exception as e:
+                    errors.append(repr(e))
+
+    searchers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in searchers:
+        thread.start()
+    try:
+        next_id = 2000
+        for round_ in range(15):
+            # Delete from the front so every compaction renumbers all rows.
+            store.delete([f"id{i}" for i in range(round_ * 100, round_ * 100 + 100)])
+            fresh = _unit(rng, 50)
+            fresh_ids = [f"id{next_id + i}" for i in range(50)]
+            store.add(fresh_ids, fresh, [{"id": item} for item in fresh_ids])
+            next_id += 50
+            store.compact()
+    finally:
+        done.set()
+        for thread in searchers:
+            thread.join()
+
+    assert errors == []
+
+
+def test_readding_an_id_survives_a_crash_at_any_point(tmp_path):
+    path = tmp_path / "store"
+    store, vectors = _store_with_rows(path, 4)
+    before = (path / "records.jsonl").read_bytes()
+    replacement = _unit(np.random.default_rng(8), 1)
+    store.add(["id1"], replacement, [{"n": "new"}])
+    after = (path / "records.jsonl").read_bytes()
+    new_row, tombstone = after[len(before) :].splitlines(keepends=True)
+    assert b'"deleted"' in tombstone
+    files = {item.name: item.read_bytes() for item in path.iterdir()}
+
+    def reload(records):
+        # Recovery truncates the data files, so restore them for each case.
+        for name, content in files.items():
+            (path / name).write_bytes(content)
+        (path / "records.jsonl").write_bytes(records)
+        return QuantizedVectorStore(path)
+
+    # Crash before the new row's record: the old version is still there.
+    old = reload(before)
+    assert len(old) == 4
+    assert old.get(["id1"])[0]["metadata"] == {"n": 1}
+    # Crash between the new row and its tombstone: the later row wins.
+    for records in (before + new_row, after):
+        store = reload(records)
+        assert len(store) == 4
+        assert store.get(["id1"])[0]["metadata"] == {"n": "new"}
+        assert store.search(replacement[0], top_k=1)[0]["id"] == "id1"
+        assert "id1" not in {result["id"] for result in store.search(vectors[1], 1)}
+
+
+def test_metadata_stays_on_disk(tmp_path):
+    import tracemalloc
+
+    rows, dimension = 2000, 384
+    vectors = _unit(np.random.default_rng(9), rows, dimension)
+    ids = [f"paper.pdf_chunk_{i}" for i in range(rows)]
+    metadata = [
+        {"text": f"chunk {i} " + "word " * 600, "source": "paper.pdf", "user_id": "u"}
+        for i in range(rows)
+    ]
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        store = QuantizedVectorStore(tmp_path / "store", dimension)
+        store.add(ids, vectors, metadata)
+        resident = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    text_bytes = sum(len(item["text"]) for item in metadata)
+    assert resident < text_bytes / 4
+    # Everything left on the Python heap is accounted for.
+    assert resident <= store.memory_bytes()
+    assert store.memory_bytes() < vectors.nbytes / 2
+    assert store.get(["paper.pdf_chunk_7"])[0]["metadata"] == metadata[7]
+    assert store.search(vectors[7], top_k=1)[0]["metadata"] == metadata[7]